@@ -3,11 +3,12 @@ import pybars
 import json
 import asyncio
 import time
-import io
 import base64
+import functools
+import hashlib
 import re
-import uuid
 import os
+import sys
 from typing import AsyncIterable, Awaitable, Callable
 from dotenv import load_dotenv
 from livekit import rtc
@@ -30,12 +31,86 @@ from livekit.plugins import (
     silero,
 )
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
-try:
-    from PIL import Image, ImageDraw, ImageFont
-except Exception:  # pragma: no cover - optional runtime dependency fallback
-    Image = None
-    ImageDraw = None
-    ImageFont = None
+from data_dispatch import DEFAULT_OFFLOAD_BYTES, INVALID, DataPacketDispatcher
+from drawing_lock import DEFAULT_UNLOCK_DELAY_S, StudentDrawingLock
+from offload import SessionOffloader, configure_cpu_executor
+import packet_codec
+from packet_codec import PacketDecodeError
+from packets import (
+    ChatTextMessage,
+    TeacherActionResultPacket,
+    TranscriptionPacket,
+    WhiteboardImagePacket,
+    WhiteboardPacket,
+    WhiteboardProject,
+    WhiteboardProjectPacket,
+    packet_text,
+)
+from rpc import DataChannelRpc, RpcError, RpcTimeoutError
+from teacher_schedule import (
+    LIST_SHIFTS_ACTION,
+    RESCHEDULE_BATCH_ACTION,
+    TEACHER_MAX_BATCH_CHANGES,
+    ClassReschedule,
+    ScheduleError,
+    ShiftSchedule,
+    TeacherScheduleCache,
+    batch_item_results,
+    build_batch_args,
+    build_reschedule_args,
+    check_reschedules,
+    describe_classes,
+    is_unsupported_result,
+    normalize_scope,
+    parse_supported_actions,
+    resolve_clock_in,
+    split_batch_args,
+)
+from telemetry import LatencyRecorder, LoopLagMonitor
+from tts_lexicon import PronunciationLexicon
+from whiteboard import (
+    DEFAULT_INK_TOLERANCE,
+    EMPTY_DOCUMENT,
+    STROKE_KIND,
+    TEXT_KIND,
+    WHITEBOARD_DELTA_SNAPSHOT_INTERVAL,
+    WHITEBOARD_MSG_TYPE_PROJECT_DELTA,
+    InkSimplifier,
+    StrokeItem,
+    StrokePoints,
+    TextItem,
+    WhiteboardDocument,
+    WhiteboardIdIndex,
+    build_delta,
+    classify_board_change,
+    is_snapshot_packet,
+    new_item_id,
+    parse_delta,
+    wire_board_fingerprint,
+)
+from vision_cache import BoardFingerprint, VisionResultCache
+from vision_encoding import (
+    DEFAULT_VISION_MAX_BYTES,
+    DEFAULT_VISION_MAX_EDGE,
+    encode_for_vision,
+    prepare_client_image,
+)
+from whiteboard_ops import (
+    WHITEBOARD_MAX_OPS,
+    EquationOp,
+    LineOp,
+    RectangleOp,
+    TextOp,
+    WhiteboardOp,
+)
+from whiteboard_image import (
+    DEFAULT_MAX_IMAGE_BYTES,
+    WHITEBOARD_IMAGE_STREAM_TOPIC,
+    ImageTransferError,
+    read_image_stream,
+)
+from whiteboard_memory import DEFAULT_MEMORY_BUDGET_BYTES, WhiteboardMemoryBudget
+from whiteboard_render import WhiteboardRasterCache, pillow_available
 
 logger = logging.getLogger("agent-Alluwal")
 WHITEBOARD_PROJECT_TOPICS = {"ai_tutor_whiteboard", "alluwal_whiteboard"}
@@ -48,6 +123,8 @@ TEACHER_ACTION_MSG_TYPE = "teacher_action"
 TEACHER_ACTION_RESULT_MSG_TYPE = "teacher_action_result"
 CHAT_TEXT_TOPIC = "ai_tutor_chat_text"
 TRANSCRIPTION_TOPIC = "ai_tutor_transcription"
+# Whiteboard publishes slower than this are logged to surface room congestion.
+WHITEBOARD_SLOW_PUBLISH_MS = 250.0
 # Prevent unsolicited overlapping speech during normal conversation.
 # Whiteboard analysis remains available via explicit WHITEBOARD_IMAGE_TOPIC
 # ("Show AI" action in the client).
@@ -103,11 +180,36 @@ ISLAMIC_TTS_PRONUNCIATION_RULES: list[tuple[re.Pattern[str], str]] = [
     (re.compile(r"\bsalah\b", re.IGNORECASE), "Salaah"),
     (re.compile(r"\ballah\b", re.IGNORECASE), "Allaah"),
 ]
+# Compiled once per process; every streamed LLM chunk is rewritten in a single scan.
+# One lexicon serves every TTS language: the rules only match Latin-script
+# transliterations, which English and Arabic replies spell the same way.
+TTS_PRONUNCIATION_LEXICON = PronunciationLexicon(ISLAMIC_TTS_PRONUNCIATION_RULES)
 
 load_dotenv(".env.local")
 # Optional runtime tuning via environment:
 # - TUTOR_TTS_LANGUAGE: "en" (default) or "ar"
 # - TUTOR_TTS_PRONUNCIATION_DICT_ID: Cartesia pronunciation dictionary ID
+# - WHITEBOARD_CPU_WORKERS: threads shared by all sessions for whiteboard
+#   render/encode/decode work (default 2)
+# - DATA_PACKET_OFFLOAD_BYTES: data-channel packets larger than this are
+#   decoded on that pool instead of the event loop (default 32 KiB)
+# - DATA_PACKET_CODEC: "msgspec", "orjson" or "json" for data-channel
+#   packets (default: the fastest one installed)
+# - WHITEBOARD_COALESCE_MS: inbound project snapshots from one sender within
+#   this window collapse to the newest (default 100; 0 disables)
+# - WHITEBOARD_INK_TOLERANCE: inbound normalized strokes are simplified so no
+#   dropped point is further than this from the kept line, in normalized
+#   board units (default 0.001, about a pixel; 0 only drops repeated points)
+# - WHITEBOARD_MEMORY_BUDGET_MB: whiteboard memory one session may hold; older
+#   ink is compacted, then the oldest strokes are dropped (default 32; 0 only
+#   keeps the gauge)
+# - WHITEBOARD_UNLOCK_DELAY_MS: after the agent's last board edit, student
+#   drawing is re-enabled this much later so chained tool calls share one
+#   lock (default 1500; 0 unlocks immediately)
+# - WHITEBOARD_IMAGE_MAX_BYTES: largest inbound whiteboard capture accepted
+#   (default 8 MiB)
+# - WHITEBOARD_VISION_MAX_EDGE / WHITEBOARD_VISION_MAX_BYTES: longest edge and
+#   byte budget for whiteboard images sent to the vision model
 SUPPORTED_TUTOR_TTS_LANGUAGES: set[str] = {"en", "ar"}
 DEFAULT_TUTOR_TTS_LANGUAGE = "en"
 _env_tts_language = os.getenv("TUTOR_TTS_LANGUAGE", DEFAULT_TUTOR_TTS_LANGUAGE).strip().lower()
@@ -123,6 +225,223 @@ DEFAULT_TUTOR_TTS_PRONUNCIATION_DICT_ID = os.getenv(
     "TUTOR_TTS_PRONUNCIATION_DICT_ID",
     "",
 ).strip()
+try:
+    configure_cpu_executor(int(os.getenv("WHITEBOARD_CPU_WORKERS", "2")))
+except ValueError:
+    logger.warning("Invalid WHITEBOARD_CPU_WORKERS; using the default pool size.")
+try:
+    DATA_PACKET_OFFLOAD_BYTES = int(
+        os.getenv("DATA_PACKET_OFFLOAD_BYTES", str(DEFAULT_OFFLOAD_BYTES))
+    )
+except ValueError:
+    logger.warning("Invalid DATA_PACKET_OFFLOAD_BYTES; using the default threshold.")
+    DATA_PACKET_OFFLOAD_BYTES = DEFAULT_OFFLOAD_BYTES
+_env_packet_codec = os.getenv("DATA_PACKET_CODEC", "").strip().lower()
+if _env_packet_codec and packet_codec.select_backend(_env_packet_codec) != _env_packet_codec:
+    logger.warning(
+        "DATA_PACKET_CODEC='%s' is not installed. Falling back to '%s'.",
+        _env_packet_codec,
+        packet_codec.current_backend(),
+    )
+try:
+    WHITEBOARD_COALESCE_MS = int(os.getenv("WHITEBOARD_COALESCE_MS", "100"))
+except ValueError:
+    logger.warning("Invalid WHITEBOARD_COALESCE_MS; using the default window.")
+    WHITEBOARD_COALESCE_MS = 100
+try:
+    WHITEBOARD_INK_TOLERANCE = float(
+        os.getenv("WHITEBOARD_INK_TOLERANCE", str(DEFAULT_INK_TOLERANCE))
+    )
+except ValueError:
+    logger.warning("Invalid WHITEBOARD_INK_TOLERANCE; using the default tolerance.")
+    WHITEBOARD_INK_TOLERANCE = DEFAULT_INK_TOLERANCE
+try:
+    WHITEBOARD_MEMORY_BUDGET_BYTES = int(
+        float(
+            os.getenv(
+                "WHITEBOARD_MEMORY_BUDGET_MB",
+                str(DEFAULT_MEMORY_BUDGET_BYTES // (1024 * 1024)),
+            )
+        )
+        * 1024
+        * 1024
+    )
+except ValueError:
+    logger.warning("Invalid WHITEBOARD_MEMORY_BUDGET_MB; using the default budget.")
+    WHITEBOARD_MEMORY_BUDGET_BYTES = DEFAULT_MEMORY_BUDGET_BYTES
+try:
+    WHITEBOARD_UNLOCK_DELAY_MS = int(
+        os.getenv("WHITEBOARD_UNLOCK_DELAY_MS", str(int(DEFAULT_UNLOCK_DELAY_S * 1000)))
+    )
+except ValueError:
+    logger.warning("Invalid WHITEBOARD_UNLOCK_DELAY_MS; using the default delay.")
+    WHITEBOARD_UNLOCK_DELAY_MS = int(DEFAULT_UNLOCK_DELAY_S * 1000)
+try:
+    WHITEBOARD_IMAGE_MAX_BYTES = int(
+        os.getenv("WHITEBOARD_IMAGE_MAX_BYTES", str(DEFAULT_MAX_IMAGE_BYTES))
+    )
+except ValueError:
+    logger.warning("Invalid WHITEBOARD_IMAGE_MAX_BYTES; using the default limit.")
+    WHITEBOARD_IMAGE_MAX_BYTES = DEFAULT_MAX_IMAGE_BYTES
+try:
+    WHITEBOARD_VISION_MAX_EDGE = int(
+        os.getenv("WHITEBOARD_VISION_MAX_EDGE", str(DEFAULT_VISION_MAX_EDGE))
+    )
+    WHITEBOARD_VISION_MAX_BYTES = int(
+        os.getenv("WHITEBOARD_VISION_MAX_BYTES", str(DEFAULT_VISION_MAX_BYTES))
+    )
+except ValueError:
+    logger.warning("Invalid whiteboard vision limits; using defaults.")
+    WHITEBOARD_VISION_MAX_EDGE = DEFAULT_VISION_MAX_EDGE
+    WHITEBOARD_VISION_MAX_BYTES = DEFAULT_VISION_MAX_BYTES
+
+
+TUTOR_INSTRUCTIONS_TEMPLATE = """
+  Muslim Professional Tutor Agent (Islamic Tutor for Children)
+
+  STUDENT INFORMATION: You are currently tutoring a student named {{metadata.user_name}}. Remember and use their name naturally throughout the conversation.
+
+  STUDENT CLASS SCHEDULE: {{metadata.class_schedule}}
+  CLASS SCHEDULE STATUS: {{metadata.class_schedule_status}}
+  CURRENT LOCAL DATETIME: {{metadata.current_local_readable}}
+  CURRENT LOCAL DATE: {{metadata.current_local_date}}
+  CURRENT LOCAL WEEKDAY: {{metadata.current_local_weekday}}
+  CURRENT LOCAL TIMEZONE: {{metadata.user_timezone}}
+  Schedule handling rule: If the student asks about their classes or schedule, answer directly using the STUDENT CLASS SCHEDULE text above before asking any follow-up question.
+  If the schedule text says "No upcoming classes scheduled." or "Unable to load class schedule.", state that clearly and then offer to help them plan study time.
+  Access confirmation rule: If the student asks whether you have access to their class schedule, answer yes. Then quote or summarize the STUDENT CLASS SCHEDULE you were given. Only say schedule access is unavailable when CLASS SCHEDULE STATUS is "unavailable".
+  Date grounding rules:
+  - Treat CURRENT LOCAL DATETIME as the source of truth for "today", "now", "tonight", "tomorrow", and weekday references.
+  - Never state a different current date than CURRENT LOCAL DATE.
+  - If asked about classes "today", only confirm classes that occur on CURRENT LOCAL DATE in CURRENT LOCAL TIMEZONE.
+  - If no class occurs on CURRENT LOCAL DATE, clearly say there is no class today and then mention the next upcoming class date/time.
+  - When correcting date confusion, include the exact date in words (for example: Monday, February 23, 2026).
+  SESSION ROLE: {{metadata.user_role}}
+  TEACHER ACTIONS ENABLED: {{metadata.teacher_actions_enabled}}
+  Role handling rules:
+  - If SESSION ROLE is teacher, treat {{metadata.user_name}} as a teacher and not as a student.
+  - Only use teacher scheduling tools when SESSION ROLE is teacher and TEACHER ACTIONS ENABLED is true.
+  - If SESSION ROLE is student, never call teacher_list_classes, teacher_clock_me_in, teacher_reschedule_class or teacher_reschedule_classes.
+  - If a student asks to change class times, clock in, or modify any schedule, politely refuse and tell them to ask their teacher to make the change.
+  - Only confirm teacher clock-in/reschedule as completed when tool results report success.
+  - If SESSION ROLE is student, keep normal tutoring behavior focused on learning help only.
+  - Teacher scheduling safety: before changing class times, ask whether the teacher means today only or all future classes for that student if unclear, then summarize and get explicit confirmation before calling a write tool.
+  - Teacher timezone rule: interpret all teacher schedule times in {{metadata.user_timezone}} unless the teacher gives a different timezone.
+  - CRITICAL DATETIME RULE: When calling teacher_reschedule_class or teacher_reschedule_classes, you MUST provide full ISO 8601 datetime strings in format YYYY-MM-DDTHH:MM:SS (e.g., 2024-03-15T16:00:00 for 4 PM on March 15, 2024). NEVER use just a time like "16:00". Always confirm the specific date with the teacher by stating it back: "Just to confirm, you want to change the class on [date] from [old time] to [new time], correct?" before calling the tool.
+
+  Role and purpose: You are Alluwal, a Muslim professional tutor who teaches children with kindness, clarity, and strong Islamic adab (ah-dahb). Your goal is to help {{metadata.user_name}} learn school topics and, whenever appropriate, connect learning to Islamic values, akhlaq (akh-lahk), and age-appropriate stories from the Qur'an (kor-AHN) and the Sunnah (SOON-nah) without harshness or fear-based teaching. You have access to {{metadata.user_name}}'s class schedule and can help them prepare for upcoming classes or remind them about their schedule when asked.
+
+  VISION CAPABILITY: You can see what the student draws on their whiteboard. When they show you their whiteboard, analyze their work carefully and provide helpful feedback. If they are solving math problems, check their work step by step. If they are drawing diagrams, help them understand the concepts. Always be encouraging while gently correcting any mistakes.
+
+  Islamic alignment: Treat Islam as true and guiding; answer through the lens of Islamic knowledge and good character. Use well-known, mainstream teachings; when there are differences of scholarly opinion, mention that more than one view exists in a gentle way and encourage asking a trusted parent, teacher, or local imam (ih-MAHM) for personal rulings. Do not pretend to be a mufti; if asked for a strict legal verdict (fat-wah, FAHT-wah) about a personal situation, give general guidance, emphasize intention (nee-YAH), and suggest speaking to a qualified scholar.
+
+  Teaching persona and style: Be warm, patient, and encouraging while still being honest; praise {{metadata.user_name}}'s effort, but do not blindly agree if they are mistaken. Use child-friendly language and simple analogies. Prefer guided discovery: ask small, leading questions that help {{metadata.user_name}} think, rather than delivering long lectures. Break ideas into tiny steps, check understanding before moving on, and end learning moments with a short takeaway in simple words.
+
+  Output rules for voice mastery (must follow every turn): Respond in plain text only with no markdown, no emojis, and no list formatting. Keep each reply to one to three sentences. Always end your turn with exactly one question to keep the lesson moving. Spell out numbers as words. Use consistent spellings for core terms: Allah, Qur'an, Sunnah, Salah, Bismillah, Alhamdulillah, SubhanAllah, Allahu Akbar, InshaAllah, and MashaAllah. Never spell these terms letter by letter (for example, never write A-L-L-A-H). When using other Arabic or Islamic terms that might be hard to pronounce, include a phonetic spelling in parentheses the first time you use the term in the conversation; avoid Arabic script to prevent speech errors.
+
+  Conversation flow: Start by learning {{metadata.user_name}}'s age or grade level and what they want to learn today. If they ask about their schedule, refer to their class schedule information. Teach in short steps; after each step, ask a single question to confirm understanding or invite {{metadata.user_name}} to apply the idea. If they show confusion, re-explain with an easier example and try again. When {{metadata.user_name}} wants an Islamic story, focus on the moral lesson and how to practice it today. When they ask about sensitive topics, respond with calm adab, keep it age-appropriate, and redirect to a safe and constructive learning point.
+
+  Whiteboard interaction tools: You can directly interact with the shared whiteboard. Use whiteboard_set_student_drawing to lock or unlock student drawing, whiteboard_draw_line and whiteboard_draw_rectangle for geometry, whiteboard_write_equation and whiteboard_write_text for clean writing, whiteboard_erase_last for undo, and whiteboard_clear to reset the board. To draw several elements at once, such as a labeled diagram, use whiteboard_apply_ops with the whole list of operations so they appear in a single board update. When the student asks you to draw or write on the board, call these tools instead of only describing the action. For equations, prefer whiteboard_write_equation so expressions render clearly. For multi-step board updates, lock student drawing first, do the board actions, then unlock student drawing.
+  Teacher operational tools: For teacher sessions, use teacher_list_classes to answer questions about the teacher's classes and to look up shift ids, teacher_clock_me_in to clock into class and teacher_reschedule_class to change class times. When one request changes several classes, such as moving all Tuesday classes, summarize every change, get one confirmation, and send them together with teacher_reschedule_classes. Never execute a schedule change without explicit confirmation from the teacher and a clear scope (single class or all future classes).
+
+  Boundaries and safety: Never promote harm, hatred, or disrespect toward any people. If {{metadata.user_name}} asks for something inappropriate or dangerous, refuse gently, explain the safer path, and steer back to learning and good character. For medical, legal, or urgent personal issues, encourage them to speak to a trusted adult and provide only general, safety-first guidance.
+
+  Recommended welcome message: As-salamu alaykum {{metadata.user_name}} I am so excited to be your learning buddy today. We can talk about school subjects or explore beautiful stories from Islamic history. What would you like to learn about first?"""
+TEACHER_GREETING_TEMPLATE = """Greet the teacher warmly. Address them as {{metadata.user_name}}. Mention that you can help with schedule questions, class time changes, and clock-in actions."""
+STUDENT_GREETING_TEMPLATE = """Greet the user warmly. Address them as {{metadata.user_name}}. Offer your assistance as their learning buddy."""
+# Templates compiled ahead of time by `python agent.py download-files`.
+PRECOMPILED_TEMPLATES: tuple[str, ...] = (
+    TUTOR_INSTRUCTIONS_TEMPLATE,
+    TEACHER_GREETING_TEMPLATE,
+    STUDENT_GREETING_TEMPLATE,
+)
+# Optional runtime tuning via environment:
+# - TUTOR_TEMPLATE_CACHE_DIR: where precompiled pybars templates are stored
+TEMPLATE_CACHE_DIR = os.getenv(
+    "TUTOR_TEMPLATE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".template_cache"),
+).strip()
+
+# Process-wide compiled templates keyed by template hash. Shared by every job
+# that runs in this worker process so the tutor instructions compile once.
+_compiled_templates: dict[str, Callable[[dict], str]] = {}
+_template_compiler: pybars.Compiler | None = None
+
+
+def _template_key(template: str) -> str:
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()
+
+
+def _template_cache_path(key: str, cache_dir: str | None = None) -> str:
+    return os.path.join(cache_dir or TEMPLATE_CACHE_DIR, f"{key}.py")
+
+
+def _get_template_compiler() -> pybars.Compiler:
+    global _template_compiler
+    if _template_compiler is None:
+        _template_compiler = pybars.Compiler()
+    return _template_compiler
+
+
+def _load_precompiled_template(
+    key: str, cache_dir: str | None = None
+) -> Callable[[dict], str] | None:
+    path = _template_cache_path(key, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+    except OSError:
+        return None
+
+    namespace: dict[str, object] = {}
+    try:
+        # Precompiled code checks the pybars version itself and raises on mismatch.
+        exec(compile(code, path, "exec", dont_inherit=True), namespace)
+    except Exception as e:
+        logger.warning("Templates: ignoring stale precompiled template %s (%s)", path, e)
+        return None
+
+    render = namespace.get("render")
+    return render if callable(render) else None
+
+
+def compile_template(template: str) -> Callable[[dict], str]:
+    key = _template_key(template)
+    compiled = _compiled_templates.get(key)
+    if compiled is not None:
+        return compiled
+
+    compiled = _load_precompiled_template(key)
+    if compiled is None:
+        compiled = _get_template_compiler().compile(template)
+    _compiled_templates[key] = compiled
+    return compiled
+
+
+def precompile_templates(
+    templates: tuple[str, ...] = PRECOMPILED_TEMPLATES,
+    cache_dir: str | None = None,
+) -> int:
+    """Write pybars templates to disk as Python source for new worker processes."""
+    target_dir = cache_dir or TEMPLATE_CACHE_DIR
+    os.makedirs(target_dir, exist_ok=True)
+    compiler = _get_template_compiler()
+    written = 0
+    for template in templates:
+        path = _template_cache_path(_template_key(template), target_dir)
+        code = compiler.precompile(template)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(code)
+        os.replace(tmp_path, path)
+        written += 1
+    logger.info("Templates: precompiled %d template(s) into %s", written, target_dir)
+    return written
+
+
+def warm_template_cache(templates: tuple[str, ...] = PRECOMPILED_TEMPLATES) -> None:
+    for template in templates:
+        compile_template(template)
 
 
 class VariableTemplater:
@@ -132,8 +451,6 @@ class VariableTemplater:
         }
         if additional:
             self.variables.update(additional)
-        self._cache = {}
-        self._compiler = pybars.Compiler()
 
     def _parse_metadata(self, metadata: str) -> dict:
         try:
@@ -147,10 +464,7 @@ class VariableTemplater:
             return {}
 
     def _compile(self, template: str):
-        if template in self._cache:
-            return self._cache[template]
-        self._cache[template] = self._compiler.compile(template)
-        return self._cache[template]
+        return compile_template(template)
 
     def render(self, template: str):
         return self._compile(template)(self.variables)
@@ -187,6 +501,17 @@ class DefaultAgent(Agent):
         self._teacher_actions_enabled = (
             teacher_actions_enabled and self._user_role == "teacher"
         )
+        self._teacher_actions_supported = parse_supported_actions(
+            metadata_dict.get("teacher_actions_supported")
+        )
+        whiteboard_delta_raw = metadata_dict.get("whiteboard_delta_enabled")
+        self._whiteboard_delta_enabled = (
+            whiteboard_delta_raw is True
+            or (
+                isinstance(whiteboard_delta_raw, str)
+                and whiteboard_delta_raw.strip().lower() in {"1", "true", "yes", "on"}
+            )
+        )
         interaction_mode = str(
             metadata_dict.get("interaction_mode") or "voice"
         ).strip().lower()
@@ -235,77 +560,39 @@ class DefaultAgent(Agent):
             or ""
         ).strip()
         self._publish_whiteboard_message_cb: Callable[[dict], Awaitable[None]] | None = None
-        self._get_whiteboard_project_cb: Callable[[], dict] | None = None
+        self._get_whiteboard_document_cb: Callable[[], WhiteboardDocument] | None = None
+        self._get_whiteboard_index_cb: Callable[[], WhiteboardIdIndex] | None = None
+        self._drawing_lock: StudentDrawingLock | None = None
+        self._publish_whiteboard_change_cb: Callable[[dict], Awaitable[None]] | None = None
         self._request_teacher_action_cb: Callable[[str, dict], Awaitable[dict]] | None = None
+        self._teacher_schedule: TeacherScheduleCache | None = None
         super().__init__(
-            instructions=self._templater.render("""
-  Muslim Professional Tutor Agent (Islamic Tutor for Children)
-
-  STUDENT INFORMATION: You are currently tutoring a student named {{metadata.user_name}}. Remember and use their name naturally throughout the conversation.
-
-  STUDENT CLASS SCHEDULE: {{metadata.class_schedule}}
-  CLASS SCHEDULE STATUS: {{metadata.class_schedule_status}}
-  CURRENT LOCAL DATETIME: {{metadata.current_local_readable}}
-  CURRENT LOCAL DATE: {{metadata.current_local_date}}
-  CURRENT LOCAL WEEKDAY: {{metadata.current_local_weekday}}
-  CURRENT LOCAL TIMEZONE: {{metadata.user_timezone}}
-  Schedule handling rule: If the student asks about their classes or schedule, answer directly using the STUDENT CLASS SCHEDULE text above before asking any follow-up question.
-  If the schedule text says "No upcoming classes scheduled." or "Unable to load class schedule.", state that clearly and then offer to help them plan study time.
-  Access confirmation rule: If the student asks whether you have access to their class schedule, answer yes. Then quote or summarize the STUDENT CLASS SCHEDULE you were given. Only say schedule access is unavailable when CLASS SCHEDULE STATUS is "unavailable".
-  Date grounding rules:
-  - Treat CURRENT LOCAL DATETIME as the source of truth for "today", "now", "tonight", "tomorrow", and weekday references.
-  - Never state a different current date than CURRENT LOCAL DATE.
-  - If asked about classes "today", only confirm classes that occur on CURRENT LOCAL DATE in CURRENT LOCAL TIMEZONE.
-  - If no class occurs on CURRENT LOCAL DATE, clearly say there is no class today and then mention the next upcoming class date/time.
-  - When correcting date confusion, include the exact date in words (for example: Monday, February 23, 2026).
-  SESSION ROLE: {{metadata.user_role}}
-  TEACHER ACTIONS ENABLED: {{metadata.teacher_actions_enabled}}
-  Role handling rules:
-  - If SESSION ROLE is teacher, treat {{metadata.user_name}} as a teacher and not as a student.
-  - Only use teacher scheduling tools when SESSION ROLE is teacher and TEACHER ACTIONS ENABLED is true.
-  - If SESSION ROLE is student, never call teacher_clock_me_in or teacher_reschedule_class.
-  - If a student asks to change class times, clock in, or modify any schedule, politely refuse and tell them to ask their teacher to make the change.
-  - Only confirm teacher clock-in/reschedule as completed when tool results report success.
-  - If SESSION ROLE is student, keep normal tutoring behavior focused on learning help only.
-  - Teacher scheduling safety: before changing class times, ask whether the teacher means today only or all future classes for that student if unclear, then summarize and get explicit confirmation before calling a write tool.
-  - Teacher timezone rule: interpret all teacher schedule times in {{metadata.user_timezone}} unless the teacher gives a different timezone.
-  - CRITICAL DATETIME RULE: When calling teacher_reschedule_class, you MUST provide full ISO 8601 datetime strings in format YYYY-MM-DDTHH:MM:SS (e.g., 2024-03-15T16:00:00 for 4 PM on March 15, 2024). NEVER use just a time like "16:00". Always confirm the specific date with the teacher by stating it back: "Just to confirm, you want to change the class on [date] from [old time] to [new time], correct?" before calling the tool.
-
-  Role and purpose: You are Alluwal, a Muslim professional tutor who teaches children with kindness, clarity, and strong Islamic adab (ah-dahb). Your goal is to help {{metadata.user_name}} learn school topics and, whenever appropriate, connect learning to Islamic values, akhlaq (akh-lahk), and age-appropriate stories from the Qur'an (kor-AHN) and the Sunnah (SOON-nah) without harshness or fear-based teaching. You have access to {{metadata.user_name}}'s class schedule and can help them prepare for upcoming classes or remind them about their schedule when asked.
-
-  VISION CAPABILITY: You can see what the student draws on their whiteboard. When they show you their whiteboard, analyze their work carefully and provide helpful feedback. If they are solving math problems, check their work step by step. If they are drawing diagrams, help them understand the concepts. Always be encouraging while gently correcting any mistakes.
-
-  Islamic alignment: Treat Islam as true and guiding; answer through the lens of Islamic knowledge and good character. Use well-known, mainstream teachings; when there are differences of scholarly opinion, mention that more than one view exists in a gentle way and encourage asking a trusted parent, teacher, or local imam (ih-MAHM) for personal rulings. Do not pretend to be a mufti; if asked for a strict legal verdict (fat-wah, FAHT-wah) about a personal situation, give general guidance, emphasize intention (nee-YAH), and suggest speaking to a qualified scholar.
-
-  Teaching persona and style: Be warm, patient, and encouraging while still being honest; praise {{metadata.user_name}}'s effort, but do not blindly agree if they are mistaken. Use child-friendly language and simple analogies. Prefer guided discovery: ask small, leading questions that help {{metadata.user_name}} think, rather than delivering long lectures. Break ideas into tiny steps, check understanding before moving on, and end learning moments with a short takeaway in simple words.
-
-  Output rules for voice mastery (must follow every turn): Respond in plain text only with no markdown, no emojis, and no list formatting. Keep each reply to one to three sentences. Always end your turn with exactly one question to keep the lesson moving. Spell out numbers as words. Use consistent spellings for core terms: Allah, Qur'an, Sunnah, Salah, Bismillah, Alhamdulillah, SubhanAllah, Allahu Akbar, InshaAllah, and MashaAllah. Never spell these terms letter by letter (for example, never write A-L-L-A-H). When using other Arabic or Islamic terms that might be hard to pronounce, include a phonetic spelling in parentheses the first time you use the term in the conversation; avoid Arabic script to prevent speech errors.
-
-  Conversation flow: Start by learning {{metadata.user_name}}'s age or grade level and what they want to learn today. If they ask about their schedule, refer to their class schedule information. Teach in short steps; after each step, ask a single question to confirm understanding or invite {{metadata.user_name}} to apply the idea. If they show confusion, re-explain with an easier example and try again. When {{metadata.user_name}} wants an Islamic story, focus on the moral lesson and how to practice it today. When they ask about sensitive topics, respond with calm adab, keep it age-appropriate, and redirect to a safe and constructive learning point.
-
-  Whiteboard interaction tools: You can directly interact with the shared whiteboard. Use whiteboard_set_student_drawing to lock or unlock student drawing, whiteboard_draw_line and whiteboard_draw_rectangle for geometry, whiteboard_write_equation and whiteboard_write_text for clean writing, whiteboard_erase_last for undo, and whiteboard_clear to reset the board. When the student asks you to draw or write on the board, call these tools instead of only describing the action. For equations, prefer whiteboard_write_equation so expressions render clearly. For multi-step board updates, lock student drawing first, do the board actions, then unlock student drawing.
-  Teacher operational tools: For teacher sessions, use teacher_clock_me_in to clock into class and teacher_reschedule_class to change class times. Never execute a schedule change without explicit confirmation from the teacher and a clear scope (single class or all future classes).
-
-  Boundaries and safety: Never promote harm, hatred, or disrespect toward any people. If {{metadata.user_name}} asks for something inappropriate or dangerous, refuse gently, explain the safer path, and steer back to learning and good character. For medical, legal, or urgent personal issues, encourage them to speak to a trusted adult and provide only general, safety-first guidance.
-
-  Recommended welcome message: As-salamu alaykum {{metadata.user_name}} I am so excited to be your learning buddy today. We can talk about school subjects or explore beautiful stories from Islamic history. What would you like to learn about first?"""),
+            instructions=self._templater.render(TUTOR_INSTRUCTIONS_TEMPLATE),
         )
 
     def configure_whiteboard_bridge(
         self,
         *,
         publish_message_cb: Callable[[dict], Awaitable[None]],
-        get_project_cb: Callable[[], dict],
+        get_document_cb: Callable[[], WhiteboardDocument],
+        publish_change_cb: Callable[[dict], Awaitable[None]],
+        get_index_cb: Callable[[], WhiteboardIdIndex],
+        drawing_lock: StudentDrawingLock,
     ) -> None:
         self._publish_whiteboard_message_cb = publish_message_cb
-        self._get_whiteboard_project_cb = get_project_cb
+        self._get_whiteboard_document_cb = get_document_cb
+        self._publish_whiteboard_change_cb = publish_change_cb
+        self._get_whiteboard_index_cb = get_index_cb
+        self._drawing_lock = drawing_lock
 
     def configure_teacher_action_bridge(
         self,
         *,
         request_action_cb: Callable[[str, dict], Awaitable[dict]],
+        schedule: TeacherScheduleCache | None = None,
     ) -> None:
         self._request_teacher_action_cb = request_action_cb
+        self._teacher_schedule = schedule
 
     def _require_teacher_action_bridge(
         self,
@@ -331,46 +618,127 @@ class DefaultAgent(Agent):
             raise llm.ToolError("invalid response from teacher action executor")
         return result
 
+    async def _load_teacher_schedule(self, shift_ids: list[str]) -> ShiftSchedule | None:
+        """The cached shift list, refetched once if it lacks one of `shift_ids`."""
+        if self._teacher_schedule is None:
+            return None
+        schedule = await self._teacher_schedule.get()
+        if schedule is not None and any(schedule.get(shift_id) is None for shift_id in shift_ids):
+            schedule = await self._teacher_schedule.get(refresh=True)
+        return schedule
+
+    async def _check_reschedules(self, items: list[tuple[str, dict]]) -> None:
+        self._require_teacher_action_bridge()
+        schedule = await self._load_teacher_schedule(
+            [str(args["shiftId"]) for _, args in items if args.get("shiftId")]
+        )
+        check_reschedules(schedule, items)
+
     def _clamp01(self, value: float) -> float:
         return max(0.0, min(1.0, float(value)))
 
     def _apply_tts_pronunciation_lexicon(self, text: str) -> str:
-        normalized = text
-        for pattern, replacement in ISLAMIC_TTS_PRONUNCIATION_RULES:
-            normalized = pattern.sub(replacement, normalized)
-        return normalized
+        return TTS_PRONUNCIATION_LEXICON.apply(text)
 
     async def _tts_pronunciation_stream(self, text: AsyncIterable[str]) -> AsyncIterable[str]:
+        # Terms split across LLM deltas ("Alham" + "dulillah") are held back only
+        # until they can no longer match a lexicon rule.
+        normalizer = TTS_PRONUNCIATION_LEXICON.streaming_normalizer()
         async for chunk in text:
             if not isinstance(chunk, str):
                 continue
-            yield self._apply_tts_pronunciation_lexicon(chunk)
+            ready = normalizer.feed(chunk)
+            if ready:
+                yield ready
+        tail = normalizer.flush()
+        if tail:
+            yield tail
+        stats = normalizer.stats
+        if stats.held_chunks:
+            logger.debug(
+                "TTS lexicon: held back %d/%d chunks (max %d chars), "
+                "added %.1f ms total, %.1f ms max per turn",
+                stats.held_chunks,
+                stats.chunks,
+                stats.max_held_chars,
+                stats.total_hold_ms,
+                stats.max_hold_ms,
+            )
 
     def tts_node(self, text: AsyncIterable[str], model_settings):
         tts_ready_text = self._tts_pronunciation_stream(text)
         return super().tts_node(tts_ready_text, model_settings)
 
-    def _require_whiteboard_bridge(
+    def _require_whiteboard_bridge(self) -> None:
+        if (
+            self._publish_whiteboard_message_cb is None
+            or self._get_whiteboard_document_cb is None
+            or self._publish_whiteboard_change_cb is None
+            or self._get_whiteboard_index_cb is None
+            or self._drawing_lock is None
+        ):
+            raise llm.ToolError("whiteboard bridge is not initialized")
+
+    async def _publish_whiteboard_change(
         self,
-    ) -> tuple[Callable[[dict], Awaitable[None]], Callable[[], dict]]:
-        if self._publish_whiteboard_message_cb is None or self._get_whiteboard_project_cb is None:
+        *,
+        add_strokes: list[StrokeItem] | None = None,
+        add_texts: list[TextItem] | None = None,
+        remove_ids: list[str] | None = None,
+        clear: bool = False,
+    ) -> None:
+        publish_change = self._publish_whiteboard_change_cb
+        if publish_change is None:
             raise llm.ToolError("whiteboard bridge is not initialized")
-        return self._publish_whiteboard_message_cb, self._get_whiteboard_project_cb
+        await publish_change(
+            {
+                "clear": clear,
+                "remove": list(remove_ids or []),
+                "add_strokes": list(add_strokes or []),
+                "add_texts": list(add_texts or []),
+            }
+        )
+
+    def _line_points(
+        self, x1: float, y1: float, x2: float, y2: float
+    ) -> list[tuple[float, float]]:
+        return [
+            (self._clamp01(x1), self._clamp01(y1)),
+            (self._clamp01(x2), self._clamp01(y2)),
+        ]
+
+    def _rectangle_points(
+        self, x1: float, y1: float, x2: float, y2: float
+    ) -> list[tuple[float, float]]:
+        ax = self._clamp01(min(x1, x2))
+        ay = self._clamp01(min(y1, y2))
+        bx = self._clamp01(max(x1, x2))
+        by = self._clamp01(max(y1, y2))
+        return [(ax, ay), (bx, ay), (bx, by), (ax, by), (ax, ay)]
+
+    @staticmethod
+    def _erase_kind(target: str | None) -> str | None:
+        normalized_target = (target or "any").strip().lower()
+        if normalized_target == "strokes":
+            return STROKE_KIND
+        if normalized_target in {"texts", "text"}:
+            return TEXT_KIND
+        return None
 
     def _new_stroke(
         self,
-        points: list[dict[str, float]],
+        points: list[tuple[float, float]],
         *,
         color_argb: int,
         stroke_width: float,
-    ) -> dict:
-        return {
-            "id": f"agent_{int(time.time() * 1000)}_{len(points)}",
-            "points": points,
-            "color": int(color_argb),
-            "strokeWidth": float(stroke_width),
-            "normalized": True,
-        }
+    ) -> StrokeItem:
+        return StrokeItem(
+            new_item_id("agent"),
+            StrokePoints.from_pairs(points),
+            color=int(color_argb),
+            stroke_width=float(stroke_width),
+            normalized=True,
+        )
 
     def _new_text_item(
         self,
@@ -380,55 +748,26 @@ class DefaultAgent(Agent):
         y: float,
         color_argb: int,
         font_size: float,
-    ) -> dict:
+    ) -> TextItem:
         clean_text = text.strip()
         if not clean_text:
             raise llm.ToolError("text cannot be empty")
-        return {
-            "id": f"agent_text_{int(time.time() * 1000)}_{len(clean_text)}",
-            "text": clean_text[:220],
-            "x": self._clamp01(x),
-            "y": self._clamp01(y),
-            "color": int(color_argb),
-            "fontSize": float(max(12.0, min(72.0, font_size))),
-            "normalized": True,
-        }
-
-    def _ensure_project_lists(self, project: dict) -> tuple[list, list]:
-        strokes = project.get("strokes")
-        if not isinstance(strokes, list):
-            strokes = []
-            project["strokes"] = strokes
-
-        texts = project.get("texts")
-        if not isinstance(texts, list):
-            texts = []
-            project["texts"] = texts
-
-        return strokes, texts
-
-    def _extract_item_timestamp(self, item_id: str | None, fallback: int) -> int:
-        if not item_id:
-            return fallback
-        match = re.search(r"(\d{9,})", item_id)
-        if match is None:
-            return fallback
-        try:
-            return int(match.group(1))
-        except Exception:
-            return fallback
+        return TextItem(
+            new_item_id("agent_text"),
+            clean_text[:220],
+            self._clamp01(x),
+            self._clamp01(y),
+            color=int(color_argb),
+            font_size=float(max(12.0, min(72.0, font_size))),
+            normalized=True,
+        )
 
     @llm.function_tool(
         description="Enable or disable the student's ability to draw on the shared whiteboard."
     )
     async def whiteboard_set_student_drawing(self, enabled: bool) -> str:
-        publish_message, _ = self._require_whiteboard_bridge()
-        await publish_message(
-            {
-                "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                "payload": {"enabled": bool(enabled)},
-            }
-        )
+        self._require_whiteboard_bridge()
+        await self._drawing_lock.set_explicit(not enabled)
         return (
             "Student drawing enabled."
             if enabled
@@ -448,42 +787,17 @@ class DefaultAgent(Agent):
         stroke_width: float = 4.0,
         lock_student_while_drawing: bool = True,
     ) -> str:
-        publish_message, get_project = self._require_whiteboard_bridge()
-        if lock_student_while_drawing:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                    "payload": {"enabled": False},
-                }
-            )
-
-        try:
-            project = get_project()
-            strokes, _ = self._ensure_project_lists(project)
-
-            line_points = [
-                {"x": self._clamp01(x1), "y": self._clamp01(y1)},
-                {"x": self._clamp01(x2), "y": self._clamp01(y2)},
-            ]
-            strokes.append(
-                self._new_stroke(
-                    line_points,
-                    color_argb=color_argb,
-                    stroke_width=stroke_width,
-                )
-            )
-            project["version"] = 2
-            await publish_message(
-                {"type": WHITEBOARD_MSG_TYPE_PROJECT, "payload": project}
+        self._require_whiteboard_bridge()
+        async with self._drawing_lock.hold(lock_student_while_drawing):
+            await self._publish_whiteboard_change(
+                add_strokes=[
+                    self._new_stroke(
+                        self._line_points(x1, y1, x2, y2),
+                        color_argb=color_argb,
+                        stroke_width=stroke_width,
+                    )
+                ]
             )
-        finally:
-            if lock_student_while_drawing:
-                await publish_message(
-                    {
-                        "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                        "payload": {"enabled": True},
-                    }
-                )
 
         return "Drew a line on the whiteboard."
 
@@ -500,50 +814,17 @@ class DefaultAgent(Agent):
         stroke_width: float = 4.0,
         lock_student_while_drawing: bool = True,
     ) -> str:
-        publish_message, get_project = self._require_whiteboard_bridge()
-        if lock_student_while_drawing:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                    "payload": {"enabled": False},
-                }
-            )
-
-        try:
-            ax = self._clamp01(min(x1, x2))
-            ay = self._clamp01(min(y1, y2))
-            bx = self._clamp01(max(x1, x2))
-            by = self._clamp01(max(y1, y2))
-
-            project = get_project()
-            strokes, _ = self._ensure_project_lists(project)
-
-            rect_points = [
-                {"x": ax, "y": ay},
-                {"x": bx, "y": ay},
-                {"x": bx, "y": by},
-                {"x": ax, "y": by},
-                {"x": ax, "y": ay},
-            ]
-            strokes.append(
-                self._new_stroke(
-                    rect_points,
-                    color_argb=color_argb,
-                    stroke_width=stroke_width,
-                )
-            )
-            project["version"] = 2
-            await publish_message(
-                {"type": WHITEBOARD_MSG_TYPE_PROJECT, "payload": project}
+        self._require_whiteboard_bridge()
+        async with self._drawing_lock.hold(lock_student_while_drawing):
+            await self._publish_whiteboard_change(
+                add_strokes=[
+                    self._new_stroke(
+                        self._rectangle_points(x1, y1, x2, y2),
+                        color_argb=color_argb,
+                        stroke_width=stroke_width,
+                    )
+                ]
             )
-        finally:
-            if lock_student_while_drawing:
-                await publish_message(
-                    {
-                        "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                        "payload": {"enabled": True},
-                    }
-                )
 
         return "Drew a rectangle on the whiteboard."
 
@@ -562,39 +843,19 @@ class DefaultAgent(Agent):
         font_size: float = 34.0,
         lock_student_while_writing: bool = True,
     ) -> str:
-        publish_message, get_project = self._require_whiteboard_bridge()
-        if lock_student_while_writing:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                    "payload": {"enabled": False},
-                }
-            )
-
-        try:
-            project = get_project()
-            _, texts = self._ensure_project_lists(project)
-            texts.append(
-                self._new_text_item(
-                    text=text,
-                    x=x,
-                    y=y,
-                    color_argb=color_argb,
-                    font_size=font_size,
-                )
-            )
-            project["version"] = 2
-            await publish_message(
-                {"type": WHITEBOARD_MSG_TYPE_PROJECT, "payload": project}
+        self._require_whiteboard_bridge()
+        async with self._drawing_lock.hold(lock_student_while_writing):
+            await self._publish_whiteboard_change(
+                add_texts=[
+                    self._new_text_item(
+                        text=text,
+                        x=x,
+                        y=y,
+                        color_argb=color_argb,
+                        font_size=font_size,
+                    )
+                ]
             )
-        finally:
-            if lock_student_while_writing:
-                await publish_message(
-                    {
-                        "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                        "payload": {"enabled": True},
-                    }
-                )
 
         return "Wrote text on the whiteboard."
 
@@ -613,39 +874,19 @@ class DefaultAgent(Agent):
         color_argb: int = 0xFF111827,
         lock_student_while_writing: bool = True,
     ) -> str:
-        publish_message, get_project = self._require_whiteboard_bridge()
-        if lock_student_while_writing:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                    "payload": {"enabled": False},
-                }
-            )
-
-        try:
-            project = get_project()
-            _, texts = self._ensure_project_lists(project)
-            texts.append(
-                self._new_text_item(
-                    text=equation,
-                    x=x,
-                    y=y,
-                    color_argb=color_argb,
-                    font_size=font_size,
-                )
-            )
-            project["version"] = 2
-            await publish_message(
-                {"type": WHITEBOARD_MSG_TYPE_PROJECT, "payload": project}
+        self._require_whiteboard_bridge()
+        async with self._drawing_lock.hold(lock_student_while_writing):
+            await self._publish_whiteboard_change(
+                add_texts=[
+                    self._new_text_item(
+                        text=equation,
+                        x=x,
+                        y=y,
+                        color_argb=color_argb,
+                        font_size=font_size,
+                    )
+                ]
             )
-        finally:
-            if lock_student_while_writing:
-                await publish_message(
-                    {
-                        "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                        "payload": {"enabled": True},
-                    }
-                )
 
         return "Wrote an equation on the whiteboard."
 
@@ -661,96 +902,20 @@ class DefaultAgent(Agent):
         target: str = "any",
         lock_student_while_drawing: bool = True,
     ) -> str:
-        publish_message, get_project = self._require_whiteboard_bridge()
+        self._require_whiteboard_bridge()
         safe_count = max(1, min(int(count), 50))
 
-        if lock_student_while_drawing:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                    "payload": {"enabled": False},
-                }
+        async with self._drawing_lock.hold(lock_student_while_drawing):
+            # Newest first across strokes and text, from the session's recency index.
+            to_remove = self._get_whiteboard_index_cb().recent(
+                safe_count, self._erase_kind(target)
             )
+            removed_ids = [item_id for _, item_id in to_remove]
+            removed_strokes = sum(1 for item_kind, _ in to_remove if item_kind == STROKE_KIND)
+            removed_texts = len(to_remove) - removed_strokes
 
-        try:
-            project = get_project()
-            strokes, texts = self._ensure_project_lists(project)
-            normalized_target = (target or "any").strip().lower()
-            removed_strokes = 0
-            removed_texts = 0
-
-            if normalized_target == "strokes":
-                remove_count = min(safe_count, len(strokes))
-                if remove_count > 0:
-                    del strokes[-remove_count:]
-                removed_strokes = remove_count
-            elif normalized_target in {"texts", "text"}:
-                remove_count = min(safe_count, len(texts))
-                if remove_count > 0:
-                    del texts[-remove_count:]
-                removed_texts = remove_count
-            else:
-                # Remove recent items across both lists by ID timestamp.
-                combined_items: list[tuple[int, str, int]] = []
-                for idx, stroke in enumerate(strokes):
-                    item_id = (
-                        str(stroke.get("id"))
-                        if isinstance(stroke, dict) and stroke.get("id") is not None
-                        else None
-                    )
-                    combined_items.append(
-                        (self._extract_item_timestamp(item_id, idx), "stroke", idx)
-                    )
-                for idx, text_item in enumerate(texts):
-                    item_id = (
-                        str(text_item.get("id"))
-                        if isinstance(text_item, dict)
-                        and text_item.get("id") is not None
-                        else None
-                    )
-                    combined_items.append(
-                        (self._extract_item_timestamp(item_id, idx), "text", idx)
-                    )
-
-                combined_items.sort(key=lambda item: (item[0], item[2]), reverse=True)
-                to_remove = combined_items[:safe_count]
-                stroke_indexes_to_remove = {
-                    idx for _, kind, idx in to_remove if kind == "stroke"
-                }
-                text_indexes_to_remove = {
-                    idx for _, kind, idx in to_remove if kind == "text"
-                }
-
-                if stroke_indexes_to_remove:
-                    strokes[:] = [
-                        stroke
-                        for idx, stroke in enumerate(strokes)
-                        if idx not in stroke_indexes_to_remove
-                    ]
-                if text_indexes_to_remove:
-                    texts[:] = [
-                        text_item
-                        for idx, text_item in enumerate(texts)
-                        if idx not in text_indexes_to_remove
-                    ]
-
-                removed_strokes = len(stroke_indexes_to_remove)
-                removed_texts = len(text_indexes_to_remove)
-
-            project["strokes"] = strokes
-            project["texts"] = texts
-            project["version"] = 2
-            await publish_message(
-                {"type": WHITEBOARD_MSG_TYPE_PROJECT, "payload": project}
-            )
-        finally:
-            if lock_student_while_drawing:
-                await publish_message(
-                    {
-                        "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                        "payload": {"enabled": True},
-                    }
-                )
+            if removed_ids:
+                await self._publish_whiteboard_change(remove_ids=removed_ids)
 
         return (
             "Erased "
@@ -762,33 +927,129 @@ class DefaultAgent(Agent):
         description="Clear all whiteboard strokes and text."
     )
     async def whiteboard_clear(self, lock_student_while_drawing: bool = True) -> str:
-        publish_message, _ = self._require_whiteboard_bridge()
+        self._require_whiteboard_bridge()
 
-        if lock_student_while_drawing:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                    "payload": {"enabled": False},
-                }
-            )
+        async with self._drawing_lock.hold(lock_student_while_drawing):
+            await self._publish_whiteboard_change(clear=True)
 
-        try:
-            await publish_message(
-                {
-                    "type": WHITEBOARD_MSG_TYPE_PROJECT,
-                    "payload": {"strokes": [], "texts": [], "version": 2},
-                }
-            )
-        finally:
-            if lock_student_while_drawing:
-                await publish_message(
-                    {
-                        "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
-                        "payload": {"enabled": True},
-                    }
+        return "Cleared the whiteboard."
+
+    @llm.function_tool(
+        description=(
+            "Apply several whiteboard operations in one step: line, rectangle, text, "
+            "equation and erase, with normalized coordinates between zero and one. "
+            "They appear together in a single board update, so use this instead of "
+            "separate drawing calls for diagrams with labels or other multi-part drawings."
+        )
+    )
+    async def whiteboard_apply_ops(
+        self,
+        ops: list[WhiteboardOp],
+        lock_student_while_drawing: bool = True,
+    ) -> str:
+        self._require_whiteboard_bridge()
+        if not ops:
+            raise llm.ToolError("ops cannot be empty")
+        if len(ops) > WHITEBOARD_MAX_OPS:
+            raise llm.ToolError(f"at most {WHITEBOARD_MAX_OPS} operations per call")
+
+        # Build the whole change before publishing, so an invalid op leaves
+        # the board untouched.
+        added: list[tuple[str, StrokeItem | TextItem]] = []
+        remove_ids: list[str] = []
+        for op in ops:
+            if isinstance(op, LineOp):
+                points = self._line_points(op.x1, op.y1, op.x2, op.y2)
+                added.append(
+                    (
+                        STROKE_KIND,
+                        self._new_stroke(
+                            points, color_argb=op.color_argb, stroke_width=op.stroke_width
+                        ),
+                    )
+                )
+            elif isinstance(op, RectangleOp):
+                points = self._rectangle_points(op.x1, op.y1, op.x2, op.y2)
+                added.append(
+                    (
+                        STROKE_KIND,
+                        self._new_stroke(
+                            points, color_argb=op.color_argb, stroke_width=op.stroke_width
+                        ),
+                    )
                 )
+            elif isinstance(op, (TextOp, EquationOp)):
+                added.append(
+                    (
+                        TEXT_KIND,
+                        self._new_text_item(
+                            text=op.text if isinstance(op, TextOp) else op.equation,
+                            x=op.x,
+                            y=op.y,
+                            color_argb=op.color_argb,
+                            font_size=op.font_size,
+                        ),
+                    )
+                )
+            else:
+                kind = self._erase_kind(op.target)
+                remaining = max(1, min(int(op.count), 50))
+                # Newest first: items from earlier ops in this batch, then the board.
+                for position in range(len(added) - 1, -1, -1):
+                    if not remaining:
+                        break
+                    if kind is None or added[position][0] == kind:
+                        del added[position]
+                        remaining -= 1
+                if remaining:
+                    already_removed = set(remove_ids)
+                    recent = self._get_whiteboard_index_cb().recent(
+                        remaining + len(already_removed), kind
+                    )
+                    remove_ids.extend(
+                        [item_id for _, item_id in recent if item_id not in already_removed][
+                            :remaining
+                        ]
+                    )
 
-        return "Cleared the whiteboard."
+        add_strokes = [item for kind, item in added if kind == STROKE_KIND]
+        add_texts = [item for kind, item in added if kind == TEXT_KIND]
+        if not (add_strokes or add_texts or remove_ids):
+            return f"Applied {len(ops)} operation(s); the whiteboard did not change."
+
+        async with self._drawing_lock.hold(lock_student_while_drawing):
+            await self._publish_whiteboard_change(
+                add_strokes=add_strokes,
+                add_texts=add_texts,
+                remove_ids=remove_ids,
+            )
+
+        return (
+            f"Applied {len(ops)} operation(s) in one update: added {len(add_strokes)} "
+            f"stroke(s) and {len(add_texts)} text item(s), erased {len(remove_ids)} item(s)."
+        )
+
+    @llm.function_tool(
+        description=(
+            "List the teacher's classes with their shift ids, from the schedule "
+            "loaded at the start of the session. Give a local date (YYYY-MM-DD) "
+            "for that day's classes, or leave it empty for the next few classes. "
+            "Use this to answer teacher schedule questions and to find the shift "
+            "id before clocking in or rescheduling."
+        )
+    )
+    async def teacher_list_classes(self, date_local_iso: str = "") -> str:
+        self._require_teacher_action_bridge()
+        schedule = await self._load_teacher_schedule([])
+        if schedule is None:
+            raise llm.ToolError(
+                "Your class list is not available right now; "
+                "use the class schedule from the session instead."
+            )
+        try:
+            return describe_classes(schedule, date_local_iso, self.get_timezone())
+        except ScheduleError as exc:
+            raise llm.ToolError(str(exc)) from None
 
     @llm.function_tool(
         description=(
@@ -797,9 +1058,17 @@ class DefaultAgent(Agent):
         )
     )
     async def teacher_clock_me_in(self, shift_id: str = "") -> str:
+        self._require_teacher_action_bridge()
+        shift_id = shift_id.strip()
+        schedule = await self._load_teacher_schedule([shift_id] if shift_id else [])
+        try:
+            shift_id = resolve_clock_in(schedule, shift_id)
+        except ScheduleError as exc:
+            raise llm.ToolError(str(exc)) from None
+
         args: dict[str, str] = {}
-        if shift_id.strip():
-            args["shiftId"] = shift_id.strip()
+        if shift_id:
+            args["shiftId"] = shift_id
 
         result = await self._execute_teacher_action(action="clock_in", args=args)
         success = result.get("success") is True
@@ -830,72 +1099,35 @@ class DefaultAgent(Agent):
         timezone: str = "",
         reason: str = "",
     ) -> str:
-        normalized_scope = scope.strip().lower()
-        if normalized_scope in {"today", "today_only", "one_time", "single"}:
-            normalized_scope = "single"
-        elif normalized_scope in {
-            "future",
-            "all_future",
-            "series",
-            "recurring",
-        }:
-            normalized_scope = "future"
-        else:
-            raise llm.ToolError(
-                "Before I reschedule, tell me if this is for today only or all future classes."
-            )
+        try:
+            normalize_scope(scope)
+        except ScheduleError as exc:
+            raise llm.ToolError(str(exc)) from None
 
         if confirmed is not True:
             raise llm.ToolError(
                 "Please explicitly confirm before I make this schedule change."
             )
 
-        # Validate datetime format (must be full ISO 8601: YYYY-MM-DDTHH:MM:SS)
-        iso_pattern = r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2})?$'
-        start_clean = new_start_local_iso.strip()
-        end_clean = new_end_local_iso.strip()
-
-        if not re.match(iso_pattern, start_clean):
-            raise llm.ToolError(
-                f"Invalid start time format '{start_clean}'. "
-                "Please provide a full ISO datetime like 2024-03-15T16:00:00 (include the date)."
-            )
-
-        if not re.match(iso_pattern, end_clean):
-            raise llm.ToolError(
-                f"Invalid end time format '{end_clean}'. "
-                "Please provide a full ISO datetime like 2024-03-15T17:00:00 (include the date)."
+        try:
+            action_name, args = build_reschedule_args(
+                ClassReschedule(
+                    new_start_local_iso=new_start_local_iso,
+                    new_end_local_iso=new_end_local_iso,
+                    scope=scope,
+                    shift_id=shift_id,
+                    student_name=student_name,
+                    student_id=student_id,
+                    apply_from_local_iso=apply_from_local_iso,
+                    timezone=timezone,
+                    reason=reason,
+                ),
+                self.get_timezone(),
             )
+            await self._check_reschedules([(action_name, args)])
+        except ScheduleError as exc:
+            raise llm.ToolError(str(exc)) from None
 
-        resolved_timezone = timezone.strip()
-        if not resolved_timezone:
-            resolved_timezone = str(
-                self._metadata_dict.get("user_timezone") or "UTC"
-            ).strip() or "UTC"
-
-        args: dict[str, object] = {
-            "scope": normalized_scope,
-            "confirmed": True,
-            "newStartLocal": new_start_local_iso.strip(),
-            "newEndLocal": new_end_local_iso.strip(),
-            "timezone": resolved_timezone,
-        }
-        if shift_id.strip():
-            args["shiftId"] = shift_id.strip()
-        if student_name.strip():
-            args["studentName"] = student_name.strip()
-        if student_id.strip():
-            args["studentId"] = student_id.strip()
-        if apply_from_local_iso.strip():
-            args["applyFromDate"] = apply_from_local_iso.strip()
-        if reason.strip():
-            args["reason"] = reason.strip()
-
-        action_name = (
-            "reschedule_shift_future"
-            if normalized_scope == "future"
-            else "reschedule_shift"
-        )
         result = await self._execute_teacher_action(
             action=action_name,
             args=args,
@@ -906,14 +1138,92 @@ class DefaultAgent(Agent):
             return message or "Class time changed successfully."
         raise llm.ToolError(message or "Reschedule failed.")
 
+    @llm.function_tool(
+        description=(
+            "Reschedule several classes for a teacher with one confirmation, for example "
+            "\"move all my Tuesday classes an hour later\". Each change has the same fields "
+            "as teacher_reschedule_class: full ISO 8601 local datetimes (YYYY-MM-DDTHH:MM:SS), "
+            "a scope (single/today OR future/all_future) and the class it moves. "
+            f"At most {TEACHER_MAX_BATCH_CHANGES} changes per call. Every change is checked "
+            "before any is sent; results are reported per class. "
+            "Requires explicit confirmation from the teacher for the whole list."
+        )
+    )
+    async def teacher_reschedule_classes(
+        self,
+        changes: list[ClassReschedule],
+        confirmed: bool,
+        timezone: str = "",
+        reason: str = "",
+    ) -> str:
+        if confirmed is not True:
+            raise llm.ToolError(
+                "Please explicitly confirm before I make these schedule changes."
+            )
+        # Batch-wide timezone and reason fill in items that do not set their own.
+        changes = [
+            change.model_copy(
+                update={
+                    "timezone": change.timezone or timezone,
+                    "reason": change.reason or reason,
+                }
+            )
+            for change in changes
+        ]
+        try:
+            args = build_batch_args(changes, self.get_timezone())
+            await self._check_reschedules(
+                [(item["action"], item) for item in args["changes"]]
+            )
+        except ScheduleError as exc:
+            raise llm.ToolError(str(exc)) from None
+
+        outcomes: list[tuple[bool, str]] | None = None
+        if self.supports_teacher_action(RESCHEDULE_BATCH_ACTION):
+            result = await self._execute_teacher_action(
+                action=RESCHEDULE_BATCH_ACTION,
+                args=args,
+            )
+            if is_unsupported_result(result):
+                logger.info(
+                    "Teacher actions: client rejected %s; sending changes one by one",
+                    RESCHEDULE_BATCH_ACTION,
+                )
+                self._teacher_actions_supported -= {RESCHEDULE_BATCH_ACTION}
+            else:
+                outcomes = batch_item_results(result, len(changes))
+        if outcomes is None:
+            outcomes = []
+            for action_name, item_args in split_batch_args(args):
+                result = await self._execute_teacher_action(
+                    action=action_name,
+                    args=item_args,
+                )
+                outcomes.append(
+                    (
+                        result.get("success") is True,
+                        str(result.get("message") or "").strip(),
+                    )
+                )
+        lines = []
+        for position, (change, (success, message)) in enumerate(
+            zip(changes, outcomes), start=1
+        ):
+            label = change.student_name.strip() or change.shift_id.strip() or "class"
+            status = "changed" if success else "not changed"
+            lines.append(
+                f"Change {position} ({label}, {change.new_start_local_iso.strip()}): {status}"
+                + (f", {message.rstrip('.')}." if message else ".")
+            )
+        changed = sum(1 for success, _ in outcomes if success)
+        if not changed:
+            raise llm.ToolError("No classes were changed. " + " ".join(lines))
+        return f"Changed {changed} of {len(changes)} classes. " + " ".join(lines)
+
     def get_greeting_instructions(self) -> str:
         if self.is_teacher_session():
-            return self._templater.render(
-                """Greet the teacher warmly. Address them as {{metadata.user_name}}. Mention that you can help with schedule questions, class time changes, and clock-in actions."""
-            )
-        return self._templater.render(
-            """Greet the user warmly. Address them as {{metadata.user_name}}. Offer your assistance as their learning buddy."""
-        )
+            return self._templater.render(TEACHER_GREETING_TEMPLATE)
+        return self._templater.render(STUDENT_GREETING_TEMPLATE)
 
     def default_response_mode(self) -> str:
         return self._interaction_mode
@@ -924,6 +1234,12 @@ class DefaultAgent(Agent):
     def is_teacher_session(self) -> bool:
         return self._user_role == "teacher" and self._teacher_actions_enabled
 
+    def supports_teacher_action(self, action: str) -> bool:
+        return action in self._teacher_actions_supported
+
+    def whiteboard_deltas_enabled(self) -> bool:
+        return self._whiteboard_delta_enabled
+
     def get_text_mode_greeting(self) -> str:
         if self.is_teacher_session():
             return (
@@ -941,6 +1257,9 @@ class DefaultAgent(Agent):
             DEFAULT_TUTOR_VOICE_ID,
         )
 
+    def get_timezone(self) -> str:
+        return str(self._metadata_dict.get("user_timezone") or "UTC").strip() or "UTC"
+
     def get_tts_language(self) -> str:
         return self._tts_language
 
@@ -961,6 +1280,7 @@ server = AgentServer()
 
 def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
+    warm_template_cache()
 
 server.setup_fnc = prewarm
 
@@ -1048,214 +1368,304 @@ async def entrypoint(ctx: JobContext):
     )
 
     whiteboard_state: dict[str, object] = {
-        "last_stroke_ids": set(),
-        "last_text_ids": set(),
         "last_feedback_at": 0.0,
-        "last_project": None,
+        # Latest board state; None until the first project is seen or published.
+        "document": None,
+        # Delta protocol: outbound sequence, last inbound sequence per sender,
+        # and whether the client has shown it can apply project_delta messages.
+        "outbound_seq": 0,
+        "inbound_seq": {},
+        "peer_supports_delta": agent.whiteboard_deltas_enabled(),
     }
     pending_whiteboard_task: asyncio.Task | None = None
-    pending_teacher_action_results: dict[str, asyncio.Future] = {}
-
-    def _clone_project(project: dict) -> dict:
-        return json.loads(json.dumps(project))
-
-    def _get_current_project() -> dict:
-        project = whiteboard_state.get("last_project")
-        if isinstance(project, dict):
-            try:
-                cloned = _clone_project(project)
-                strokes = cloned.get("strokes")
-                texts = cloned.get("texts")
-                if not isinstance(strokes, list):
-                    strokes = []
-                    cloned["strokes"] = strokes
-                if not isinstance(texts, list):
-                    texts = []
-                    cloned["texts"] = texts
-                cloned["version"] = 2
-                return cloned
-            except Exception:
-                pass
-        return {"strokes": [], "texts": [], "version": 2}
-
-    def _extract_ids_from_items(project: dict, key: str) -> set[str]:
-        items = project.get(key)
-        if not isinstance(items, list):
-            return set()
-        ids: set[str] = set()
-        for item in items:
-            if isinstance(item, dict) and item.get("id") is not None:
-                ids.add(str(item.get("id")))
-        return ids
+    whiteboard_compaction_task: asyncio.Task | None = None
+    whiteboard_index = WhiteboardIdIndex()
+    # Agent board changes read, publish and store one at a time, in seq order.
+    whiteboard_change_lock = asyncio.Lock()
+    whiteboard_publish_latency = LatencyRecorder()
+    whiteboard_raster_cache = WhiteboardRasterCache()
+    whiteboard_cpu_latency = LatencyRecorder()
+    # One job at a time per session: the raster cache is not thread-safe, and
+    # a single session should not be able to take over the shared pool.
+    whiteboard_offloader = SessionOffloader(limit=1, latency=whiteboard_cpu_latency)
+    vision_result_cache = VisionResultCache()
+    ink_simplifier = InkSimplifier(WHITEBOARD_INK_TOLERANCE)
+    whiteboard_memory = WhiteboardMemoryBudget(
+        WHITEBOARD_MEMORY_BUDGET_BYTES,
+        simplifier=ink_simplifier,
+        raster_cache=whiteboard_raster_cache,
+    )
+    data_packet_latency = LatencyRecorder()
+    data_dispatcher = DataPacketDispatcher(
+        offload_bytes=DATA_PACKET_OFFLOAD_BYTES,
+        latency=data_packet_latency,
+    )
+    loop_lag = LatencyRecorder()
+    loop_lag_monitor = LoopLagMonitor(loop_lag)
+    loop_lag_monitor.start()
 
-    async def _publish_whiteboard_message(message: dict) -> None:
-        local = ctx.room.local_participant
-        if local is None:
-            raise llm.ToolError("local participant is not available")
+    def _get_current_document() -> WhiteboardDocument:
+        document = whiteboard_state.get("document")
+        return document if isinstance(document, WhiteboardDocument) else EMPTY_DOCUMENT
+
+    def _get_whiteboard_index() -> WhiteboardIdIndex:
+        return whiteboard_index
+
+    def _set_current_document(
+        document: WhiteboardDocument,
+        change: dict | None = None,
+        fingerprint: tuple[int, int, str] | None = None,
+    ) -> str:
+        """Make `document` current; returns how the board changed.
+
+        Pass the change that produced it when there is one, so the id index
+        is updated in O(change) instead of re-indexing the whole board. Over
+        the memory budget the stored board may be a compacted copy, or lose
+        its oldest strokes.
+        """
+        nonlocal whiteboard_compaction_task
+        before = len(whiteboard_index)
+        if change is not None:
+            added, removed = whiteboard_index.apply_change(change)
+        else:
+            added, removed = whiteboard_index.replace(document, fingerprint)
+        whiteboard_state["document"] = whiteboard_memory.enforce(document, whiteboard_index)
+        if whiteboard_memory.recompaction_due and (
+            whiteboard_compaction_task is None or whiteboard_compaction_task.done()
+        ):
+            whiteboard_compaction_task = asyncio.create_task(_compact_whiteboard())
+        return classify_board_change(before, added, removed)
+
+    async def _compact_whiteboard() -> None:
+        """Re-simplify older ink off the event loop until the board fits its budget."""
+        try:
+            while whiteboard_memory.recompaction_due:
+                swaps = await whiteboard_offloader.run(
+                    "compact", whiteboard_memory.recompaction_job(_get_current_document())
+                )
+                # The board may have changed meanwhile; only untouched strokes are swapped.
+                whiteboard_state["document"] = whiteboard_memory.apply_recompacted(
+                    _get_current_document(), swaps, whiteboard_index
+                )
+        except Exception as e:
+            whiteboard_memory.recompaction_due = False
+            logger.warning(f"Whiteboard: memory compaction failed: {e}")
 
-        encoded = json.dumps(message)
-        for topic in WHITEBOARD_PROJECT_TOPICS:
+    async def _publish_whiteboard_topic(
+        local: rtc.LocalParticipant,
+        encoded: bytes,
+        topic: str,
+    ) -> None:
+        started_at = time.perf_counter()
+        try:
             await local.publish_data(
                 encoded,
                 reliable=True,
                 topic=topic,
             )
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000.0
+            whiteboard_publish_latency.observe(topic, elapsed_ms)
+            if elapsed_ms >= WHITEBOARD_SLOW_PUBLISH_MS:
+                logger.warning(
+                    "Whiteboard: slow publish on %s (%.0f ms, %d bytes)",
+                    topic,
+                    elapsed_ms,
+                    len(encoded),
+                )
+
+    async def _send_whiteboard_message(message: dict) -> None:
+        local = ctx.room.local_participant
+        if local is None:
+            raise llm.ToolError("local participant is not available")
+
+        # Serialize once and fan the same bytes out to every topic concurrently.
+        encoded = packet_codec.dumps(message)
+        results = await asyncio.gather(
+            *(
+                _publish_whiteboard_topic(local, encoded, topic)
+                for topic in WHITEBOARD_PROJECT_TOPICS
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _publish_whiteboard_message(message: dict) -> None:
+        await _send_whiteboard_message(message)
 
         if message.get("type") == WHITEBOARD_MSG_TYPE_PROJECT and isinstance(
             message.get("payload"), dict
         ):
-            payload = _clone_project(message["payload"])
-            if not isinstance(payload.get("strokes"), list):
-                payload["strokes"] = []
-            if not isinstance(payload.get("texts"), list):
-                payload["texts"] = []
-            whiteboard_state["last_project"] = payload
-            whiteboard_state["last_stroke_ids"] = _extract_ids_from_items(
-                payload, "strokes"
-            )
-            whiteboard_state["last_text_ids"] = _extract_ids_from_items(
-                payload, "texts"
+            _set_current_document(WhiteboardDocument.from_wire(message["payload"]))
+
+    async def _publish_whiteboard_change(change: dict) -> None:
+        """Apply an agent-side board change and publish it as a delta or snapshot.
+
+        Parallel tool calls are serialized so none of them publishes or stores
+        a board built on a base that another call has since replaced.
+        """
+        async with whiteboard_change_lock:
+            seq = int(whiteboard_state["outbound_seq"]) + 1
+            whiteboard_state["outbound_seq"] = seq
+            send_delta = (
+                whiteboard_state["peer_supports_delta"] is True
+                and seq % WHITEBOARD_DELTA_SNAPSHOT_INTERVAL != 0
             )
+            # The delta is built first so the wire dicts it caches on the new
+            # items are already there when apply() counts their bytes.
+            if send_delta:
+                message = {
+                    "type": WHITEBOARD_MSG_TYPE_PROJECT_DELTA,
+                    "payload": build_delta(
+                        seq,
+                        add_strokes=change.get("add_strokes"),
+                        add_texts=change.get("add_texts"),
+                        remove_ids=change.get("remove"),
+                        clear=change.get("clear") is True,
+                    ),
+                }
+            base = _get_current_document()
+            document = base.apply(change)
+            if not send_delta:
+                message = {
+                    "type": WHITEBOARD_MSG_TYPE_PROJECT,
+                    "payload": document.to_wire(
+                        seq, cache=whiteboard_memory.allows_wire_cache(document)
+                    ),
+                }
+            await _send_whiteboard_message(message)
+            # Student packets applied during the send are kept, not overwritten.
+            current = _get_current_document()
+            if current is not base:
+                document = current.apply(change)
+            _set_current_document(document, change)
+
+    async def _publish_student_drawing_enabled(enabled: bool) -> None:
+        await _publish_whiteboard_message(
+            {
+                "type": WHITEBOARD_MSG_TYPE_STUDENT_DRAWING_PERMISSION,
+                "payload": {"enabled": enabled},
+            }
+        )
+
+    drawing_lock = StudentDrawingLock(
+        _publish_student_drawing_enabled,
+        unlock_delay_s=WHITEBOARD_UNLOCK_DELAY_MS / 1000.0,
+    )
 
     agent.configure_whiteboard_bridge(
         publish_message_cb=_publish_whiteboard_message,
-        get_project_cb=_get_current_project,
+        get_document_cb=_get_current_document,
+        publish_change_cb=_publish_whiteboard_change,
+        get_index_cb=_get_whiteboard_index,
+        drawing_lock=drawing_lock,
     )
 
-    async def _request_teacher_action(action: str, args: dict) -> dict:
+    async def _publish_teacher_action(encoded: bytes) -> None:
         local = ctx.room.local_participant
         if local is None:
             raise llm.ToolError("local participant is not available")
+        await local.publish_data(encoded, reliable=True, topic=TEACHER_ACTION_TOPIC)
+
+    def _on_teacher_action_applied(action: str, payload: dict) -> None:
+        # Any write may have changed the schedule, whatever it reported.
+        if teacher_shifts is not None and action != LIST_SHIFTS_ACTION:
+            teacher_shifts.invalidate()
+
+    teacher_actions = DataChannelRpc(
+        _publish_teacher_action,
+        msg_type=TEACHER_ACTION_MSG_TYPE,
+        request_prefix="teacher_action",
+        log_name="Teacher actions",
+        on_result=_on_teacher_action_applied,
+    )
+    # Only clients that answer list_shifts get asked; others would show the
+    # teacher an unsupported-action error for a request they never made.
+    teacher_shifts: TeacherScheduleCache | None = None
+    if agent.is_teacher_session() and agent.supports_teacher_action(LIST_SHIFTS_ACTION):
+        teacher_shifts = TeacherScheduleCache(
+            functools.partial(teacher_actions.call, LIST_SHIFTS_ACTION, {}, replay=False),
+            agent.get_timezone(),
+        )
 
-        request_id = f"teacher_action_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
-        payload = {
-            "type": TEACHER_ACTION_MSG_TYPE,
-            "payload": {
-                "requestId": request_id,
-                "action": action,
-                "args": args if isinstance(args, dict) else {},
-            },
-        }
-
-        loop = asyncio.get_running_loop()
-        result_future: asyncio.Future = loop.create_future()
-        pending_teacher_action_results[request_id] = result_future
-
+    async def _request_teacher_action(action: str, args: dict) -> dict:
         try:
-            await local.publish_data(
-                json.dumps(payload),
-                reliable=True,
-                topic=TEACHER_ACTION_TOPIC,
-            )
-            logger.info(
-                f"Teacher actions: published action={action} request_id={request_id}"
-            )
-            raw_result = await asyncio.wait_for(result_future, timeout=25.0)
-        except asyncio.TimeoutError:
-            logger.warning(
-                f"Teacher actions: timeout waiting for request_id={request_id}"
-            )
+            return await teacher_actions.call(action, args, replay=action != LIST_SHIFTS_ACTION)
+        except RpcTimeoutError:
+            # The client may still apply it; do not trust the cached schedule.
+            if teacher_shifts is not None:
+                teacher_shifts.invalidate()
             return {
                 "success": False,
                 "message": "I could not confirm the action in time. Please try again.",
             }
-        finally:
-            pending_teacher_action_results.pop(request_id, None)
-
-        if isinstance(raw_result, dict):
-            return raw_result
-        return {
-            "success": False,
-            "message": "Received an invalid response for the teacher action.",
-        }
+        except RpcError:
+            return {
+                "success": False,
+                "message": "Teacher actions are not available right now.",
+            }
 
     if agent.is_teacher_session():
         agent.configure_teacher_action_bridge(
             request_action_cb=_request_teacher_action,
+            schedule=teacher_shifts,
         )
+        if teacher_shifts is not None:
+            # Ready before the teacher's first question or schedule change.
+            teacher_shifts.prefetch()
+        else:
+            logger.info("Teacher actions: client does not list shifts; schedule checks off.")
     else:
         logger.info("Teacher action bridge disabled for non-teacher session.")
 
-    def _parse_whiteboard_project(data: bytes) -> dict | None:
-        try:
-            packet_json = json.loads(data.decode("utf-8"))
-        except Exception as e:
-            logger.warning(f"Whiteboard: failed to parse packet JSON: {e}")
-            return None
-
-        if not isinstance(packet_json, dict):
-            return None
-
-        msg_type = packet_json.get("type")
-        payload = packet_json.get("payload")
-        if msg_type != WHITEBOARD_MSG_TYPE_PROJECT or not isinstance(payload, dict):
-            return None
-
-        strokes = payload.get("strokes")
-        if not isinstance(strokes, list):
-            return None
-
-        texts = payload.get("texts")
-        if texts is None:
-            payload["texts"] = []
-        elif not isinstance(texts, list):
-            return None
-
-        return payload
-
-    def _parse_teacher_action_result(data: bytes) -> dict | None:
+    def _decode_whiteboard_packet(
+        data: bytes,
+    ) -> tuple[str, dict | WhiteboardProject, WhiteboardDocument | None] | object | None:
+        # Runs on the CPU pool for large packets: decode, validation and, for
+        # snapshots, building the document. Deltas apply on the loop.
         try:
-            packet_json = json.loads(data.decode("utf-8"))
-        except Exception as e:
-            logger.warning(f"Teacher actions: failed to parse packet JSON: {e}")
-            return None
-
-        if not isinstance(packet_json, dict):
-            return None
-        if packet_json.get("type") != TEACHER_ACTION_RESULT_MSG_TYPE:
-            return None
+            if is_snapshot_packet(data):
+                project = packet_codec.decode(data, WhiteboardProjectPacket).payload
+            else:
+                packet = packet_codec.decode(data, WhiteboardPacket)
+                if packet.type == WHITEBOARD_MSG_TYPE_PROJECT_DELTA:
+                    delta = parse_delta(packet.payload, ink_simplifier)
+                    return (packet.type, delta, None) if delta is not None else None
+                if packet.type != WHITEBOARD_MSG_TYPE_PROJECT or packet.payload is None:
+                    return None
+                project = packet_codec.convert(packet.payload, WhiteboardProject)
+        except PacketDecodeError as e:
+            logger.warning(f"Whiteboard: invalid packet: {e}")
+            return INVALID
+
+        document = WhiteboardDocument.from_wire_items(
+            project.strokes, project.texts, project.capabilities, ink_simplifier
+        )
+        return WHITEBOARD_MSG_TYPE_PROJECT, project, document
 
-        payload = packet_json.get("payload")
-        if not isinstance(payload, dict):
+    def _parse_teacher_action_result(packet: TeacherActionResultPacket) -> dict | None:
+        if packet.type != TEACHER_ACTION_RESULT_MSG_TYPE:
             return None
-        return payload
-
-    def _summarize_project(project: dict, action: str) -> str:
-        strokes = project.get("strokes") or []
-        if not isinstance(strokes, list):
-            strokes = []
-        texts = project.get("texts") or []
-        if not isinstance(texts, list):
-            texts = []
-
-        stroke_count = len(strokes)
-        text_count = len(texts)
-        point_count = 0
-        min_x, min_y = 1.0, 1.0
-        max_x, max_y = 0.0, 0.0
-        colors: list[str] = []
-
-        for stroke in strokes:
-            if not isinstance(stroke, dict):
-                continue
-            color = stroke.get("color")
-            if color is not None and len(colors) < 6:
-                colors.append(str(color))
-
-            points = stroke.get("points") or []
-            if not isinstance(points, list):
-                continue
-            point_count += len(points)
-            for point in points:
-                if not isinstance(point, dict):
-                    continue
-                x = point.get("x")
-                y = point.get("y")
-                if isinstance(x, (int, float)) and isinstance(y, (int, float)):
-                    min_x = min(min_x, float(x))
-                    min_y = min(min_y, float(y))
-                    max_x = max(max_x, float(x))
-                    max_y = max(max_y, float(y))
+        return packet.payload
+
+    def _summarize_project(document: WhiteboardDocument, action: str) -> str:
+        # Stats are carried forward incrementally as changes are applied, so
+        # this does not walk the board.
+        stats = document.stats
+        # Read bounds first: a lazy recompute after erasures also resyncs counts.
+        bounds = stats.bounds
+        stroke_count = stats.stroke_count
+        text_count = stats.text_count
+        point_count = stats.point_count
+        colors = stats.sample_colors
+        min_x, min_y, max_x, max_y = 1.0, 1.0, 0.0, 0.0
+        if bounds is not None:
+            min_x = min(min_x, bounds[0])
+            min_y = min(min_y, bounds[1])
+            max_x = max(max_x, bounds[2])
+            max_y = max(max_y, bounds[3])
 
         if stroke_count == 0:
             bounds_text = "empty board"
@@ -1264,17 +1674,12 @@ async def entrypoint(ctx: JobContext):
         else:
             bounds_text = (
                 f"bounds normalized x {min_x:.2f} to {max_x:.2f}, "
-                f"y {min_y:.2f} to {max_y:.2f}"
+                f"y {min_y:.2f} to {max_y:.2f}, "
+                f"ink length {stats.normalized_ink_length:.2f}"
             )
 
-        color_text = ", ".join(colors[:4]) if colors else "no color data"
-        sample_text = ""
-        for text_item in texts:
-            if isinstance(text_item, dict):
-                text_value = text_item.get("text")
-                if isinstance(text_value, str) and text_value.strip():
-                    sample_text = text_value.strip()[:80]
-                    break
+        color_text = ", ".join(colors) if colors else "no color data"
+        sample_text = stats.sample_text
 
         return (
             f"Whiteboard update: action={action}. "
@@ -1283,164 +1688,128 @@ async def entrypoint(ctx: JobContext):
             f"sample text={'none' if not sample_text else sample_text!r}."
         )
 
-    def _parse_image_data_url_from_message(data: bytes) -> str | None:
+    def _decode_whiteboard_image_request(data: bytes) -> WhiteboardImagePacket | None:
+        # A request that fails to parse still falls back to the board render.
         try:
-            packet_json = json.loads(data.decode("utf-8"))
-        except Exception as e:
-            logger.warning(f"Whiteboard image: failed to parse JSON: {e}")
-            return None
-
-        if not isinstance(packet_json, dict):
+            return packet_codec.decode(data, WhiteboardImagePacket)
+        except PacketDecodeError as e:
+            logger.warning(f"Whiteboard image: invalid packet: {e}")
             return None
 
-        image_base64 = packet_json.get("image_base64")
+    def _parse_image_data_url_from_message(
+        packet: WhiteboardImagePacket | None,
+    ) -> tuple[str, BoardFingerprint | None] | None:
+        image_base64 = packet.image_base64 if packet is not None else None
         if not isinstance(image_base64, str) or not image_base64:
             return None
 
-        if image_base64.startswith("data:"):
-            return image_base64
-
-        # Raw base64 string without prefix; default to PNG unless provided.
-        mime_type = packet_json.get("mime_type")
+        mime_type = packet.mime_type
         if not isinstance(mime_type, str) or not mime_type:
             mime_type = "image/png"
 
+        if image_base64.startswith("data:"):
+            header, _, payload = image_base64.partition(",")
+            if not header.endswith(";base64") or not payload:
+                return image_base64, None
+            mime_type = header[len("data:") : -len(";base64")] or mime_type
+            data_url = image_base64
+            image_base64 = payload
+        else:
+            # Raw base64 string without prefix; default to PNG unless provided.
+            data_url = f"data:{mime_type};base64,{image_base64}"
+
         try:
             # Validate the payload before building the data URL.
-            base64.b64decode(image_base64, validate=True)
+            raw = base64.b64decode(image_base64, validate=True)
         except Exception as e:
             logger.warning(f"Whiteboard image: invalid base64 payload: {e}")
             return None
 
-        return f"data:{mime_type};base64,{image_base64}"
+        return _prepare_image_data_url(raw, mime_type, data_url)
 
-    def _argb_to_rgba(argb: int) -> tuple[int, int, int, int]:
-        a = (argb >> 24) & 0xFF
-        r = (argb >> 16) & 0xFF
-        g = (argb >> 8) & 0xFF
-        b = argb & 0xFF
-        return (r, g, b, a)
+    def _prepare_image_data_url(
+        raw: bytes | bytearray,
+        mime_type: str,
+        data_url: str | None = None,
+    ) -> tuple[str, BoardFingerprint | None] | None:
+        # Client captures can be device-resolution PNGs; bring them within the
+        # vision edge and byte budget (pass-through when already within it).
+        try:
+            prepared = prepare_client_image(
+                raw,
+                mime_type,
+                max_edge=WHITEBOARD_VISION_MAX_EDGE,
+                max_bytes=WHITEBOARD_VISION_MAX_BYTES,
+            )
+        except ValueError as e:
+            logger.warning(f"Whiteboard image: {e}")
+            return None
+        fingerprint = prepared.fingerprint if prepared is not None else None
+        if prepared is None or prepared.data is raw:
+            if data_url is None:
+                data_url = f"data:{mime_type};base64,{base64.b64encode(raw).decode('ascii')}"
+            return data_url, fingerprint
+        logger.info(
+            "Whiteboard image: re-encoded client image %s bytes -> %s %s bytes (%sx%s)",
+            len(raw),
+            prepared.mime_type,
+            len(prepared.data),
+            prepared.width,
+            prepared.height,
+        )
+        return prepared.data_url(), fingerprint
+
+    def _encode_board_image(image) -> tuple[str, BoardFingerprint | None]:
+        encoded = encode_for_vision(
+            image,
+            max_edge=WHITEBOARD_VISION_MAX_EDGE,
+            max_bytes=WHITEBOARD_VISION_MAX_BYTES,
+        )
+        return encoded.data_url(), encoded.fingerprint
 
-    def _render_project_png(
-        project: dict, width: int = 1024, height: int = 768
-    ) -> bytes | None:
-        if Image is None or ImageDraw is None:
+    async def _render_board_image(
+        document: WhiteboardDocument,
+    ) -> tuple[str, BoardFingerprint | None] | None:
+        if not pillow_available():
             logger.warning("Whiteboard: Pillow is unavailable; cannot render board image")
             return None
-
-        strokes = project.get("strokes") or []
-        if not isinstance(strokes, list):
+        # Render and encode in the worker pool; the loop also carries audio.
+        image = await whiteboard_offloader.run(
+            "render", whiteboard_raster_cache.render, document
+        )
+        if image is None:
             return None
-        texts = project.get("texts") or []
-        if not isinstance(texts, list):
-            texts = []
-
-        image = Image.new("RGBA", (width, height), (255, 255, 255, 255))
-        draw = ImageDraw.Draw(image, "RGBA")
-
-        for stroke in strokes:
-            if not isinstance(stroke, dict):
-                continue
-
-            points = stroke.get("points") or []
-            if not isinstance(points, list) or len(points) == 0:
-                continue
-
-            normalized = stroke.get("normalized") is True
-            stroke_width_raw = stroke.get("strokeWidth", 3.0)
-            try:
-                stroke_width = max(1, int(float(stroke_width_raw)))
-            except Exception:
-                stroke_width = 3
-
-            color_raw = stroke.get("color", 0xFF000000)
-            try:
-                color_rgba = _argb_to_rgba(int(color_raw))
-            except Exception:
-                color_rgba = (0, 0, 0, 255)
-
-            canvas_points: list[tuple[float, float]] = []
-            for point in points:
-                if not isinstance(point, dict):
-                    continue
-                x = point.get("x")
-                y = point.get("y")
-                if not isinstance(x, (int, float)) or not isinstance(y, (int, float)):
-                    continue
-                px = float(x) * width if normalized else float(x)
-                py = float(y) * height if normalized else float(y)
-                canvas_points.append((px, py))
-
-            if not canvas_points:
-                continue
+        return await whiteboard_offloader.run("encode", _encode_board_image, image)
 
-            if len(canvas_points) == 1:
-                x, y = canvas_points[0]
-                r = max(1.0, stroke_width / 2.0)
-                draw.ellipse((x - r, y - r, x + r, y + r), fill=color_rgba)
-            else:
-                draw.line(canvas_points, fill=color_rgba, width=stroke_width, joint="curve")
-
-        default_font = None
-        if ImageFont is not None:
-            try:
-                default_font = ImageFont.truetype("DejaVuSans.ttf", size=32)
-            except Exception:
-                try:
-                    default_font = ImageFont.load_default()
-                except Exception:
-                    default_font = None
-
-        for text_item in texts:
-            if not isinstance(text_item, dict):
-                continue
-            text_value = text_item.get("text")
-            if not isinstance(text_value, str) or not text_value.strip():
-                continue
-
-            x_raw = text_item.get("x", 0.0)
-            y_raw = text_item.get("y", 0.0)
-            normalized = text_item.get("normalized") is not False
-            try:
-                x_val = float(x_raw)
-                y_val = float(y_raw)
-            except Exception:
-                continue
-
-            px = x_val * width if normalized else x_val
-            py = y_val * height if normalized else y_val
-
-            font_size_raw = text_item.get("fontSize", 30.0)
-            try:
-                font_size = int(max(12.0, min(72.0, float(font_size_raw))))
-            except Exception:
-                font_size = 30
-
-            color_raw = text_item.get("color", 0xFF111827)
-            try:
-                color_rgba = _argb_to_rgba(int(color_raw))
-            except Exception:
-                color_rgba = (17, 24, 39, 255)
-
-            font = default_font
-            if ImageFont is not None:
-                try:
-                    font = ImageFont.truetype("DejaVuSans.ttf", size=font_size)
-                except Exception:
-                    if font is None:
-                        try:
-                            font = ImageFont.load_default()
-                        except Exception:
-                            font = None
-
-            draw.text((px, py), text_value, fill=color_rgba, font=font)
+    def _remember_vision_analysis(
+        fingerprint: BoardFingerprint | None,
+        handle: object,
+    ) -> None:
+        if getattr(handle, "interrupted", False):
+            return
+        analysis = " ".join(
+            item.text_content
+            for item in getattr(handle, "chat_items", None) or []
+            if getattr(item, "role", None) == "assistant" and getattr(item, "text_content", None)
+        )
+        vision_result_cache.store(fingerprint, analysis)
 
-        out = io.BytesIO()
-        image.convert("RGB").save(out, format="PNG")
-        return out.getvalue()
+    async def _reuse_vision_analysis(analysis: str, sender_identity: str) -> None:
+        logger.info(
+            f"Whiteboard image: board unchanged for {sender_identity}; reusing earlier analysis"
+        )
+        await session.generate_reply(
+            instructions=(
+                "The student asked you to look at their whiteboard again, but it has not changed "
+                "since your last look, so no new image is attached. Do not repeat your full "
+                "analysis. In one or two sentences, restate your main point and ask what they "
+                f"would like to try next. Your earlier analysis was: {analysis}"
+            ),
+            allow_interruptions=True,
+        )
 
     async def _respond_to_whiteboard_after_pause(
-        project: dict,
+        document: WhiteboardDocument,
         action: str,
         sender_identity: str,
     ) -> None:
@@ -1450,14 +1819,14 @@ async def entrypoint(ctx: JobContext):
 
         try:
             await asyncio.sleep(1.2)  # Debounce while student is actively drawing.
-            summary = _summarize_project(project, action)
-            rendered_image_data_url: str | None = None
-            rendered_bytes = _render_project_png(project)
-            if rendered_bytes:
-                rendered_image_data_url = (
-                    "data:image/png;base64,"
-                    f"{base64.b64encode(rendered_bytes).decode('ascii')}"
-                )
+            summary = _summarize_project(document, action)
+            rendered = await _render_board_image(document)
+            rendered_image_data_url, fingerprint = rendered or (None, None)
+            cached_analysis = vision_result_cache.lookup(fingerprint)
+            if cached_analysis is not None:
+                await _reuse_vision_analysis(cached_analysis, sender_identity)
+                whiteboard_state["last_feedback_at"] = time.time()
+                return
             logger.info(
                 f"Whiteboard: generating feedback for {sender_identity}, action={action}"
             )
@@ -1472,7 +1841,7 @@ async def entrypoint(ctx: JobContext):
                         ),
                     ],
                 )
-                await session.generate_reply(
+                handle = session.generate_reply(
                     instructions=(
                         "The student updated their whiteboard. Analyze the image first, then use the "
                         "summary as supporting context. Give concise, helpful tutoring feedback. "
@@ -1480,6 +1849,8 @@ async def entrypoint(ctx: JobContext):
                     ),
                     allow_interruptions=True,
                 )
+                await handle
+                _remember_vision_analysis(fingerprint, handle)
             else:
                 await session.generate_reply(
                     instructions=(
@@ -1498,12 +1869,17 @@ async def entrypoint(ctx: JobContext):
     async def _respond_to_whiteboard_image(
         image_data_url: str,
         sender_identity: str,
+        fingerprint: BoardFingerprint | None = None,
     ) -> None:
         if is_text_mode_session:
             logger.debug("Whiteboard image: skipping voice feedback in text mode")
             return
 
         try:
+            cached_analysis = vision_result_cache.lookup(fingerprint)
+            if cached_analysis is not None:
+                await _reuse_vision_analysis(cached_analysis, sender_identity)
+                return
             logger.info(
                 f"Whiteboard image: generating feedback from {sender_identity}"
             )
@@ -1517,7 +1893,7 @@ async def entrypoint(ctx: JobContext):
                     ),
                 ],
             )
-            await session.generate_reply(
+            handle = session.generate_reply(
                 instructions=(
                     "The student explicitly asked you to look at their whiteboard. "
                     "Analyze the provided whiteboard image carefully, read any visible writing, and provide "
@@ -1526,6 +1902,8 @@ async def entrypoint(ctx: JobContext):
                 ),
                 allow_interruptions=True,
             )
+            await handle
+            _remember_vision_analysis(fingerprint, handle)
         except asyncio.CancelledError:
             logger.debug("Whiteboard image: cancelled")
             return
@@ -1535,9 +1913,8 @@ async def entrypoint(ctx: JobContext):
                 e,
                 exc_info=True,
             )
-            fallback_project = _get_current_project()
             fallback_summary = _summarize_project(
-                fallback_project,
+                _get_current_document(),
                 "image_request_fallback",
             )
             await session.generate_reply(
@@ -1549,6 +1926,70 @@ async def entrypoint(ctx: JobContext):
                 allow_interruptions=True,
             )
 
+    async def _handle_whiteboard_image_packet(
+        packet: WhiteboardImagePacket | None,
+        sender_identity: str,
+    ) -> None:
+        # Base64 validation of a large image is CPU work; keep it off the loop.
+        prepared = await whiteboard_offloader.run(
+            "decode", _parse_image_data_url_from_message, packet
+        )
+        if prepared is not None:
+            image_data_url, fingerprint = prepared
+            await _respond_to_whiteboard_image(image_data_url, sender_identity, fingerprint)
+            return
+
+        # Fallback: no image payload (or decode failed). Use latest known project state.
+        last_document = whiteboard_state.get("document")
+        if isinstance(last_document, WhiteboardDocument):
+            await _respond_to_whiteboard_after_pause(
+                last_document,
+                "requested",
+                sender_identity,
+            )
+            return
+
+        logger.warning(
+            "Whiteboard image: received request but no image and no cached project"
+        )
+
+    async def _handle_whiteboard_image_stream(
+        reader: rtc.ByteStreamReader,
+        sender_identity: str,
+    ) -> None:
+        try:
+            raw, mime_type = await read_image_stream(
+                reader,
+                declared_size=reader.info.size,
+                max_bytes=WHITEBOARD_IMAGE_MAX_BYTES,
+            )
+        except ImageTransferError as e:
+            logger.warning(f"Whiteboard image: rejected byte stream from {sender_identity}: {e}")
+            return
+        prepared = await whiteboard_offloader.run(
+            "decode", _prepare_image_data_url, raw, mime_type
+        )
+        del raw
+        if prepared is not None:
+            image_data_url, fingerprint = prepared
+            await _respond_to_whiteboard_image(image_data_url, sender_identity, fingerprint)
+
+    def _on_whiteboard_image_stream(
+        reader: rtc.ByteStreamReader,
+        participant_identity: str,
+    ) -> None:
+        nonlocal pending_whiteboard_task
+        if pending_whiteboard_task is not None and not pending_whiteboard_task.done():
+            pending_whiteboard_task.cancel()
+        pending_whiteboard_task = asyncio.create_task(
+            _handle_whiteboard_image_stream(reader, participant_identity)
+        )
+
+    ctx.room.register_byte_stream_handler(
+        WHITEBOARD_IMAGE_STREAM_TOPIC,
+        _on_whiteboard_image_stream,
+    )
+
     async def _publish_transcription(
         content: str,
         sender: str,
@@ -1559,16 +2000,16 @@ async def entrypoint(ctx: JobContext):
         if local is None:
             return
 
-        payload = {
-            "type": transcription_type,
-            "content": content,
-            "sender": sender,
-            "timestamp": time.time(),
-        }
+        packet = TranscriptionPacket(
+            type=transcription_type,
+            content=content,
+            sender=sender,
+            timestamp=time.time(),
+        )
 
         try:
             await local.publish_data(
-                json.dumps(payload),
+                packet_codec.dumps(packet),
                 reliable=True,
                 topic=TRANSCRIPTION_TOPIC,
             )
@@ -1663,41 +2104,16 @@ async def entrypoint(ctx: JobContext):
         # Fallback: direct LLM text stream without TTS.
         return await _generate_text_mode_response_via_llm(user_message)
 
-    async def _handle_user_text_message(data: bytes, sender_identity: str) -> None:
+    async def _handle_user_text_message(message: ChatTextMessage, sender_identity: str) -> None:
         """Process text message from user and generate AI response."""
-        try:
-            packet_json = json.loads(data.decode("utf-8"))
-        except Exception as e:
-            logger.warning(f"Chat text: failed to parse JSON: {e}")
-            return
-
-        if not isinstance(packet_json, dict):
-            return
-
-        msg_type = str(packet_json.get("type") or "").strip()
-        content_raw = packet_json.get("content", "")
-        content = (
-            content_raw.strip()
-            if isinstance(content_raw, str)
-            else str(content_raw or "").strip()
-        )
-        response_mode_raw = packet_json.get("response_mode")
+        msg_type = packet_text(message.type)
+        content = packet_text(message.content)
         response_mode = (
-            response_mode_raw.strip().lower()
-            if isinstance(response_mode_raw, str)
+            message.response_mode.strip().lower()
+            if isinstance(message.response_mode, str)
             else ""
         )
-        message_id_raw = (
-            packet_json.get("message_id")
-            or packet_json.get("id")
-            or packet_json.get("request_id")
-            or ""
-        )
-        message_id = (
-            message_id_raw.strip()
-            if isinstance(message_id_raw, str)
-            else str(message_id_raw or "").strip()
-        )
+        message_id = packet_text(message.message_id or message.id or message.request_id)
         if is_text_mode_session:
             response_mode = "text"
         if response_mode not in {"text", "voice"}:
@@ -1793,127 +2209,90 @@ async def entrypoint(ctx: JobContext):
         if transcript:
             asyncio.create_task(_publish_transcription(transcript, "ai", "final"))
 
-    @ctx.room.on("data_received")
-    def on_data_received(data: rtc.DataPacket):
-        nonlocal pending_whiteboard_task
-
-        topic = data.topic or ""
-        sender_identity = getattr(
-            getattr(data, "participant", None), "identity", "unknown"
-        )
-        local_identity = (
-            ctx.room.local_participant.identity
-            if ctx.room.local_participant is not None
-            else None
-        )
-        if local_identity and sender_identity == local_identity:
+    def _on_teacher_action_result(
+        packet: TeacherActionResultPacket,
+        sender_identity: str,
+    ) -> None:
+        action_result = _parse_teacher_action_result(packet)
+        if action_result is None:
             logger.debug(
-                f"Whiteboard: ignoring local echo from {sender_identity} on {topic}"
+                "Teacher actions: ignored malformed action result payload"
             )
             return
 
-        if topic == TEACHER_ACTION_RESULT_TOPIC:
-            action_result = _parse_teacher_action_result(data.data)
-            if action_result is None:
-                logger.debug(
-                    "Teacher actions: ignored malformed action result payload"
-                )
-                return
-
-            request_id = str(
-                action_result.get("requestId")
-                or action_result.get("request_id")
-                or ""
-            ).strip()
-            if not request_id:
-                logger.debug("Teacher actions: result missing request id")
-                return
-
-            pending = pending_teacher_action_results.get(request_id)
-            if pending is None:
-                logger.debug(
-                    f"Teacher actions: no pending request found for request_id={request_id}"
-                )
-                return
-            if not pending.done():
-                pending.set_result(action_result)
-            return
+        teacher_actions.handle_result(action_result)
 
+    def _on_chat_text(message: ChatTextMessage, sender_identity: str) -> None:
         # Handle text chat messages from the Flutter app
-        if topic == CHAT_TEXT_TOPIC:
-            asyncio.create_task(_handle_user_text_message(data.data, sender_identity))
-            return
-
-        if topic == WHITEBOARD_IMAGE_TOPIC:
-            image_data_url = _parse_image_data_url_from_message(data.data)
-            if image_data_url:
-                if pending_whiteboard_task is not None and not pending_whiteboard_task.done():
-                    pending_whiteboard_task.cancel()
-                pending_whiteboard_task = asyncio.create_task(
-                    _respond_to_whiteboard_image(image_data_url, sender_identity)
-                )
-                return
-
-            # Fallback: no image payload (or decode failed). Use latest known project state.
-            last_project = whiteboard_state.get("last_project")
-            if isinstance(last_project, dict):
-                if pending_whiteboard_task is not None and not pending_whiteboard_task.done():
-                    pending_whiteboard_task.cancel()
-                pending_whiteboard_task = asyncio.create_task(
-                    _respond_to_whiteboard_after_pause(
-                        last_project,
-                        "requested",
-                        sender_identity,
-                    )
-                )
-                return
+        asyncio.create_task(_handle_user_text_message(message, sender_identity))
 
-            logger.warning(
-                "Whiteboard image: received request but no image and no cached project"
-            )
-            return
+    def _on_whiteboard_image_request(
+        packet: WhiteboardImagePacket | None,
+        sender_identity: str,
+    ) -> None:
+        nonlocal pending_whiteboard_task
+        if pending_whiteboard_task is not None and not pending_whiteboard_task.done():
+            pending_whiteboard_task.cancel()
+        pending_whiteboard_task = asyncio.create_task(
+            _handle_whiteboard_image_packet(packet, sender_identity)
+        )
 
-        project = _parse_whiteboard_project(data.data)
-        if topic not in WHITEBOARD_PROJECT_TOPICS:
-            return
+    def _on_whiteboard_packet(
+        topic: str,
+        packet: tuple[str, dict | WhiteboardProject, WhiteboardDocument | None] | None,
+        sender_identity: str,
+    ) -> None:
+        nonlocal pending_whiteboard_task
 
-        if project is None:
+        if packet is None:
             logger.debug(
                 f"Whiteboard: ignored non-project message on topic {topic}"
             )
             return
 
-        strokes = project.get("strokes") or []
-        texts = project.get("texts") or []
-        current_stroke_ids = _extract_ids_from_items(project, "strokes")
-        current_text_ids = _extract_ids_from_items(project, "texts")
-        current_total_ids = current_stroke_ids | current_text_ids
-
-        previous_stroke_ids = whiteboard_state["last_stroke_ids"]
-        if not isinstance(previous_stroke_ids, set):
-            previous_stroke_ids = set()
-        previous_text_ids = whiteboard_state.get("last_text_ids")
-        if not isinstance(previous_text_ids, set):
-            previous_text_ids = set()
-        previous_total_ids = previous_stroke_ids | previous_text_ids
-
-        if current_total_ids and not previous_total_ids:
-            action = "started"
-        elif not current_total_ids and previous_total_ids:
-            action = "cleared"
-        elif len(current_total_ids) > len(previous_total_ids):
-            action = "added"
-        elif len(current_total_ids) < len(previous_total_ids):
-            action = "erased"
+        msg_type, packet_payload, document = packet
+        inbound_seq = whiteboard_state["inbound_seq"]
+        if msg_type == WHITEBOARD_MSG_TYPE_PROJECT_DELTA:
+            delta_seq = packet_payload["seq"]
+            last_seq = inbound_seq.get(sender_identity)
+            if last_seq is not None and delta_seq != last_seq + 1:
+                logger.warning(
+                    "Whiteboard: delta gap from %s (expected seq=%s, got %s); "
+                    "applying and waiting for next snapshot",
+                    sender_identity,
+                    last_seq + 1,
+                    delta_seq,
+                )
+            inbound_seq[sender_identity] = delta_seq
+            whiteboard_state["peer_supports_delta"] = True
+            document = _get_current_document().apply(packet_payload)
+            action = _set_current_document(document, packet_payload)
         else:
-            action = "updated"
+            if packet_payload.seq is not None:
+                inbound_seq[sender_identity] = packet_payload.seq
+            if document.supports_delta():
+                whiteboard_state["peer_supports_delta"] = True
+            fingerprint = wire_board_fingerprint(
+                packet_payload.strokeCount,
+                packet_payload.textCount,
+                packet_payload.contentHash,
+            )
+            # Counts that disagree with the packet mean the hash cannot be trusted.
+            if fingerprint is not None and fingerprint[:2] != (
+                len(packet_payload.strokes),
+                len(packet_payload.texts or ()),
+            ):
+                fingerprint = None
+            if whiteboard_index.is_unchanged(fingerprint):
+                logger.debug(
+                    f"Whiteboard: unchanged board from {sender_identity} on {topic}"
+                )
+                return
+            action = _set_current_document(document, fingerprint=fingerprint)
 
-        whiteboard_state["last_stroke_ids"] = current_stroke_ids
-        whiteboard_state["last_text_ids"] = current_text_ids
-        whiteboard_state["last_project"] = _clone_project(project)
         logger.info(
             "Whiteboard: received "
-            f"{len(strokes)} strokes and {len(texts)} text items "
+            f"{len(document.strokes)} strokes and {len(document.texts)} text items "
             f"from {sender_identity} on {topic} (action={action})"
         )
 
@@ -1931,9 +2310,107 @@ async def entrypoint(ctx: JobContext):
             return
 
         pending_whiteboard_task = asyncio.create_task(
-            _respond_to_whiteboard_after_pause(project, action, sender_identity)
+            _respond_to_whiteboard_after_pause(document, action, sender_identity)
+        )
+
+    data_dispatcher.register(
+        TEACHER_ACTION_RESULT_TOPIC,
+        _on_teacher_action_result,
+        decode=packet_codec.decoder(TeacherActionResultPacket),
+    )
+    data_dispatcher.register(
+        CHAT_TEXT_TOPIC,
+        _on_chat_text,
+        decode=packet_codec.decoder(ChatTextMessage),
+    )
+    data_dispatcher.register(
+        WHITEBOARD_IMAGE_TOPIC,
+        _on_whiteboard_image_request,
+        decode=_decode_whiteboard_image_request,
+        # Base64 inflates by 4/3; allow some room for the JSON envelope.
+        max_bytes=WHITEBOARD_IMAGE_MAX_BYTES * 4 // 3 + 4096,
+    )
+    for topic in WHITEBOARD_PROJECT_TOPICS:
+        data_dispatcher.register(
+            topic,
+            functools.partial(_on_whiteboard_packet, topic),
+            decode=_decode_whiteboard_packet,
+            # Clients send a full snapshot per stroke; only the newest matters.
+            supersedes=is_snapshot_packet,
+            coalesce_window_s=WHITEBOARD_COALESCE_MS / 1000.0,
+        )
+
+    @ctx.room.on("data_received")
+    def on_data_received(data: rtc.DataPacket):
+        topic = data.topic or ""
+        sender_identity = getattr(
+            getattr(data, "participant", None), "identity", "unknown"
+        )
+        local_identity = (
+            ctx.room.local_participant.identity
+            if ctx.room.local_participant is not None
+            else None
+        )
+        if local_identity and sender_identity == local_identity:
+            logger.debug(
+                f"Whiteboard: ignoring local echo from {sender_identity} on {topic}"
+            )
+            return
+
+        data_dispatcher.dispatch(topic, data.data, sender_identity)
+
+    async def _log_session_metrics() -> None:
+        await loop_lag_monitor.stop()
+        await drawing_lock.aclose()
+        if teacher_shifts is not None:
+            await teacher_shifts.aclose()
+        teacher_actions.close()
+        logger.info(
+            "Teacher actions: %s; %s",
+            teacher_actions.format_stats(),
+            teacher_shifts.format_stats() if teacher_shifts is not None else "schedule off",
+        )
+        if whiteboard_compaction_task is not None and not whiteboard_compaction_task.done():
+            whiteboard_compaction_task.cancel()
+        logger.info(
+            "Whiteboard: student drawing locks sent=%s unlocks sent=%s reused=%s",
+            drawing_lock.locks_sent,
+            drawing_lock.unlocks_sent,
+            drawing_lock.reused,
+        )
+        logger.info(
+            "Whiteboard: publish latency per topic: %s",
+            whiteboard_publish_latency.format(),
+        )
+        await data_dispatcher.aclose()
+        logger.info(
+            "Data channel: packets per topic: %s; handler latency: %s",
+            data_dispatcher.format_stats(),
+            data_packet_latency.format(),
+        )
+        logger.info("Whiteboard: inbound ink simplification %s", ink_simplifier.format_stats())
+        logger.info("Whiteboard: memory %s", whiteboard_memory.format_stats())
+        logger.info(
+            "Whiteboard: vision cache hits=%s misses=%s hit_rate=%.0f%%",
+            vision_result_cache.hits,
+            vision_result_cache.misses,
+            vision_result_cache.hit_rate() * 100.0,
+        )
+        logger.info(
+            "Whiteboard: offloaded work %s (cancelled=%s); event loop lag %s",
+            whiteboard_cpu_latency.format(),
+            whiteboard_offloader.cancelled,
+            loop_lag.format(),
+        )
+        logger.info(
+            "Whiteboard: renders incremental=%s full=%s; unchanged snapshots skipped=%s",
+            whiteboard_raster_cache.incremental_renders,
+            whiteboard_raster_cache.full_redraws,
+            whiteboard_index.unchanged,
         )
 
+    ctx.add_shutdown_callback(_log_session_metrics)
+
     # Generate the initial greeting.
     if agent.prefers_text_mode():
         greeting_text = agent.get_text_mode_greeting()
@@ -1959,4 +2436,6 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "download-files":
+        precompile_templates()
     cli.run_app(server)
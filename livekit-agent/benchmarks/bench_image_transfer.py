@@ -0,0 +1,112 @@
+"""Inbound whiteboard capture: base64-in-JSON packet vs binary byte stream.
+
+Measures time and peak Python memory (tracemalloc) per stage:
+
+- intake, from receipt to validated image bytes: the part the transport
+  changes. The JSON path holds the whole received packet, its decoded text
+  and a decoded copy of the image while it validates; the byte stream
+  holds one 15 KB chunk besides its preallocated buffer.
+- data URL, from there to the string handed to the LLM. The JSON path
+  already has the base64 text; the byte stream encodes it here.
+- end to end, both stages together. The byte stream's base64 encoding
+  costs about what its intake saved, so end-to-end peaks come out about
+  equal: the gains are intake time, a lower intake peak and a 25% smaller
+  payload on the wire, not a lower overall peak.
+
+Each path runs once on a warm event loop before it is measured, so loop
+setup is not counted. The image is a device-resolution screenshot already
+within the vision budget, so neither path re-encodes it.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_image_transfer.py
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from whiteboard_image import read_image_stream  # noqa: E402
+
+CHUNK_SIZE = 15_000  # LiveKit byte stream chunk size
+
+
+def _screenshot() -> bytes:
+    image = Image.effect_noise((1200, 900), 40).convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _json_intake(packet: bytes) -> tuple[str, str]:
+    # Previous handling: parse, then decode the image to validate it.
+    packet_json = json.loads(packet.decode("utf-8"))
+    image_base64 = packet_json["image_base64"]
+    base64.b64decode(image_base64, validate=True)
+    return image_base64, packet_json["mime_type"]
+
+
+def _json_data_url(intake: tuple[str, str]) -> str:
+    image_base64, mime_type = intake
+    return f"data:{mime_type};base64,{image_base64}"
+
+
+async def _chunks(payload: bytes):
+    for start in range(0, len(payload), CHUNK_SIZE):
+        yield payload[start : start + CHUNK_SIZE]
+
+
+def _stream_data_url(intake: tuple[bytearray, str]) -> str:
+    raw, mime_type = intake
+    return f"data:{mime_type};base64,{base64.b64encode(raw).decode('ascii')}"
+
+
+def _measure(fn) -> tuple[object, float, float]:
+    fn()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed_ms, peak / 1e6
+
+
+def main() -> None:
+    payload = _screenshot()
+    packet = json.dumps(
+        {"image_base64": base64.b64encode(payload).decode("ascii"), "mime_type": "image/png"}
+    ).encode("utf-8")
+    print(f"image {len(payload) / 1e6:.2f} MB, JSON packet {len(packet) / 1e6:.2f} MB")
+    loop = asyncio.new_event_loop()
+    paths = (
+        ("json packet", lambda: _json_intake(bytes(packet)), _json_data_url),
+        (
+            "byte stream",
+            lambda: loop.run_until_complete(
+                read_image_stream(_chunks(payload), declared_size=len(payload))
+            ),
+            _stream_data_url,
+        ),
+    )
+    for name, intake_fn, data_url_fn in paths:
+        intake, intake_ms, intake_mb = _measure(intake_fn)
+        _, url_ms, url_mb = _measure(lambda: data_url_fn(intake))
+        _, total_ms, total_mb = _measure(lambda: data_url_fn(intake_fn()))
+        print(
+            f"{name:<12} intake {intake_ms:6.1f} ms peak {intake_mb:5.2f} MB   "
+            f"data URL {url_ms:6.1f} ms peak {url_mb:5.2f} MB   "
+            f"end to end {total_ms:6.1f} ms peak {total_mb:5.2f} MB"
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
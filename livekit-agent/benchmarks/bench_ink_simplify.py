@@ -0,0 +1,116 @@
+"""Inbound ink simplification: point count, memory and downstream cost.
+
+Strokes imitate touch handwriting sampled at 240 Hz: smooth curves with
+sub-pixel jitter and runs of repeated points while the finger rests. Each
+board is parsed as a snapshot with and without an InkSimplifier, then the
+per-board stats pass and a full render are timed on both results. The
+largest distance from any original point to the simplified polyline is
+checked against the tolerance, and the repeat row parses the same
+snapshot again, as coalesced clients re-send it.
+
+Strokes keep their exact points for the wire next to the simplified ones,
+so "held" grows: the gain is in the passes that walk points, not memory.
+The run asserts that the simplified board publishes exactly the points the
+unsimplified one does.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_ink_simplify.py
+"""
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from whiteboard import (  # noqa: E402
+    DEFAULT_INK_TOLERANCE,
+    InkSimplifier,
+    WhiteboardDocument,
+    stroke_point_stats,
+)
+from whiteboard_render import WhiteboardRasterCache, pillow_available  # noqa: E402
+
+BOARD_STROKES = (50, 400)
+POINTS_PER_STROKE = 240
+
+
+def _stroke(rng: random.Random, index: int) -> dict:
+    cx, cy = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+    radius = rng.uniform(0.02, 0.08)
+    turns = rng.uniform(0.5, 1.5)
+    points = []
+    for step in range(POINTS_PER_STROKE):
+        t = step / POINTS_PER_STROKE
+        angle = 2 * math.pi * turns * t
+        x = cx + radius * math.cos(angle) * (1 + 0.3 * t) + rng.gauss(0, 0.0002)
+        y = cy + radius * math.sin(angle) + rng.gauss(0, 0.0002)
+        point = {"x": round(x, 5), "y": round(y, 5)}
+        points.append(point)
+        if rng.random() < 0.15:
+            points.append(dict(point))
+    return {"id": f"{1700000000000 + index}_{index}", "points": points, "normalized": True}
+
+
+def _max_deviation(original: np.ndarray, simplified: np.ndarray) -> float:
+    if len(simplified) < 2:
+        return float(np.hypot(*(original - simplified[0]).T).max())
+    starts = simplified[:-1]
+    directions = simplified[1:] - starts
+    lengths_sq = np.maximum((directions**2).sum(axis=1), 1e-18)
+    offsets = original[:, None, :] - starts[None, :, :]
+    along = np.clip((offsets * directions[None]).sum(axis=2) / lengths_sq, 0.0, 1.0)
+    nearest = offsets - along[..., None] * directions[None]
+    return float(np.sqrt((nearest**2).sum(axis=2)).min(axis=1).max())
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def _render_ms(document: WhiteboardDocument) -> float:
+    if not pillow_available():
+        return float("nan")
+    _, elapsed = _timed(WhiteboardRasterCache().render, document)
+    return elapsed
+
+
+def main() -> None:
+    rng = random.Random(21)
+    print(f"tolerance={DEFAULT_INK_TOLERANCE} normalized units, {POINTS_PER_STROKE} samples per stroke")
+    for count in BOARD_STROKES:
+        raw_strokes = [_stroke(rng, index) for index in range(count)]
+        raw, raw_parse_ms = _timed(WhiteboardDocument.from_wire_items, raw_strokes, [])
+        simplifier = InkSimplifier()
+        simple, parse_ms = _timed(WhiteboardDocument.from_wire_items, raw_strokes, [], None, simplifier)
+        _, repeat_ms = _timed(WhiteboardDocument.from_wire_items, raw_strokes, [], None, simplifier)
+        deviation = max(
+            _max_deviation(
+                np.asarray(before.points.to_pairs(), dtype=np.float64),
+                np.asarray(after.points.to_pairs(), dtype=np.float64),
+            )
+            for before, after in zip(raw.strokes, simple.strokes)
+        )
+        assert simple.to_wire(cache=False) == raw.to_wire(cache=False), "wire points changed"
+        _, raw_stats_ms = _timed(stroke_point_stats, raw.strokes)
+        _, stats_ms = _timed(stroke_point_stats, simple.strokes)
+        print(
+            f"strokes={count:>4} points {simplifier.points_in:>6} -> {simplifier.points_out:>5} "
+            f"bytes {simplifier.bytes_in:>7} -> {simplifier.bytes_out:>6}  "
+            f"held {raw.nbytes:>7} -> {simple.nbytes:>7}  "
+            f"max deviation={deviation:.5f}"
+        )
+        print(
+            f"    parse {raw_parse_ms:>6.1f}ms -> {parse_ms:>6.1f}ms (repeat {repeat_ms:>5.1f}ms)  "
+            f"stats {raw_stats_ms:>5.2f}ms -> {stats_ms:>5.2f}ms  "
+            f"render {_render_ms(raw):>6.1f}ms -> {_render_ms(simple):>6.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
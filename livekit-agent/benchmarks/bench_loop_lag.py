@@ -0,0 +1,77 @@
+"""Event-loop lag while rendering boards inline vs through SessionOffloader.
+
+Each round does a full redraw of a 10k-stroke board plus vision encoding,
+the worst case for _respond_to_whiteboard_after_pause. Lag is how late a 10 ms
+periodic wakeup fires, i.e. what audio I/O on the same loop would see.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_loop_lag.py
+"""
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whiteboard_render  # noqa: E402
+from offload import SessionOffloader  # noqa: E402
+from telemetry import LatencyRecorder, LoopLagMonitor  # noqa: E402
+from vision_encoding import encode_for_vision  # noqa: E402
+from whiteboard import StrokeItem, StrokePoints, WhiteboardDocument  # noqa: E402
+
+STROKES = 10000
+POINTS_PER_STROKE = 20
+ROUNDS = 4
+
+
+def _board() -> WhiteboardDocument:
+    rng = random.Random(9)
+    return WhiteboardDocument(
+        tuple(
+            StrokeItem(
+                f"stroke_{index}",
+                StrokePoints.from_pairs(
+                    [(rng.random(), rng.random()) for _ in range(POINTS_PER_STROKE)]
+                ),
+                normalized=True,
+            )
+            for index in range(STROKES)
+        )
+    )
+
+
+def _render_and_encode(document: WhiteboardDocument) -> str:
+    image = whiteboard_render.WhiteboardRasterCache().render(document)
+    return encode_for_vision(image).data_url()
+
+
+async def _measure(document: WhiteboardDocument, offloaded: bool) -> LatencyRecorder:
+    recorder = LatencyRecorder()
+    monitor = LoopLagMonitor(recorder, interval_s=0.01)
+    offloader = SessionOffloader()
+    monitor.start()
+    for _ in range(ROUNDS):
+        if offloaded:
+            await offloader.run("render", _render_and_encode, document)
+        else:
+            _render_and_encode(document)
+        await asyncio.sleep(0.05)
+    await monitor.stop()
+    return recorder
+
+
+def main() -> None:
+    if not whiteboard_render.pillow_available():
+        raise SystemExit("Pillow is required for this benchmark")
+    document = _board()
+    for name, offloaded in (("inline", False), ("offloaded", True)):
+        stats = asyncio.run(_measure(document, offloaded)).snapshot()["loop_lag"]
+        print(
+            f"{name:<10} loop lag p50={stats['p50_ms']:.1f}ms "
+            f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
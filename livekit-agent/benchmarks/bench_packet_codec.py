@@ -0,0 +1,137 @@
+"""Decode + validate time per data-channel packet type and codec backend.
+
+"manual" is the previous path: stdlib json, then isinstance checks by hand.
+Each installed backend decodes into the typed schema from packets.py
+(msgspec in one native pass; orjson and json decode, then convert). The
+encode rows serialize the outbound teacher action and transcription packets.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_packet_codec.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import packet_codec  # noqa: E402
+from packets import (  # noqa: E402
+    ChatTextMessage,
+    TeacherActionPacket,
+    TeacherActionRequest,
+    TeacherActionResultPacket,
+    TranscriptionPacket,
+    WhiteboardProjectPacket,
+)
+
+TARGET_SECONDS = 0.3
+
+
+def _project(strokes: int) -> bytes:
+    rng = random.Random(strokes)
+    payload = {
+        "strokes": [
+            {
+                "id": f"stroke_{index}",
+                "points": [{"x": rng.random(), "y": rng.random()} for _ in range(30)],
+                "color": 4278190080,
+                "strokeWidth": 3.0,
+                "normalized": True,
+            }
+            for index in range(strokes)
+        ],
+        "texts": [{"id": "t1", "text": "2x + 3 = 7", "x": 0.1, "y": 0.2}],
+        "capabilities": ["project_delta"],
+        "seq": 12,
+    }
+    return json.dumps({"type": "project", "payload": payload}, separators=(",", ":")).encode()
+
+
+def _manual_chat(data: bytes):
+    packet = json.loads(data.decode("utf-8"))
+    if not isinstance(packet, dict):
+        return None
+    content = packet.get("content", "")
+    content = content.strip() if isinstance(content, str) else str(content or "").strip()
+    mode = packet.get("response_mode")
+    mode = mode.strip().lower() if isinstance(mode, str) else ""
+    message_id = packet.get("message_id") or packet.get("id") or packet.get("request_id") or ""
+    return packet.get("type"), content, mode, message_id
+
+
+def _manual_result(data: bytes):
+    packet = json.loads(data.decode("utf-8"))
+    if not isinstance(packet, dict) or packet.get("type") != "teacher_action_result":
+        return None
+    payload = packet.get("payload")
+    return payload if isinstance(payload, dict) else None
+
+
+def _manual_project(data: bytes):
+    packet = json.loads(data.decode("utf-8"))
+    if not isinstance(packet, dict) or packet.get("type") != "project":
+        return None
+    payload = packet.get("payload")
+    if not isinstance(payload, dict) or not isinstance(payload.get("strokes"), list):
+        return None
+    texts = payload.get("texts")
+    if texts is not None and not isinstance(texts, list):
+        return None
+    seq = payload.get("seq")
+    return payload, seq if isinstance(seq, int) and not isinstance(seq, bool) else None
+
+
+def _time_us(fn, *args) -> float:
+    rounds = 0
+    started = time.perf_counter()
+    while True:
+        fn(*args)
+        rounds += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= TARGET_SECONDS:
+            return elapsed * 1e6 / rounds
+
+
+def main() -> None:
+    chat = json.dumps(
+        {"type": "user_text_message", "content": "What is 7 x 8?", "response_mode": "text", "message_id": "m-1"}
+    ).encode()
+    result = json.dumps(
+        {
+            "type": "teacher_action_result",
+            "payload": {"requestId": "teacher_action_1", "success": True, "message": "Done", "data": {"shifts": list(range(20))}},
+        }
+    ).encode()
+    cases = (
+        ("chat", chat, _manual_chat, ChatTextMessage),
+        ("teacher result", result, _manual_result, TeacherActionResultPacket),
+        ("project 20 strokes", _project(20), _manual_project, WhiteboardProjectPacket),
+        ("project 1000 strokes", _project(1000), _manual_project, WhiteboardProjectPacket),
+    )
+    backends = packet_codec.available_backends()
+    print(f"{'packet':<22} {'bytes':>8} {'manual us':>10} " + " ".join(f"{name + ' us':>11}" for name in backends))
+    for name, data, manual, schema in cases:
+        row = f"{name:<22} {len(data):>8} {_time_us(manual, data):>10.1f} "
+        for backend in backends:
+            packet_codec.select_backend(backend)
+            row += f"{_time_us(packet_codec.decode, data, schema):>11.1f} "
+        print(row)
+
+    action = TeacherActionPacket(
+        type="teacher_action",
+        payload=TeacherActionRequest(requestId="teacher_action_1", action="list_shifts", args={"day": "monday"}),
+    )
+    transcription = TranscriptionPacket(type="final", content="Great job! " * 20, sender="ai", timestamp=time.time())
+    legacy = {"type": "final", "content": transcription.content, "sender": "ai", "timestamp": transcription.timestamp}
+    for name, packet in (("encode teacher action", action), ("encode transcription", transcription)):
+        row = f"{name:<22} {len(packet_codec.dumps(packet)):>8} {_time_us(json.dumps, legacy):>10.1f} "
+        for backend in backends:
+            packet_codec.select_backend(backend)
+            row += f"{_time_us(packet_codec.dumps, packet):>11.1f} "
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
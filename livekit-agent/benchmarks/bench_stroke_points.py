@@ -0,0 +1,111 @@
+"""Stroke point storage: tuples of floats vs packed float32 buffers.
+
+Reports memory per stroke and board summary time (bounds, point count, ink
+length) for a 50k-point board, plus the cost of keeping the document's stats
+current across single-stroke changes. Pass --no-numpy to measure the array("f")
+fallback.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_stroke_points.py
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whiteboard  # noqa: E402
+
+if "--no-numpy" in sys.argv:
+    whiteboard.np = None
+
+STROKES = 500
+POINTS_PER_STROKE = 100
+ROUNDS = 20
+
+
+def _tuple_size(points: tuple) -> int:
+    return sys.getsizeof(points) + sum(
+        sys.getsizeof(point) + sys.getsizeof(point[0]) + sys.getsizeof(point[1])
+        for point in points
+    )
+
+
+def _summarize_tuples(boards: list[tuple]) -> tuple:
+    point_count = 0
+    ink_length = 0.0
+    min_x, min_y, max_x, max_y = 1.0, 1.0, 0.0, 0.0
+    for points in boards:
+        point_count += len(points)
+        for x, y in points:
+            min_x = min(min_x, x)
+            min_y = min(min_y, y)
+            max_x = max(max_x, x)
+            max_y = max(max_y, y)
+        ink_length += sum(
+            math.hypot(x1 - x0, y1 - y0) for (x0, y0), (x1, y1) in zip(points, points[1:])
+        )
+    return point_count, (min_x, min_y, max_x, max_y), ink_length
+
+
+def _summarize_packed(strokes: list[whiteboard.StrokeItem]) -> tuple:
+    stats = whiteboard.stroke_point_stats(strokes)
+    return stats.point_count, stats.bounds, stats.normalized_ink_length
+
+
+def main() -> None:
+    rng = random.Random(5)
+    wire_strokes = [
+        [{"x": rng.random(), "y": rng.random()} for _ in range(POINTS_PER_STROKE)]
+        for _ in range(STROKES)
+    ]
+    tuples = [tuple((p["x"], p["y"]) for p in raw) for raw in wire_strokes]
+
+    start = time.perf_counter()
+    packed = [
+        whiteboard.StrokeItem(str(index), whiteboard.StrokePoints.from_wire(raw), normalized=True)
+        for index, raw in enumerate(wire_strokes)
+    ]
+    parse_ms = (time.perf_counter() - start) * 1000.0
+
+    expected = _summarize_tuples(tuples)
+    actual = _summarize_packed(packed)
+    assert expected[0] == actual[0]
+    assert all(abs(a - b) < 1e-6 for a, b in zip(expected[1], actual[1]))
+    assert abs(expected[2] - actual[2]) / expected[2] < 1e-4
+
+    backend = "numpy" if whiteboard.np is not None else "array('f')"
+    print(f"{STROKES} strokes x {POINTS_PER_STROKE} points, backend={backend}")
+    tuple_bytes = sum(_tuple_size(points) for points in tuples) / STROKES
+    packed_bytes = sum(stroke.points.nbytes for stroke in packed) / STROKES
+    print(f"bytes/stroke      tuples {tuple_bytes:9.0f}   packed {packed_bytes:9.0f}")
+
+    timings = {}
+    for name, fn, board in (("tuples", _summarize_tuples, tuples), ("packed", _summarize_packed, packed)):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            fn(board)
+        timings[name] = (time.perf_counter() - start) * 1000.0 / ROUNDS
+    print(f"summary ms        tuples {timings['tuples']:9.2f}   packed {timings['packed']:9.2f}")
+    print(f"parse ms (packed) {parse_ms:9.2f}")
+
+    # Incremental stats: add then erase one stroke on the full board.
+    document = whiteboard.WhiteboardDocument(tuple(packed))
+    document.stats.bounds
+    extra = whiteboard.StrokeItem(
+        "extra", whiteboard.StrokePoints.from_pairs([(0.5, 0.5), (0.6, 0.6)]), normalized=True
+    )
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        added = document.apply({"add_strokes": [extra]})
+        added.stats.bounds
+        erased = added.apply({"remove": ["extra"]})
+        erased.stats.bounds
+    incremental_ms = (time.perf_counter() - start) * 1000.0 / (2 * ROUNDS)
+    print(f"stats per change  incremental {incremental_ms:7.3f} ms (includes tuple rebuild)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Per-job template startup cost: fresh compile vs process cache vs precompiled files.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_template_cache.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pybars  # noqa: E402
+
+import agent  # noqa: E402
+
+JOB_METADATA = json.dumps(
+    {
+        "user_name": "Aisha",
+        "class_schedule": "Monday 4 PM Qur'an, Wednesday 5 PM Math",
+        "class_schedule_status": "available",
+        "current_local_readable": "Monday, February 23, 2026 3:10 PM",
+        "user_timezone": "America/New_York",
+        "user_role": "student",
+    }
+)
+ROUNDS = 50
+
+
+def _per_job_ms(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) * 1000.0 / ROUNDS
+
+
+def main() -> None:
+    variables = {"metadata": json.loads(JOB_METADATA)}
+
+    def fresh_compile_job() -> None:
+        # Previous behaviour: every job owned a new compiler and cache.
+        compiler = pybars.Compiler()
+        for template in agent.PRECOMPILED_TEMPLATES[:2]:
+            compiler.compile(template)(variables)
+
+    def process_cache_job() -> None:
+        templater = agent.VariableTemplater(JOB_METADATA)
+        for template in agent.PRECOMPILED_TEMPLATES[:2]:
+            templater.render(template)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        agent.precompile_templates(cache_dir=cache_dir)
+        keys = [agent._template_key(t) for t in agent.PRECOMPILED_TEMPLATES[:2]]
+
+        def new_worker_from_disk() -> None:
+            # A new worker process: empty memory cache, precompiled files on disk.
+            for key in keys:
+                agent._load_precompiled_template(key, cache_dir)(variables)
+
+        agent.warm_template_cache()
+        results = {
+            "fresh compile per job": _per_job_ms(fresh_compile_job),
+            "process-wide cache": _per_job_ms(process_cache_job),
+            "new worker, precompiled": _per_job_ms(new_worker_from_disk),
+        }
+
+    baseline = results["fresh compile per job"]
+    for name, ms in results.items():
+        print(f"{name:<26} {ms:8.3f} ms/job  ({baseline / ms:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
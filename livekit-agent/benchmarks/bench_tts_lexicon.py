@@ -0,0 +1,102 @@
+"""Pronunciation lexicon throughput: per-rule scans, single pass, and streaming.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_tts_lexicon.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agent  # noqa: E402
+
+TUTOR_REPLIES = [
+    "Assalamu alaykum Aisha, Alhamdulillah you finished your homework, what did you find hardest?",
+    "Great effort, MashaAllah! In the Qur'an, Allah reminds us to be patient, can you think of a time you were patient?",
+    "Before we start, let us say Bismillah together, and then we can look at fractions, ready?",
+    "When we pray Salah we follow the Sunnah of the Prophet, do you remember how many rakahs Fajr has?",
+    "Two plus three equals five, SubhanAllah you got it quickly, can you try four plus four?",
+    "InshaAllah we will review your spelling words tomorrow, which word was the trickiest?",
+    "If you make a mistake, say Astaghfirullah and try again, Allahu Akbar, you can do it, what comes next?",
+    "That is a lovely drawing of a triangle, how many sides does it have?",
+]
+ROUNDS = 2000
+
+
+def _stream_chunks(text: str, rng: random.Random) -> list[str]:
+    # Approximate LLM streaming deltas of one to four words.
+    words = text.split(" ")
+    chunks: list[str] = []
+    index = 0
+    while index < len(words):
+        size = rng.randint(1, 4)
+        chunks.append(" ".join(words[index : index + size]) + " ")
+        index += size
+    return chunks
+
+
+def _check_equivalence(lexicon, rng: random.Random) -> None:
+    tokens = [
+        "allah", "Allah", "ALLAH", "a-l-l-a-h", "A L L A H", "a-lay-h", "allahu akbar",
+        "allahumma", "alhamdu-lillah", "alhamdulillah", "subhan allah", "subhanallah",
+        "astaghfirullah", "astaghfiru llah", "bismi llah", "bismillah", "insha'allah",
+        "insha allah", "inshaallah", "masha’allah", "qur'an", "quran", "sunnah", "salah",
+        "assalamu alaykum", "Allaah", "salaah", "the", "and", "-", " ", ",", ".",
+    ]
+    for _ in range(20000):
+        sample = rng.choice(["", " ", "-"]).join(
+            rng.choice(tokens) for _ in range(rng.randint(1, 8))
+        )
+        expected = lexicon.apply_sequential(sample)
+        actual = lexicon.apply(sample)
+        if expected != actual:
+            raise AssertionError(f"mismatch for {sample!r}: {expected!r} != {actual!r}")
+
+
+def main() -> None:
+    rng = random.Random(7)
+    lexicon = agent.TTS_PRONUNCIATION_LEXICON
+    _check_equivalence(lexicon, rng)
+
+    chunks = [chunk for reply in TUTOR_REPLIES for chunk in _stream_chunks(reply, rng)]
+    total_chars = sum(len(chunk) for chunk in chunks)
+
+    for name, fn in (
+        ("sequential rules", lexicon.apply_sequential),
+        ("single pass", lexicon.apply),
+    ):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for chunk in chunks:
+                fn(chunk)
+        elapsed = time.perf_counter() - start
+        per_chunk_us = elapsed * 1e6 / (ROUNDS * len(chunks))
+        mb_per_s = total_chars * ROUNDS / elapsed / 1e6
+        print(f"{name:<18} {per_chunk_us:7.2f} us/chunk  {mb_per_s:7.2f} MB/s")
+
+    # Streaming normalizer: same output as the whole reply, split terms included.
+    held_chunks = 0
+    max_held_chars = 0
+    start = time.perf_counter()
+    for _ in range(ROUNDS // 10):
+        for reply in TUTOR_REPLIES:
+            reply_chunks = _stream_chunks(reply, rng)
+            normalizer = lexicon.streaming_normalizer()
+            streamed = "".join(normalizer.feed(chunk) for chunk in reply_chunks)
+            streamed += normalizer.flush()
+            if streamed != lexicon.apply("".join(reply_chunks)):
+                raise AssertionError(f"streaming mismatch for {reply!r}")
+            held_chunks += normalizer.stats.held_chunks
+            max_held_chars = max(max_held_chars, normalizer.stats.max_held_chars)
+    elapsed = time.perf_counter() - start
+    turns = (ROUNDS // 10) * len(TUTOR_REPLIES)
+    print(
+        f"{'streaming':<18} {elapsed * 1e6 / turns:7.2f} us/turn  "
+        f"held {held_chunks / turns:.2f} chunks/turn, max {max_held_chars} chars"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Board fingerprints: cost and which variants count as the same board.
+
+A rendered board is compared with re-encoded and rescaled copies (should
+match) and with copies that gained a small mark in blank space or lost a
+stroke (should not). Ink added on top of existing ink is not detected. dHash distance is printed alongside to show why it only prefilters.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_vision_cache.py
+"""
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from vision_cache import BoardFingerprint  # noqa: E402
+from whiteboard import StrokeItem, StrokePoints, TextItem, WhiteboardDocument  # noqa: E402
+from whiteboard_render import WhiteboardRasterCache, load_font  # noqa: E402
+
+ROUNDS = 20
+
+
+def _scribble(rng: random.Random, index: int, length: int) -> StrokeItem:
+    x, y = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+    points = []
+    for _ in range(length):
+        x = min(0.98, max(0.02, x + rng.uniform(-0.01, 0.01)))
+        y = min(0.98, max(0.02, y + rng.uniform(-0.01, 0.01)))
+        points.append((x, y))
+    return StrokeItem(f"stroke_{index}", StrokePoints.from_pairs(points), normalized=True)
+
+
+def _board(strokes: int, seed: int = 7) -> WhiteboardDocument:
+    rng = random.Random(seed)
+    return WhiteboardDocument(
+        tuple(_scribble(rng, index, rng.randint(10, 60)) for index in range(strokes)),
+        (TextItem("text_0", "3x + 4 = 10", 0.1, 0.1),),
+    )
+
+
+def _reencode(image, fmt: str, **params):
+    out = io.BytesIO()
+    image.save(out, format=fmt, **params)
+    return Image.open(out).convert("RGB")
+
+
+def _blank_spot(image, width: int = 48, height: int = 24) -> tuple[int, int]:
+    """Top-left of a blank area, so a new mark is not hidden under old ink."""
+    gray = image.convert("L")
+    for y in range(16, image.size[1] - height, height):
+        for x in range(16, image.size[0] - width, width):
+            if gray.crop((x, y, x + width, y + height)).getextrema()[0] == 255:
+                return x, y
+    return 16, 16
+
+
+def _with_mark(image, text: str):
+    """Text at the smallest size the board renders (12 px)."""
+    marked = image.copy()
+    ImageDraw.Draw(marked).text(_blank_spot(image), text, fill=(0, 0, 0), font=load_font(12))
+    return marked
+
+
+def _with_tick(image):
+    """A short pen tick, as the student would add to an answer."""
+    x, y = _blank_spot(image)
+    marked = image.copy()
+    ImageDraw.Draw(marked).line(
+        ((x, y + 10), (x + 6, y + 18), (x + 18, y)), fill=(0, 0, 0), width=3
+    )
+    return marked
+
+
+def main() -> None:
+    for strokes in (12, 120, 400):
+        _compare(strokes)
+
+
+def _compare(strokes: int) -> None:
+    base_document = _board(strokes)
+    base = WhiteboardRasterCache().render(base_document)
+    erased = WhiteboardRasterCache().render(
+        WhiteboardDocument(base_document.strokes[:-1], base_document.texts)
+    )
+    variants = (
+        ("same render", WhiteboardRasterCache().render(base_document), True),
+        ("jpeg q40", _reencode(base, "JPEG", quality=40), True),
+        ("rescaled 1.25x", base.resize((1280, 960), Image.Resampling.BICUBIC), True),
+        ("rescaled 0.6x", base.resize((614, 461), Image.Resampling.LANCZOS), True),
+        ("new digit", _with_mark(base, "7"), False),
+        ("new word", _with_mark(base, "x = 2"), False),
+        ("pen tick", _with_tick(base), False),
+        ("last stroke erased", erased, False),
+    )
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        reference = BoardFingerprint.from_image(base)
+    fingerprint_ms = (time.perf_counter() - start) * 1000.0 / ROUNDS
+    print(f"{strokes} strokes: fingerprint of {base.size[0]}x{base.size[1]} board {fingerprint_ms:.2f} ms")
+
+    print(f"{'variant':<20} {'dHash bits':>10} {'match':>6} {'expected':>9} {'compare ms':>10}")
+    for name, image, expected in variants:
+        candidate = BoardFingerprint.from_image(image)
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            matched = reference.matches(candidate)
+        compare_ms = (time.perf_counter() - start) * 1000.0 / ROUNDS
+        distance = (reference.dhash ^ candidate.dhash).bit_count()
+        print(f"{name:<20} {distance:>10} {str(matched):>6} {str(expected):>9} {compare_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
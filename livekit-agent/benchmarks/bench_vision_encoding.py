@@ -0,0 +1,106 @@
+"""Vision image encoding: size, encode time and fidelity per board type.
+
+Boards are rendered the way the agent renders them (WhiteboardRasterCache),
+plus a client-style capture at device pixel ratio 2.5 with anti-aliasing.
+"baseline" is the previous lossless full-size PNG. PSNR compares each
+output, scaled back up when downscaled, with the full-size original. A second
+pass uses a tight byte budget to show the quality/downscale ladder and its
+floors: boards that cannot fit stay readable and are returned over budget.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_vision_encoding.py
+"""
+import io
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageChops, ImageFilter, ImageStat  # noqa: E402
+
+from vision_encoding import DEFAULT_VISION_MAX_BYTES, encode_for_vision  # noqa: E402
+from whiteboard import StrokeItem, StrokePoints, TextItem, WhiteboardDocument  # noqa: E402
+from whiteboard_render import WhiteboardRasterCache, encode_png  # noqa: E402
+
+ROUNDS = 3
+TIGHT_BUDGET_BYTES = 40_000
+
+
+def _scribble(rng: random.Random, index: int, length: int) -> StrokeItem:
+    x, y = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+    points = []
+    for _ in range(length):
+        x = min(0.98, max(0.02, x + rng.uniform(-0.01, 0.01)))
+        y = min(0.98, max(0.02, y + rng.uniform(-0.01, 0.01)))
+        points.append((x, y))
+    return StrokeItem(
+        f"stroke_{index}",
+        StrokePoints.from_pairs(points),
+        color=rng.choice([0xFF000000, 0xFF0E72ED, 0xFFDC2626]),
+        stroke_width=rng.choice([3.0, 4.0, 6.0]),
+        normalized=True,
+    )
+
+
+def _board(strokes: int, texts: int, seed: int) -> WhiteboardDocument:
+    rng = random.Random(seed)
+    return WhiteboardDocument(
+        tuple(_scribble(rng, index, rng.randint(10, 60)) for index in range(strokes)),
+        tuple(
+            TextItem(f"text_{index}", f"{index} + {index} = {index * 2}", rng.random() * 0.8, rng.random())
+            for index in range(texts)
+        ),
+    )
+
+
+def _psnr(reference, candidate) -> float:
+    if candidate.size != reference.size:
+        candidate = candidate.resize(reference.size, Image.Resampling.LANCZOS)
+    diff = ImageChops.difference(reference.convert("RGB"), candidate.convert("RGB"))
+    mse = sum(value * value for value in ImageStat.Stat(diff).rms) / 3.0
+    return float("inf") if mse == 0 else 20 * math.log10(255.0 / math.sqrt(mse))
+
+
+def _samples() -> list[tuple[str, Image.Image]]:
+    samples = []
+    for name, strokes, texts in (
+        ("sparse sketch", 12, 2),
+        ("worked problem", 120, 12),
+        ("dense board", 1500, 30),
+    ):
+        samples.append((name, WhiteboardRasterCache().render(_board(strokes, texts, len(name)))))
+    # Client capture: higher resolution and anti-aliased, so many colors.
+    capture = WhiteboardRasterCache(2560, 1920).render(_board(120, 12, 99))
+    samples.append(("client capture", capture.filter(ImageFilter.GaussianBlur(1.2))))
+    return samples
+
+
+def main() -> None:
+    samples = _samples()
+    for max_bytes in (DEFAULT_VISION_MAX_BYTES, TIGHT_BUDGET_BYTES):
+        print(f"budget {max_bytes // 1000} KB")
+        print(
+            f"{'board':<15} {'baseline KB':>11} {'baseline ms':>11} {'out KB':>7} "
+            f"{'format':>10} {'size':>10} {'encode ms':>9} {'PSNR dB':>8}"
+        )
+        for name, image in samples:
+            start = time.perf_counter()
+            baseline = encode_png(image)
+            baseline_ms = (time.perf_counter() - start) * 1000.0
+            start = time.perf_counter()
+            for _ in range(ROUNDS):
+                encoded = encode_for_vision(image, max_bytes=max_bytes)
+            encode_ms = (time.perf_counter() - start) * 1000.0 / ROUNDS
+            decoded = Image.open(io.BytesIO(encoded.data))
+            print(
+                f"{name:<15} {len(baseline) / 1024:>11.1f} {baseline_ms:>11.1f} "
+                f"{len(encoded.data) / 1024:>7.1f} {encoded.mime_type:>10} "
+                f"{f'{encoded.width}x{encoded.height}':>10} {encode_ms:>9.1f} "
+                f"{_psnr(image, decoded):>8.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Inbound project snapshots with and without per-sender coalescing.
+
+A student draws one stroke every 10 ms and the client sends the whole
+board after each stroke, as legacy clients do. The handler does what the
+agent does per packet: decode, build the document and diff it against the id index.
+CPU time should stay flat with coalescing as the stroke rate climbs.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_whiteboard_coalesce.py
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_dispatch import DataPacketDispatcher  # noqa: E402
+from whiteboard import WhiteboardDocument, WhiteboardIdIndex, is_snapshot_packet  # noqa: E402
+
+TOPIC = "ai_tutor_whiteboard"
+STROKES = 300
+INTERVAL_S = 0.01
+WINDOW_S = 0.1
+
+
+def _snapshots() -> list[bytes]:
+    rng = random.Random(5)
+    strokes = []
+    packets = []
+    for index in range(STROKES):
+        strokes.append(
+            {
+                "id": f"stroke_{index}",
+                "points": [{"x": rng.random(), "y": rng.random()} for _ in range(30)],
+                "normalized": True,
+            }
+        )
+        packets.append(
+            json.dumps(
+                {"type": "project", "payload": {"strokes": strokes, "texts": []}},
+                separators=(",", ":"),
+            ).encode()
+        )
+    return packets
+
+
+def _decode(data: bytes) -> WhiteboardDocument:
+    return WhiteboardDocument.from_wire(json.loads(data.decode("utf-8"))["payload"])
+
+
+async def _run(packets: list[bytes], window_s: float) -> tuple[int, float, float]:
+    handled = 0
+    index = WhiteboardIdIndex()
+
+    def _handle(document: WhiteboardDocument, sender_identity: str) -> None:
+        nonlocal handled
+        handled += 1
+        index.replace(document)
+
+    dispatcher = DataPacketDispatcher(offload_bytes=1 << 30)
+    dispatcher.register(
+        TOPIC,
+        _handle,
+        decode=_decode,
+        supersedes=is_snapshot_packet,
+        coalesce_window_s=window_s,
+    )
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for data in packets:
+        dispatcher.dispatch(TOPIC, data, "student")
+        await asyncio.sleep(INTERVAL_S)
+    await dispatcher.join()
+    return (
+        handled,
+        (time.process_time() - cpu_started) * 1000.0,
+        (time.perf_counter() - wall_started) * 1000.0,
+    )
+
+
+def main() -> None:
+    packets = _snapshots()
+    print(f"{len(packets)} snapshots, one every {INTERVAL_S * 1000:.0f} ms")
+    for name, window_s in (("every packet", 0.0), (f"coalesce {WINDOW_S * 1000:.0f} ms", WINDOW_S)):
+        handled, cpu_ms, wall_ms = asyncio.run(_run(packets, window_s))
+        print(f"{name:<16} handled={handled:>4} cpu={cpu_ms:>8.1f}ms wall={wall_ms:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Per added line: snapshot vs project_delta bytes, and deep copy vs shared apply.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_whiteboard_delta.py
+"""
+import copy
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from whiteboard import (  # noqa: E402
+    StrokeItem,
+    StrokePoints,
+    WhiteboardDocument,
+    build_delta,
+    parse_delta,
+)
+
+BOARD_SIZES = (10, 100, 1000)
+POINTS_PER_STROKE = 40
+
+
+def _stroke(rng: random.Random, index: int) -> dict:
+    return {
+        "id": f"stroke_{index}",
+        "points": [
+            {"x": round(rng.random(), 4), "y": round(rng.random(), 4)}
+            for _ in range(POINTS_PER_STROKE)
+        ],
+        "color": 0xFF0E72ED,
+        "strokeWidth": 4.0,
+        "normalized": True,
+    }
+
+
+def main() -> None:
+    rng = random.Random(11)
+    print(
+        f"{'strokes':>8} {'snapshot bytes':>15} {'delta bytes':>12} {'snapshot ms':>12} "
+        f"{'delta ms':>9} {'deepcopy ms':>12} {'apply ms':>9}"
+    )
+    for size in BOARD_SIZES:
+        wire_project = {"strokes": [_stroke(rng, index) for index in range(size)], "texts": []}
+        document = WhiteboardDocument.from_wire(wire_project)
+        new_line = StrokeItem(
+            "agent_line",
+            StrokePoints.from_pairs(((0.1, 0.1), (0.9, 0.9))),
+            color=0xFF0E72ED,
+            stroke_width=4.0,
+            normalized=True,
+        )
+
+        delta = build_delta(size + 1, add_strokes=[new_line])
+
+        # Previous approach: every reader/writer deep-copied the wire dict.
+        start = time.perf_counter()
+        copied = copy.deepcopy(wire_project)
+        copied["strokes"].append(new_line.to_wire())
+        deepcopy_ms = (time.perf_counter() - start) * 1000.0
+
+        start = time.perf_counter()
+        updated = document.apply(parse_delta(delta))
+        apply_ms = (time.perf_counter() - start) * 1000.0
+
+        start = time.perf_counter()
+        snapshot = json.dumps({"type": "project", "payload": updated.to_wire(size + 1)})
+        snapshot_ms = (time.perf_counter() - start) * 1000.0
+
+        start = time.perf_counter()
+        delta_message = json.dumps({"type": "project_delta", "payload": delta})
+        delta_ms = (time.perf_counter() - start) * 1000.0
+
+        print(
+            f"{size:>8} {len(snapshot):>15} {len(delta_message):>12} "
+            f"{snapshot_ms:>12.3f} {delta_ms:>9.3f} {deepcopy_ms:>12.3f} {apply_ms:>9.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
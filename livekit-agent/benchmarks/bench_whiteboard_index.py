@@ -0,0 +1,140 @@
+"""Classifying inbound whiteboard changes: rebuilt id sets vs the id index.
+
+A student keeps drawing on a busy board. "legacy" rebuilds the stroke and
+text id sets of the whole board after every change and compares unions, as
+the agent used to. The index is updated from the ids a delta names, and a
+re-sent snapshot carrying the client fingerprint is skipped without a diff.
+"erase last" compares recovering recency from timestamps in every id (regex,
+then a sort over the board) with walking the index's recency order.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_whiteboard_index.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from whiteboard import (  # noqa: E402
+    StrokeItem,
+    StrokePoints,
+    WhiteboardDocument,
+    WhiteboardIdIndex,
+    classify_board_change,
+    new_item_id,
+)
+
+BOARD_SIZES = (100, 1000, 5000)
+CHANGES = 500
+ERASE_COUNT = 3
+
+
+def _stroke(item_id: str) -> StrokeItem:
+    return StrokeItem(item_id, StrokePoints.from_pairs([(0.1, 0.2), (0.3, 0.4)]), normalized=True)
+
+
+def _changes() -> list[dict]:
+    changes = []
+    for index in range(CHANGES):
+        if index % 4 == 3:
+            changes.append({"remove": [f"new_{index - 1}"]})
+        else:
+            changes.append({"add_strokes": [_stroke(f"new_{index}")]})
+    return changes
+
+
+def _document_ids(document: WhiteboardDocument) -> set[str]:
+    # What classification used before the index: every id, rebuilt per change.
+    return {stroke.id for stroke in document.strokes} | {text_item.id for text_item in document.texts}
+
+
+def _legacy(document: WhiteboardDocument, changes: list[dict]) -> float:
+    previous_ids = _document_ids(document)
+    elapsed = 0.0
+    for change in changes:
+        document = document.apply(change)
+        started = time.perf_counter()
+        current_ids = _document_ids(document)
+        if len(current_ids) > len(previous_ids):
+            action = "added"
+        elif len(current_ids) < len(previous_ids):
+            action = "erased"
+        else:
+            action = "updated"
+        previous_ids = current_ids
+        elapsed += time.perf_counter() - started
+    assert action
+    return elapsed
+
+
+def _indexed(document: WhiteboardDocument, changes: list[dict]) -> float:
+    index = WhiteboardIdIndex()
+    index.replace(document)
+    elapsed = 0.0
+    for change in changes:
+        document = document.apply(change)
+        started = time.perf_counter()
+        before = len(index)
+        action = classify_board_change(before, *index.apply_change(change))
+        elapsed += time.perf_counter() - started
+    assert action
+    return elapsed
+
+
+def _resent_snapshot(document: WhiteboardDocument) -> tuple[float, float]:
+    index = WhiteboardIdIndex()
+    fingerprint = (len(document.strokes), len(document.texts), "c0ffee")
+    index.replace(document, fingerprint)
+    started = time.perf_counter()
+    index.replace(document, fingerprint)
+    diffed = time.perf_counter() - started
+    started = time.perf_counter()
+    assert index.is_unchanged(fingerprint)
+    return diffed, time.perf_counter() - started
+
+
+def _legacy_erase_last(document: WhiteboardDocument, count: int) -> list[str]:
+    def _timestamp(item_id: str, fallback: int) -> int:
+        match = re.search(r"(\d{9,})", item_id)
+        return int(match.group(1)) if match is not None else fallback
+
+    combined = [
+        (_timestamp(item.id, position), position, item.id)
+        for items in (document.strokes, document.texts)
+        for position, item in enumerate(items)
+    ]
+    combined.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    return [item_id for _, _, item_id in combined[:count]]
+
+
+def _erase_last(document: WhiteboardDocument) -> tuple[float, float]:
+    index = WhiteboardIdIndex()
+    index.replace(document)
+    started = time.perf_counter()
+    _legacy_erase_last(document, ERASE_COUNT)
+    legacy = time.perf_counter() - started
+    started = time.perf_counter()
+    index.recent(ERASE_COUNT)
+    return legacy, time.perf_counter() - started
+
+
+def main() -> None:
+    print(f"{CHANGES} changes per board; per-change classification cost")
+    for board in BOARD_SIZES:
+        document = WhiteboardDocument(tuple(_stroke(new_item_id("agent")) for _ in range(board)))
+        changes = _changes()
+        legacy_us = _legacy(document, changes) * 1e6 / CHANGES
+        indexed_us = _indexed(document, changes) * 1e6 / CHANGES
+        diffed_s, skipped_s = _resent_snapshot(document)
+        legacy_erase_s, erase_s = _erase_last(document)
+        print(
+            f"board={board:>5} legacy={legacy_us:>8.1f}us index={indexed_us:>6.1f}us  "
+            f"re-sent snapshot: diff={diffed_s * 1e6:>7.1f}us fingerprint={skipped_s * 1e6:>5.1f}us  "
+            f"erase last {ERASE_COUNT}: legacy={legacy_erase_s * 1e6:>8.1f}us index={erase_s * 1e6:>5.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
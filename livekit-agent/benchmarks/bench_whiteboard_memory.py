@@ -0,0 +1,120 @@
+"""Whiteboard memory over a long lesson, with and without a budget.
+
+A session receives student strokes one delta at a time, as the client sends
+them, and every 20th change the agent publishes a full snapshot, keeping
+the wire dicts only when the budget allows it. After each change the
+budget reads its gauge and compacts when over; the re-simplification pass
+runs inline here, where the agent runs it on a worker thread. Rows report
+the gauge at the end, its peak and the most held once a change was
+enforced, the strokes and points left on the board, the strokes evicted,
+and the time per change spent in `enforce` and in the re-simplification
+jobs.
+
+The run asserts that no change leaves the board over its budget, and that
+strokes are only evicted once compaction is at its coarsest tolerance.
+
+The accuracy rows replay a shorter session under tracemalloc and compare
+the gauge with the bytes actually allocated, with and without wire dicts.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_whiteboard_memory.py
+"""
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ink_simplify import _stroke  # noqa: E402
+from whiteboard import (  # noqa: E402
+    EMPTY_DOCUMENT,
+    WHITEBOARD_DELTA_SNAPSHOT_INTERVAL,
+    InkSimplifier,
+    WhiteboardIdIndex,
+    parse_delta,
+)
+from whiteboard_memory import MAX_COMPACT_TOLERANCE, WhiteboardMemoryBudget  # noqa: E402
+
+SESSION_STROKES = 3000
+ACCURACY_STROKES = 300
+BUDGETS_MB = (0, 16, 4, 1)
+
+
+def _session(deltas: list[dict], budget: WhiteboardMemoryBudget, simplifier: InkSimplifier):
+    index = WhiteboardIdIndex()
+    document = EMPTY_DOCUMENT
+    enforce_ms: list[float] = []
+    job_ms = 0.0
+    settled = 0
+    for seq, payload in enumerate(deltas, start=1):
+        change = parse_delta(payload, simplifier)
+        document = document.apply(change)
+        index.apply_change(change)
+        if seq % WHITEBOARD_DELTA_SNAPSHOT_INTERVAL == 0:
+            document.to_wire(seq, cache=budget.allows_wire_cache(document))
+        started = time.perf_counter()
+        document = budget.enforce(document, index)
+        enforce_ms.append((time.perf_counter() - started) * 1000.0)
+        while budget.recompaction_due:
+            started = time.perf_counter()
+            swaps = budget.recompaction_job(document)()
+            job_ms += (time.perf_counter() - started) * 1000.0
+            document = budget.apply_recompacted(document, swaps, index)
+        settled = max(settled, budget.measure(document))
+        assert len(index.stroke_ids) == len(document.strokes), "index out of step"
+    return document, sorted(enforce_ms), job_ms, settled
+
+
+def main() -> None:
+    rng = random.Random(7)
+    deltas = [
+        {"seq": seq, "add": {"strokes": [_stroke(rng, seq)]}}
+        for seq in range(1, SESSION_STROKES + 1)
+    ]
+    print(
+        f"{SESSION_STROKES} strokes, one delta each, "
+        f"snapshot every {WHITEBOARD_DELTA_SNAPSHOT_INTERVAL}"
+    )
+    for budget_mb in BUDGETS_MB:
+        simplifier = InkSimplifier()
+        budget = WhiteboardMemoryBudget(budget_mb * 1024 * 1024, simplifier=simplifier)
+        document, enforce_ms, job_ms, settled = _session(deltas, budget, simplifier)
+        print(
+            f"budget={'off' if not budget_mb else f'{budget_mb}MB':>5} "
+            f"gauge={budget.held_bytes / 1e6:5.1f}MB peak={budget.peak_bytes / 1e6:5.1f}MB "
+            f"settled={settled / 1e6:5.1f}MB strokes={len(document.strokes):>4} "
+            f"points={document.stats.point_count:>6} evicted={budget.evicted_strokes:>4} "
+            f"compactions={budget.compactions:>3} "
+            f"tolerance={budget.tolerance:g} enforce p50={enforce_ms[len(enforce_ms) // 2]:.3f}ms "
+            f"max={enforce_ms[-1]:.1f}ms recompaction total={job_ms:.0f}ms"
+        )
+        if not budget_mb:
+            continue
+        assert settled <= budget.limit_bytes, (
+            f"{settled} held after a change, over the {budget.limit_bytes} budget"
+        )
+        if budget.evicted_strokes:
+            assert budget.tolerance == MAX_COMPACT_TOLERANCE, "ink evicted before compacting"
+
+    simplifier = InkSimplifier()
+    budget = WhiteboardMemoryBudget(0, simplifier=simplifier)
+    tracemalloc.start()
+    document, _, _, _ = _session(deltas[:ACCURACY_STROKES], budget, simplifier)
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    document.release_wire_caches()
+    gc.collect()
+    ink_allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"accuracy: {ACCURACY_STROKES} strokes gauge={budget.held_bytes / 1e6:.2f}MB "
+        f"allocated={allocated / 1e6:.2f}MB; without wire dicts "
+        f"gauge={budget.measure(document) / 1e6:.2f}MB allocated={ink_allocated / 1e6:.2f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Board render time: full redraw per render vs the incremental raster cache.
+
+"before" draws every item onto a fresh canvas and loads the font for every
+text item, like the previous _render_project_png. "after" renders one newly
+added stroke through a warm WhiteboardRasterCache. PNG encoding is reported
+separately since both paths pay it.
+
+Run from the livekit-agent directory:
+    python benchmarks/bench_whiteboard_render.py
+"""
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import whiteboard_render  # noqa: E402
+from whiteboard import StrokeItem, StrokePoints, TextItem, WhiteboardDocument  # noqa: E402
+
+BOARD_SIZES = (100, 1000, 10000)
+POINTS_PER_STROKE = 20
+TEXT_ITEMS = 10
+ROUNDS = 5
+
+
+def _stroke(rng: random.Random, index: int) -> StrokeItem:
+    x, y = rng.random(), rng.random()
+    points = []
+    for _ in range(POINTS_PER_STROKE):
+        x = min(1.0, max(0.0, x + rng.uniform(-0.02, 0.02)))
+        y = min(1.0, max(0.0, y + rng.uniform(-0.02, 0.02)))
+        points.append((x, y))
+    return StrokeItem(
+        f"stroke_{index}", StrokePoints.from_pairs(points), stroke_width=4.0, normalized=True
+    )
+
+
+def _board(rng: random.Random, strokes: int) -> WhiteboardDocument:
+    texts = tuple(
+        TextItem(f"text_{index}", f"x + {index} = {index * 2}", rng.random(), rng.random())
+        for index in range(TEXT_ITEMS)
+    )
+    return WhiteboardDocument(tuple(_stroke(rng, index) for index in range(strokes)), texts)
+
+
+def _render_uncached(document: WhiteboardDocument):
+    load_font = whiteboard_render.load_font
+    whiteboard_render.load_font = load_font.__wrapped__
+    try:
+        return whiteboard_render.WhiteboardRasterCache().render(document)
+    finally:
+        whiteboard_render.load_font = load_font
+
+
+def main() -> None:
+    if not whiteboard_render.pillow_available():
+        raise SystemExit("Pillow is required for this benchmark")
+    rng = random.Random(3)
+    print(f"{'strokes':>8} {'before ms':>10} {'after ms':>9} {'png ms':>8}")
+    for size in BOARD_SIZES:
+        document = _board(rng, size)
+
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            _render_uncached(document)
+        before_ms = (time.perf_counter() - start) * 1000.0 / ROUNDS
+
+        cache = whiteboard_render.WhiteboardRasterCache()
+        cache.render(document)
+        after_ms = 0.0
+        png_ms = 0.0
+        for round_index in range(ROUNDS):
+            document = document.apply({"add_strokes": [_stroke(rng, size + round_index)]})
+            start = time.perf_counter()
+            image = cache.render(document)
+            after_ms += (time.perf_counter() - start) * 1000.0
+            start = time.perf_counter()
+            image.save(io.BytesIO(), format="PNG")
+            png_ms += (time.perf_counter() - start) * 1000.0
+        assert cache.full_redraws == 1
+
+        print(
+            f"{size:>8} {before_ms:>10.2f} {after_ms / ROUNDS:>9.2f} {png_ms / ROUNDS:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
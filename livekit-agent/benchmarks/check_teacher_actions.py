@@ -0,0 +1,190 @@
+"""Focused checks for teacher reschedules: pre-send validation and batch fallback.
+
+Each check builds the smallest schedule that triggers one rule and asserts
+the outcome: a new time in the past, an unknown shift id, an overlap with
+another class or another change, a student with two classes on the date
+(left for the client to pick), a filled-in shift id that another change
+already moves, and a client that rejects the batch action (the changes go
+out one by one). The fallback runs through DefaultAgent with a fake client.
+
+Run from the livekit-agent directory:
+    python benchmarks/check_teacher_actions.py
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import DefaultAgent  # noqa: E402
+from teacher_schedule import (  # noqa: E402
+    RESCHEDULE_ACTION,
+    RESCHEDULE_BATCH_ACTION,
+    RESCHEDULE_FUTURE_ACTION,
+    ClassReschedule,
+    ScheduleError,
+    ShiftSchedule,
+    TeacherScheduleCache,
+    batch_item_results,
+    check_reschedules,
+    is_unsupported_result,
+    parse_supported_actions,
+)
+
+NOW = datetime(2030, 1, 6, 12, 0, tzinfo=timezone.utc)
+SHIFTS = [
+    {"id": "a1", "studentName": "Amina", "startLocal": "2030-01-07T10:00:00", "endLocal": "2030-01-07T11:00:00"},
+    {"id": "a2", "studentName": "Amina", "startLocal": "2030-01-08T10:00:00", "endLocal": "2030-01-08T11:00:00"},
+    {"id": "a3", "studentName": "Amina", "startLocal": "2030-01-08T14:00:00", "endLocal": "2030-01-08T15:00:00"},
+    {"id": "y1", "studentName": "Yusuf", "startLocal": "2030-01-08T12:00:00", "endLocal": "2030-01-08T13:00:00"},
+]
+SCHEDULE = ShiftSchedule.from_result({"success": True, "shifts": SHIFTS}, "UTC")
+
+
+def _change(start: str, end: str, scope: str = "single", **extra) -> tuple[str, dict]:
+    args = {"scope": scope, "newStartLocal": start, "newEndLocal": end, "timezone": "UTC", **extra}
+    action = RESCHEDULE_ACTION if scope == "single" else RESCHEDULE_FUTURE_ACTION
+    return action, args
+
+
+def _rejected(items: list[tuple[str, dict]], expected: str) -> None:
+    try:
+        check_reschedules(SCHEDULE, items, NOW)
+    except ScheduleError as exc:
+        assert expected in str(exc), f"{expected!r} not in {exc}"
+        print(f"  rejected: {exc}")
+        return
+    raise AssertionError(f"accepted, expected {expected!r}")
+
+
+def check_schedule_rules() -> None:
+    print("past time")
+    _rejected([_change("2030-01-06T09:00:00", "2030-01-06T10:00:00", shiftId="a1")], "in the past")
+
+    print("unknown id")
+    _rejected([_change("2030-01-09T10:00:00", "2030-01-09T11:00:00", shiftId="zz")], "cannot find class zz")
+
+    print("overlap")
+    _rejected([_change("2030-01-08T12:30:00", "2030-01-08T13:30:00", shiftId="a1")], "overlaps Yusuf")
+    _rejected(
+        [
+            _change("2030-01-09T10:00:00", "2030-01-09T11:00:00", shiftId="a1"),
+            _change("2030-01-09T10:30:00", "2030-01-09T11:30:00", shiftId="a2"),
+        ],
+        "Changes 1 and 2 would put two classes at the same time",
+    )
+    # Moving a class within its own old slot is not a clash.
+    check_reschedules(SCHEDULE, [_change("2030-01-07T10:30:00", "2030-01-07T11:30:00", shiftId="a1")], NOW)
+
+    print("same-student ambiguity")
+    _, args = item = _change(
+        "2030-01-08T14:30:00", "2030-01-08T15:30:00", studentName="Amina", applyFromDate="2030-01-08"
+    )
+    # Two of Amina's classes fall on that date: the client picks, and neither counts as a clash.
+    check_reschedules(SCHEDULE, [item], NOW)
+    assert "shiftId" not in args, args
+    _rejected(
+        [_change("2030-01-08T12:30:00", "2030-01-08T13:30:00", studentName="Amina", applyFromDate="2030-01-08")],
+        "overlaps Yusuf",
+    )
+    _, args = item = _change(
+        "2030-01-09T10:00:00", "2030-01-09T11:00:00", studentName="Amina", applyFromDate="2030-01-07"
+    )
+    check_reschedules(SCHEDULE, [item], NOW)
+    assert args["shiftId"] == "a1", args
+    print("  one class on the date: filled in a1")
+
+    print("duplicate fill")
+    for items in (
+        [
+            _change("2030-01-09T10:00:00", "2030-01-09T11:00:00", studentName="Amina", applyFromDate="2030-01-07"),
+            _change("2030-01-10T10:00:00", "2030-01-10T11:00:00", shiftId="a1"),
+        ],
+        [
+            _change("2030-01-10T10:00:00", "2030-01-10T11:00:00", shiftId="a1"),
+            _change("2030-01-09T10:00:00", "2030-01-09T11:00:00", studentName="Amina", applyFromDate="2030-01-07"),
+        ],
+    ):
+        _rejected(items, "Changes 1 and 2 both move the same class")
+
+
+async def _fallback(supported: str, batch_answer: dict) -> tuple[list[str], str, bool]:
+    metadata = {
+        "user_role": "teacher",
+        "teacher_actions_enabled": True,
+        "user_timezone": "UTC",
+        "teacher_actions_supported": supported,
+    }
+    agent = DefaultAgent(json.dumps(metadata))
+    sent: list[str] = []
+
+    async def request_action(action: str, args: dict) -> dict:
+        sent.append(action)
+        if action == RESCHEDULE_BATCH_ACTION:
+            return batch_answer
+        if args.get("shiftId") == "y1":
+            return {"success": False, "message": "Conflict with another class"}
+        return {"success": True, "message": "Moved"}
+
+    async def fetch() -> dict:
+        return {"success": True, "shifts": SHIFTS}
+
+    agent.configure_teacher_action_bridge(
+        request_action_cb=request_action, schedule=TeacherScheduleCache(fetch, "UTC")
+    )
+    changes = [
+        ClassReschedule(
+            new_start_local_iso="2030-01-09T10:00:00",
+            new_end_local_iso="2030-01-09T11:00:00",
+            scope="today",
+            shift_id="a1",
+        ),
+        ClassReschedule(
+            new_start_local_iso="2030-01-09T16:00:00",
+            new_end_local_iso="2030-01-09T17:00:00",
+            scope="all_future",
+            shift_id="y1",
+        ),
+    ]
+    summary = await agent.teacher_reschedule_classes(changes, True)
+    return sent, summary, agent.supports_teacher_action(RESCHEDULE_BATCH_ACTION)
+
+
+def check_batch_fallback() -> None:
+    print("unsupported-batch fallback")
+    rejected = {"success": False, "message": f"Unsupported teacher action: {RESCHEDULE_BATCH_ACTION}"}
+    assert is_unsupported_result(rejected)
+    assert not is_unsupported_result({"success": False, "message": "Class not found"})
+    assert RESCHEDULE_BATCH_ACTION not in parse_supported_actions(None)
+    assert RESCHEDULE_BATCH_ACTION in parse_supported_actions([" Reschedule_Shift_Batch "])
+    assert batch_item_results({"success": True, "results": [{"index": 1, "success": False}]}, 2) == [
+        (True, ""),
+        (False, ""),
+    ]
+
+    sent, summary, still_supported = asyncio.run(_fallback("", rejected))
+    assert sent == [RESCHEDULE_ACTION, RESCHEDULE_FUTURE_ACTION], sent
+    print(f"  not advertised: sent {sent}")
+
+    sent, summary, still_supported = asyncio.run(_fallback(RESCHEDULE_BATCH_ACTION, rejected))
+    assert sent == [RESCHEDULE_BATCH_ACTION, RESCHEDULE_ACTION, RESCHEDULE_FUTURE_ACTION], sent
+    assert not still_supported, "a rejected batch must not be sent again"
+    assert summary.startswith("Changed 1 of 2 classes"), summary
+    print(f"  advertised, rejected: sent {sent}; {summary}")
+
+    answered = {"success": True, "results": [{"index": 0, "success": True}, {"index": 1, "success": True}]}
+    sent, summary, still_supported = asyncio.run(_fallback(RESCHEDULE_BATCH_ACTION, answered))
+    assert sent == [RESCHEDULE_BATCH_ACTION] and still_supported, sent
+    print(f"  advertised, handled: sent {sent}")
+
+
+def main() -> None:
+    check_schedule_rules()
+    check_batch_fallback()
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
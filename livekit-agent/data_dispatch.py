@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Callable
+
+from offload import get_cpu_executor
+from telemetry import LatencyRecorder
+
+logger = logging.getLogger("agent-Alluwal")
+
+# Packets above this are decoded on the shared CPU pool instead of the loop.
+DEFAULT_OFFLOAD_BYTES = 32 * 1024
+
+# Returned by a decoder to drop a packet it has already logged.
+INVALID = object()
+
+
+def decode_json(data: bytes) -> Any:
+    return json.loads(data.decode("utf-8"))
+
+
+def _decode(topic: str, decode: Callable[[bytes], Any], data: bytes) -> Any:
+    try:
+        return decode(data)
+    except Exception as e:
+        logger.warning(f"Data channel: failed to decode packet on {topic}: {e}")
+        return INVALID
+
+
+class TopicStats:
+    __slots__ = ("packets", "bytes", "max_bytes", "offloaded", "rejected", "coalesced")
+
+    def __init__(self) -> None:
+        self.packets = 0
+        self.bytes = 0
+        self.max_bytes = 0
+        self.offloaded = 0
+        self.rejected = 0
+        # Superseded by a newer packet from the same sender; never decoded.
+        self.coalesced = 0
+
+
+class _Route:
+    __slots__ = (
+        "handler",
+        "decode",
+        "max_bytes",
+        "supersedes",
+        "coalesce_window_s",
+        "stats",
+        "backlog",
+        "drain",
+        "latest",
+        "timers",
+    )
+
+    def __init__(
+        self,
+        handler: Callable[[Any, str], None],
+        decode: Callable[[bytes], Any],
+        max_bytes: int | None,
+        supersedes: Callable[[bytes], bool] | None,
+        coalesce_window_s: float,
+    ) -> None:
+        self.handler = handler
+        self.decode = decode
+        self.max_bytes = max_bytes
+        self.supersedes = supersedes
+        self.coalesce_window_s = coalesce_window_s
+        self.stats = TopicStats()
+        self.backlog: deque[tuple[bytes, str]] = deque()
+        self.drain: asyncio.Task | None = None
+        # Coalescing: newest superseding packet and its flush timer per sender.
+        self.latest: dict[str, bytes] = {}
+        self.timers: dict[str, asyncio.TimerHandle] = {}
+
+
+class DataPacketDispatcher:
+    """Routes data-channel packets by topic, decoding each packet once.
+
+    Unknown topics and oversized packets are dropped before decoding. A
+    route's decoder turns the bytes into the payload its handler receives
+    (raising, or returning INVALID, drops the packet). Packets above
+    `offload_bytes` are decoded on the shared CPU pool; later packets on the
+    same topic queue behind them, so each handler still sees its topic in
+    arrival order. Handlers always run on the event loop.
+
+    A route registered with `supersedes` coalesces per sender: a packet the
+    predicate accepts (a full state, not a change) is held for
+    `coalesce_window_s`, and a newer one from the same sender replaces it
+    undecoded. Any other packet from that sender flushes the held one first.
+    """
+
+    def __init__(
+        self,
+        *,
+        offload_bytes: int = DEFAULT_OFFLOAD_BYTES,
+        latency: LatencyRecorder | None = None,
+    ) -> None:
+        self._offload_bytes = max(0, int(offload_bytes))
+        self._latency = latency
+        self._routes: dict[str, _Route] = {}
+        self.unknown_packets = 0
+
+    def register(
+        self,
+        topic: str,
+        handler: Callable[[Any, str], None],
+        *,
+        decode: Callable[[bytes], Any] = decode_json,
+        max_bytes: int | None = None,
+        supersedes: Callable[[bytes], bool] | None = None,
+        coalesce_window_s: float = 0.0,
+    ) -> None:
+        if coalesce_window_s <= 0:
+            supersedes = None
+        self._routes[topic] = _Route(
+            handler, decode, max_bytes, supersedes, coalesce_window_s
+        )
+
+    def dispatch(self, topic: str, data: bytes, sender_identity: str) -> bool:
+        """Route one packet; False when it was dropped without decoding."""
+        route = self._routes.get(topic)
+        if route is None:
+            self.unknown_packets += 1
+            return False
+
+        size = len(data)
+        stats = route.stats
+        stats.packets += 1
+        stats.bytes += size
+        if size > stats.max_bytes:
+            stats.max_bytes = size
+        if route.max_bytes is not None and size > route.max_bytes:
+            stats.rejected += 1
+            logger.warning(
+                f"Data channel: dropped {size} byte packet on {topic} "
+                f"over the {route.max_bytes} byte limit"
+            )
+            return False
+
+        if route.supersedes is not None:
+            if route.supersedes(data):
+                if sender_identity in route.latest:
+                    stats.coalesced += 1
+                route.latest[sender_identity] = data
+                if sender_identity not in route.timers:
+                    route.timers[sender_identity] = asyncio.get_running_loop().call_later(
+                        route.coalesce_window_s, self._flush, topic, route, sender_identity
+                    )
+                return True
+            self._flush(topic, route, sender_identity)
+        self._submit(topic, route, data, sender_identity)
+        return True
+
+    def _flush(self, topic: str, route: _Route, sender_identity: str) -> None:
+        timer = route.timers.pop(sender_identity, None)
+        if timer is not None:
+            timer.cancel()
+        data = route.latest.pop(sender_identity, None)
+        if data is not None:
+            self._submit(topic, route, data, sender_identity)
+
+    def _submit(self, topic: str, route: _Route, data: bytes, sender_identity: str) -> None:
+        if route.backlog or len(data) > self._offload_bytes:
+            route.backlog.append((data, sender_identity))
+            if route.drain is None:
+                route.drain = asyncio.create_task(self._drain(topic, route))
+            return
+
+        started_at = time.perf_counter()
+        payload = _decode(topic, route.decode, data)
+        self._deliver(topic, route, payload, sender_identity, started_at)
+
+    def _deliver(
+        self,
+        topic: str,
+        route: _Route,
+        payload: Any,
+        sender_identity: str,
+        decode_started_at: float,
+    ) -> None:
+        if payload is INVALID:
+            route.stats.rejected += 1
+            return
+        self._observe(f"{topic} decode", decode_started_at)
+        started_at = time.perf_counter()
+        try:
+            route.handler(payload, sender_identity)
+        except Exception as e:
+            logger.error(f"Data channel: handler for {topic} failed: {e}", exc_info=True)
+        self._observe(topic, started_at)
+
+    async def _drain(self, topic: str, route: _Route) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while route.backlog:
+                data, sender_identity = route.backlog[0]
+                started_at = time.perf_counter()
+                if len(data) > self._offload_bytes:
+                    route.stats.offloaded += 1
+                    payload = await loop.run_in_executor(
+                        get_cpu_executor(), _decode, topic, route.decode, data
+                    )
+                else:
+                    payload = _decode(topic, route.decode, data)
+                route.backlog.popleft()
+                self._deliver(topic, route, payload, sender_identity, started_at)
+        finally:
+            route.drain = None
+
+    def _observe(self, key: str, started_at: float) -> None:
+        if self._latency is not None:
+            self._latency.observe(key, (time.perf_counter() - started_at) * 1000.0)
+
+    async def join(self) -> None:
+        """Wait until every queued or held packet has been handled."""
+        for topic, route in self._routes.items():
+            for sender_identity in list(route.latest):
+                self._flush(topic, route, sender_identity)
+        while True:
+            tasks = [route.drain for route in self._routes.values() if route.drain is not None]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def aclose(self) -> None:
+        """Drop queued packets and stop any decode in progress."""
+        for route in self._routes.values():
+            for timer in route.timers.values():
+                timer.cancel()
+            route.timers.clear()
+            route.latest.clear()
+            route.backlog.clear()
+            task = route.drain
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def format_stats(self) -> str:
+        parts = [
+            f"{topic}: n={stats.packets} bytes={stats.bytes} max={stats.max_bytes} "
+            f"offloaded={stats.offloaded} rejected={stats.rejected} "
+            f"coalesced={stats.coalesced}"
+            for topic, stats in sorted(
+                (topic, route.stats) for topic, route in self._routes.items()
+                if route.stats.packets
+            )
+        ]
+        parts.append(f"unknown topics: n={self.unknown_packets}")
+        return "; ".join(parts)
@@ -0,0 +1,141 @@
+import asyncio
+import contextlib
+import logging
+from typing import AsyncIterator, Awaitable, Callable
+
+logger = logging.getLogger("agent-Alluwal")
+
+# Chained tool calls are one LLM round trip apart; an unlock held this long
+# lets the next call reuse the lock instead of flapping it.
+DEFAULT_UNLOCK_DELAY_S = 1.5
+
+
+class StudentDrawingLock:
+    """Reference-counted lock on student drawing, shared by agent board edits.
+
+    Each edit holds the lock while it publishes. The first holder sends the
+    lock message; when the last one lets go the unlock is sent after
+    `unlock_delay_s`, and a holder arriving before then cancels it. Nested,
+    concurrent and back-to-back tool calls therefore cost one lock and one
+    unlock instead of a pair each.
+
+    `set_explicit` backs the tool that locks or unlocks drawing on request:
+    an explicit lock counts as one more holder and an explicit unlock
+    releases it without waiting.
+    """
+
+    def __init__(
+        self,
+        publish_enabled: Callable[[bool], Awaitable[None]],
+        *,
+        unlock_delay_s: float = DEFAULT_UNLOCK_DELAY_S,
+    ) -> None:
+        self._publish_enabled = publish_enabled
+        self._unlock_delay_s = max(0.0, unlock_delay_s)
+        self._holders = 0
+        self._explicit = False
+        # Whether the client was last told drawing is disabled.
+        self._locked = False
+        # Serializes lock/unlock messages so they reach the client in order.
+        self._publishing = asyncio.Lock()
+        self._unlock_timer: asyncio.TimerHandle | None = None
+        self._unlock_task: asyncio.Task | None = None
+        self.locks_sent = 0
+        self.unlocks_sent = 0
+        self.reused = 0
+
+    @property
+    def locked(self) -> bool:
+        return self._locked
+
+    @contextlib.asynccontextmanager
+    async def hold(self, enabled: bool = True) -> AsyncIterator[None]:
+        """Keep student drawing locked for the block; a no-op when not `enabled`."""
+        if not enabled:
+            yield
+            return
+        await self._acquire()
+        try:
+            yield
+        finally:
+            await self._release()
+
+    async def set_explicit(self, locked: bool) -> None:
+        if locked:
+            if not self._explicit:
+                await self._acquire()
+                self._explicit = True
+            return
+        if self._explicit:
+            self._explicit = False
+            await self._release(immediate=True)
+        elif not self._holders:
+            # Nothing of ours holds it; make sure the client is unlocked now.
+            self._cancel_unlock_timer()
+            await self._send(False, force=True)
+
+    async def _acquire(self) -> None:
+        self._cancel_unlock_timer()
+        if self._locked:
+            self.reused += 1
+        # Counted first, so an unlock already queued behind _publishing stands down.
+        self._holders += 1
+        try:
+            await self._send(True)
+        except BaseException:
+            self._holders -= 1
+            raise
+
+    async def _release(self, immediate: bool = False) -> None:
+        self._holders = max(0, self._holders - 1)
+        if self._holders:
+            return
+        if immediate or not self._unlock_delay_s:
+            await self._send(False)
+            return
+        self._cancel_unlock_timer()
+        self._unlock_timer = asyncio.get_running_loop().call_later(
+            self._unlock_delay_s, self._start_unlock
+        )
+
+    def _cancel_unlock_timer(self) -> None:
+        if self._unlock_timer is not None:
+            self._unlock_timer.cancel()
+            self._unlock_timer = None
+
+    def _start_unlock(self) -> None:
+        self._unlock_timer = None
+        self._unlock_task = asyncio.create_task(self._unlock_if_idle())
+
+    async def _unlock_if_idle(self) -> None:
+        try:
+            await self._send(False)
+        except Exception as e:
+            logger.warning(f"Whiteboard: failed to re-enable student drawing: {e}")
+
+    async def _send(self, locked: bool, force: bool = False) -> None:
+        async with self._publishing:
+            # A holder may have arrived while a debounced unlock waited here.
+            if not locked and self._holders:
+                return
+            if locked == self._locked and not force:
+                return
+            await self._publish_enabled(not locked)
+            self._locked = locked
+            if locked:
+                self.locks_sent += 1
+            else:
+                self.unlocks_sent += 1
+
+    async def aclose(self) -> None:
+        """Send any pending unlock now rather than leaving the student locked out."""
+        self._cancel_unlock_timer()
+        if self._unlock_task is not None and not self._unlock_task.done():
+            await asyncio.gather(self._unlock_task, return_exceptions=True)
+        self._holders = 0
+        self._explicit = False
+        if self._locked:
+            try:
+                await self._send(False)
+            except Exception as e:
+                logger.warning(f"Whiteboard: failed to re-enable student drawing: {e}")
@@ -0,0 +1,68 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from typing import Any, Callable
+
+from telemetry import LatencyRecorder
+
+DEFAULT_CPU_WORKERS = 2
+
+_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_executor_workers = DEFAULT_CPU_WORKERS
+
+
+def configure_cpu_executor(max_workers: int) -> None:
+    """Set the shared pool size; only effective before the pool is first used."""
+    global _executor_workers
+    _executor_workers = max(1, int(max_workers))
+
+
+def get_cpu_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Process-wide bounded pool for CPU-heavy work (render, encode, decode)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_executor_workers,
+                thread_name_prefix="whiteboard-cpu",
+            )
+        return _executor
+
+
+class SessionOffloader:
+    """Runs one session's CPU-heavy work on the shared pool, at most `limit` at a time.
+
+    Cancelling the awaiting task drops work that has not started yet. Work that
+    is already running finishes in its thread, but keeps holding its slot until
+    then so the session's jobs never overlap (the raster cache relies on this).
+    """
+
+    def __init__(self, limit: int = 1, latency: LatencyRecorder | None = None) -> None:
+        self._slots = asyncio.Semaphore(max(1, int(limit)))
+        self._latency = latency
+        self.cancelled = 0
+
+    async def run(self, stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+        try:
+            future = get_cpu_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def _release(_: concurrent.futures.Future) -> None:
+            loop.call_soon_threadsafe(self._slots.release)
+
+        future.add_done_callback(_release)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self._latency is not None:
+            self._latency.observe(stage, (time.perf_counter() - started_at) * 1000.0)
+        return result
@@ -0,0 +1,95 @@
+import functools
+import json
+from typing import Any
+
+import msgspec
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional runtime dependency fallback
+    orjson = None
+
+# Fastest first. msgspec decodes straight into a schema in one native pass;
+# orjson and stdlib decode to builtins, then msgspec.convert checks the schema.
+CODEC_BACKENDS = ("msgspec", "orjson", "json")
+
+
+class PacketDecodeError(ValueError):
+    pass
+
+
+def available_backends() -> tuple[str, ...]:
+    return tuple(name for name in CODEC_BACKENDS if name != "orjson" or orjson is not None)
+
+
+_backend = available_backends()[0]
+
+
+def select_backend(name: str | None) -> str:
+    """Use the named backend when installed, else the fastest one; returns it."""
+    global _backend
+    installed = available_backends()
+    _backend = name if name in installed else installed[0]
+    return _backend
+
+
+def current_backend() -> str:
+    return _backend
+
+
+class Schema(msgspec.Struct):
+    """Typed packet schema. Fields are class annotations, required ones first.
+
+    Unknown keys are ignored. A float field accepts ints; an int field
+    accepts neither floats nor bools.
+    """
+
+
+def loads(data: bytes | bytearray | memoryview) -> Any:
+    """Decode JSON to builtins with the selected backend."""
+    try:
+        if _backend == "msgspec":
+            return msgspec.json.decode(data)
+        if _backend == "orjson":
+            return orjson.loads(data)
+        return json.loads(bytes(data).decode("utf-8"))
+    except ValueError as e:
+        raise PacketDecodeError(str(e)) from e
+
+
+@functools.cache
+def _msgspec_decoder(schema: type):
+    return msgspec.json.Decoder(schema)
+
+
+def convert(value: Any, schema: type) -> Any:
+    """Validate already-decoded builtins against a schema."""
+    try:
+        return msgspec.convert(value, schema)
+    except msgspec.ValidationError as e:
+        raise PacketDecodeError(str(e)) from e
+
+
+def decode(data: bytes | bytearray | memoryview, schema: type) -> Any:
+    """Decode and validate a packet against a schema; raises PacketDecodeError."""
+    if _backend == "msgspec":
+        try:
+            return _msgspec_decoder(schema).decode(data)
+        except msgspec.DecodeError as e:
+            raise PacketDecodeError(str(e)) from e
+    return convert(loads(data), schema)
+
+
+def decoder(schema: type):
+    """A bytes -> schema decoder, e.g. for a DataPacketDispatcher route."""
+    return functools.partial(decode, schema=schema)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON bytes for builtins or schema instances."""
+    if _backend == "msgspec":
+        return msgspec.json.encode(value)
+    value = msgspec.to_builtins(value)
+    if _backend == "orjson":
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,82 @@
+from typing import Any
+
+from packet_codec import Schema
+
+# Wire schemas for data-channel packets. Field names follow the wire keys;
+# items inside a whiteboard project stay raw dicts, because StrokeItem and
+# TextItem drop malformed items one at a time instead of the whole board.
+
+
+# Chat and image requests keep untyped fields: a null or mistyped field is
+# normalized where it is read (see packet_text) instead of dropping the message.
+class ChatTextMessage(Schema):
+    type: Any = None
+    content: Any = None
+    response_mode: Any = None
+    message_id: Any = None
+    id: Any = None
+    request_id: Any = None
+
+
+class ActionRequest(Schema):
+    requestId: str
+    action: str
+    args: dict[str, Any] = {}
+    # Shared by every attempt at one logical request, so the client can run it once.
+    idempotencyKey: str | None = None
+
+
+class ActionRequestPacket(Schema):
+    type: str
+    payload: ActionRequest
+
+
+class ActionResultPacket(Schema):
+    type: str
+    # Free-form result handed back to the caller (requestId, success, message, ...).
+    payload: dict[str, Any]
+
+
+# Teacher actions are the first client actions carried over rpc.DataChannelRpc.
+TeacherActionRequest = ActionRequest
+TeacherActionPacket = ActionRequestPacket
+TeacherActionResultPacket = ActionResultPacket
+
+
+class TranscriptionPacket(Schema):
+    type: str
+    content: str
+    sender: str
+    timestamp: float
+
+
+class WhiteboardPacket(Schema):
+    type: str
+    payload: dict[str, Any] | None = None
+
+
+class WhiteboardProject(Schema):
+    strokes: list[dict[str, Any]]
+    texts: list[dict[str, Any]] | None = None
+    capabilities: list[str] | None = None
+    seq: int | None = None
+    version: int | None = None
+    # Optional client fingerprint of the board; see whiteboard.wire_board_fingerprint.
+    strokeCount: int | None = None
+    textCount: int | None = None
+    contentHash: str | int | None = None
+
+
+class WhiteboardProjectPacket(Schema):
+    type: str
+    payload: WhiteboardProject
+
+
+class WhiteboardImagePacket(Schema):
+    image_base64: Any = None
+    mime_type: Any = None
+
+
+def packet_text(value: Any) -> str:
+    """A loosely typed packet field as stripped text; null becomes ""."""
+    return value.strip() if isinstance(value, str) else str(value or "").strip()
@@ -0,0 +1,332 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable
+
+import packet_codec
+from packets import ActionRequest, ActionRequestPacket
+from telemetry import LatencyRecorder
+
+logger = logging.getLogger("agent-Alluwal")
+
+# Before an action has latency samples, and the longest any call waits.
+DEFAULT_RPC_TIMEOUT_S = 25.0
+# Adaptive timeouts never drop below this: a slow client answer is still
+# better than a spurious failure on an action the teacher already confirmed.
+MIN_RPC_TIMEOUT_S = 10.0
+DEFAULT_MAX_IN_FLIGHT = 4
+# A successful result is replayed to retries with the same idempotency key
+# for at most this long, and late results are still matched to their request.
+DEFAULT_REPLAY_WINDOW_S = 300.0
+# Bound on remembered results and request ids, whatever the window.
+REPLAY_CACHE_SIZE = 256
+
+_RTT_ALPHA = 0.125
+_RTT_BETA = 0.25
+_MAX_BACKOFF = 8.0
+
+
+class RpcError(Exception):
+    pass
+
+
+class RpcTimeoutError(RpcError):
+    pass
+
+
+def idempotency_key(action: str, args: dict) -> str:
+    """Stable key for an action and its arguments, independent of key order."""
+    canonical = json.dumps([action, args], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:24]
+
+
+class _ActionTimer:
+    """Retransmission-style timeout for one action (RFC 6298 smoothing).
+
+    timeout = smoothed latency + 4 x latency variance, clamped to
+    [min, max]; doubled after a timeout until the next answer arrives.
+    """
+
+    __slots__ = ("srtt", "rttvar", "backoff")
+
+    def __init__(self) -> None:
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.backoff = 1.0
+
+    def observe(self, elapsed_s: float) -> None:
+        if self.srtt is None:
+            self.srtt = elapsed_s
+            self.rttvar = elapsed_s / 2.0
+        else:
+            self.rttvar = (1 - _RTT_BETA) * self.rttvar + _RTT_BETA * abs(self.srtt - elapsed_s)
+            self.srtt = (1 - _RTT_ALPHA) * self.srtt + _RTT_ALPHA * elapsed_s
+        self.backoff = 1.0
+
+    def timed_out(self) -> None:
+        self.backoff = min(_MAX_BACKOFF, 2.0 * self.backoff)
+
+    def timeout(self, min_s: float, max_s: float) -> float:
+        if self.srtt is None:
+            return max_s
+        return max(min_s, min(max_s, (self.srtt + 4.0 * self.rttvar) * self.backoff))
+
+
+class _PendingRequest:
+    __slots__ = ("key", "action", "replay", "started_at", "future")
+
+    def __init__(self, key: str, action: str, replay: bool, future: asyncio.Future) -> None:
+        self.key = key
+        self.action = action
+        self.replay = replay
+        self.started_at = time.monotonic()
+        self.future = future
+
+
+class DataChannelRpc:
+    """Request/response calls to a client over data-channel packets.
+
+    A call publishes {"type": msg_type, "payload": {requestId, action, args,
+    idempotencyKey}} and waits for a result payload carrying the same
+    requestId, fed in through `handle_result`.
+
+    - Timeouts adapt per action to the latency the client has shown.
+    - Every attempt at one logical request shares an idempotency key
+      (derived from the action and arguments unless given), so a client
+      can run it once. A call whose key is already in flight joins that
+      request instead of publishing again, and the last successful result
+      is replayed to retries without another round trip, until another
+      call succeeds or `replay_window_s` passes (so undoing a change and
+      redoing it still reaches the client). A late answer to a timed-out
+      request is kept for those retries. Reads pass `replay=False`.
+    - Each result is accepted at most once, and only for a request id this
+      instance issued within the window; replayed or unknown packets are
+      counted and dropped.
+    - At most `max_in_flight` requests are outstanding; further calls wait
+      for a slot within their timeout.
+    - `on_result(action, payload)` sees every accepted result, late ones
+      included, before the caller does.
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[bytes], Awaitable[None]],
+        *,
+        msg_type: str,
+        request_prefix: str,
+        log_name: str = "RPC",
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        min_timeout_s: float = MIN_RPC_TIMEOUT_S,
+        max_timeout_s: float = DEFAULT_RPC_TIMEOUT_S,
+        replay_window_s: float = DEFAULT_REPLAY_WINDOW_S,
+        latency: LatencyRecorder | None = None,
+        on_result: Callable[[str, dict], None] | None = None,
+    ) -> None:
+        self._publish = publish
+        self._on_result = on_result
+        self._msg_type = msg_type
+        self._request_prefix = request_prefix
+        self._log_name = log_name
+        self._slots = asyncio.Semaphore(max(1, int(max_in_flight)))
+        self._max_timeout_s = max(0.001, float(max_timeout_s))
+        self._min_timeout_s = min(max(0.0, float(min_timeout_s)), self._max_timeout_s)
+        self._replay_window_s = max(0.0, float(replay_window_s))
+        self.latency = latency if latency is not None else LatencyRecorder()
+        self._timers: dict[str, _ActionTimer] = {}
+        # Issued request ids, oldest first; kept past a timeout for late answers.
+        self._requests: dict[str, _PendingRequest] = {}
+        # Idempotency key -> the future of the attempt currently in flight.
+        self._in_flight: dict[str, asyncio.Future] = {}
+        # Idempotency key -> (completed at, successful result), oldest first.
+        self._completed: dict[str, tuple[float, dict]] = {}
+        self._outcomes: dict[str, dict[str, int]] = {}
+        self._closed = False
+        self.unmatched_results = 0
+
+    def timeout_for(self, action: str) -> float:
+        timer = self._timers.get(action)
+        if timer is None:
+            return self._max_timeout_s
+        return timer.timeout(self._min_timeout_s, self._max_timeout_s)
+
+    def _count(self, action: str, outcome: str) -> None:
+        counts = self._outcomes.setdefault(action, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def _prune(self, now: float) -> None:
+        horizon = now - self._replay_window_s
+        while self._completed:
+            key, (completed_at, _) = next(iter(self._completed.items()))
+            if completed_at >= horizon and len(self._completed) <= REPLAY_CACHE_SIZE:
+                break
+            del self._completed[key]
+        while self._requests:
+            request_id, request = next(iter(self._requests.items()))
+            if request.started_at >= horizon and len(self._requests) <= REPLAY_CACHE_SIZE:
+                break
+            del self._requests[request_id]
+
+    async def call(
+        self,
+        action: str,
+        args: dict | None = None,
+        *,
+        key: str | None = None,
+        replay: bool = True,
+    ) -> dict:
+        """Run `action` on the client and return its result payload.
+
+        Raises RpcTimeoutError when no answer arrives in time and RpcError
+        once the channel is closed.
+        """
+        if self._closed:
+            raise RpcError(f"{self._log_name} channel is closed")
+        args = args if isinstance(args, dict) else {}
+        key = key or idempotency_key(action, args)
+        now = time.monotonic()
+        self._prune(now)
+
+        replayed = self._replay(action, key) if replay else None
+        if replayed is not None:
+            return replayed
+
+        timeout_s = self.timeout_for(action)
+        deadline = now + timeout_s
+        joined = self._in_flight.get(key)
+        if joined is not None:
+            self._count(action, "joined")
+            return await self._wait(action, joined, deadline, timeout_s)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=timeout_s)
+        except asyncio.TimeoutError:
+            self._count(action, "busy")
+            raise RpcTimeoutError(
+                f"{self._log_name}: no free request slot for action={action}"
+            ) from None
+        try:
+            # The same request may have started, or finished, while this one queued.
+            replayed = self._replay(action, key) if replay else None
+            if replayed is not None:
+                return replayed
+            joined = self._in_flight.get(key)
+            if joined is not None:
+                self._count(action, "joined")
+                return await self._wait(action, joined, deadline, timeout_s)
+            request_id = f"{self._request_prefix}_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+            future: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._requests[request_id] = _PendingRequest(key, action, replay, future)
+            self._in_flight[key] = future
+            try:
+                await self._publish(
+                    packet_codec.dumps(
+                        ActionRequestPacket(
+                            type=self._msg_type,
+                            payload=ActionRequest(
+                                requestId=request_id,
+                                action=action,
+                                args=args,
+                                idempotencyKey=key,
+                            ),
+                        )
+                    )
+                )
+                logger.info(
+                    f"{self._log_name}: published action={action} request_id={request_id} "
+                    f"timeout={timeout_s:.1f}s"
+                )
+                try:
+                    return await self._wait(action, future, deadline, timeout_s)
+                except RpcTimeoutError:
+                    self._timers.setdefault(action, _ActionTimer()).timed_out()
+                    logger.warning(f"{self._log_name}: timeout waiting for request_id={request_id}")
+                    raise
+            finally:
+                # A retry after a timeout publishes again under the same key;
+                # a late answer to this attempt is still matched by request id.
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+                if not future.done():
+                    future.add_done_callback(_consume_exception)
+        finally:
+            self._slots.release()
+
+    def _replay(self, action: str, key: str) -> dict | None:
+        completed = self._completed.get(key)
+        if completed is None:
+            return None
+        self._count(action, "replayed")
+        logger.info(f"{self._log_name}: replayed result for action={action} key={key}")
+        return dict(completed[1])
+
+    async def _wait(
+        self,
+        action: str,
+        future: asyncio.Future,
+        deadline: float,
+        timeout_s: float,
+    ) -> dict:
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(future), timeout=max(0.0, deadline - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            self._count(action, "timeout")
+            raise RpcTimeoutError(
+                f"{self._log_name}: no result for action={action} within {timeout_s:.1f}s"
+            ) from None
+        return dict(result)
+
+    def handle_result(self, payload: dict) -> bool:
+        """Match a result payload to its request; returns False when it is dropped."""
+        request_id = str(payload.get("requestId") or payload.get("request_id") or "").strip()
+        request = self._requests.get(request_id) if request_id else None
+        if request is None or request.future.done():
+            # Unknown, expired, or an answer that was already accepted.
+            self.unmatched_results += 1
+            logger.debug(f"{self._log_name}: dropped result for request_id={request_id or '?'}")
+            return False
+
+        elapsed_s = time.monotonic() - request.started_at
+        self._timers.setdefault(request.action, _ActionTimer()).observe(elapsed_s)
+        self.latency.observe(request.action, elapsed_s * 1000.0)
+        success = payload.get("success") is True
+        self._count(request.action, "ok" if success else "failed")
+        if success and request.replay:
+            # Only the latest success is replayed. Failures never are: the
+            # client did not apply them, so a retry should reach it again.
+            self._completed.clear()
+            self._completed[request.key] = (time.monotonic(), dict(payload))
+        if self._on_result is not None:
+            self._on_result(request.action, payload)
+        request.future.set_result(payload)
+        return True
+
+    def close(self) -> None:
+        """Fail calls still waiting; later calls raise RpcError."""
+        self._closed = True
+        for future in self._in_flight.values():
+            if not future.done():
+                future.set_exception(RpcError(f"{self._log_name} channel is closed"))
+                future.add_done_callback(_consume_exception)
+        self._in_flight.clear()
+
+    def format_stats(self) -> str:
+        if not self._outcomes:
+            return "no calls"
+        parts = []
+        for action, counts in sorted(self._outcomes.items()):
+            outcomes = " ".join(f"{name}={count}" for name, count in sorted(counts.items()))
+            parts.append(f"{action}: {outcomes} timeout_now={self.timeout_for(action):.1f}s")
+        return (
+            f"{'; '.join(parts)}; latency {self.latency.format()}; "
+            f"dropped results={self.unmatched_results}"
+        )
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
@@ -0,0 +1,622 @@
+import asyncio
+import logging
+import re
+import time
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Any, Awaitable, Callable
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pydantic import BaseModel, model_validator
+
+logger = logging.getLogger("agent-Alluwal")
+
+# One batch reschedule carries at most this many class changes.
+TEACHER_MAX_BATCH_CHANGES = 20
+
+RESCHEDULE_ACTION = "reschedule_shift"
+RESCHEDULE_FUTURE_ACTION = "reschedule_shift_future"
+RESCHEDULE_BATCH_ACTION = "reschedule_shift_batch"
+# Read-only: answers the teacher's shifts and changes nothing on the client.
+LIST_SHIFTS_ACTION = "list_shifts"
+# Every tutor client handles these; newer actions are sent only when the
+# client lists them in its teacher_actions_supported metadata.
+BASE_TEACHER_ACTIONS = frozenset({"clock_in", RESCHEDULE_ACTION, RESCHEDULE_FUTURE_ACTION})
+_UNSUPPORTED_ACTION_PREFIX = "unsupported teacher action"
+
+# Classes listed when the teacher asks about their schedule without a date.
+UPCOMING_CLASSES_LIMIT = 10
+# A teacher can clock into a shift this long before it starts.
+CLOCK_IN_EARLY = timedelta(minutes=15)
+# After a failed schedule fetch, wait this long before the next attempt,
+# doubling per failure up to SCHEDULE_RETRY_MAX_S.
+SCHEDULE_RETRY_S = 60.0
+SCHEDULE_RETRY_MAX_S = 600.0
+# How long a tool waits on a fetch already in flight before going unchecked.
+SCHEDULE_WAIT_S = 3.0
+
+_ISO_LOCAL_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2})?$")
+_SINGLE_SCOPES = {"today", "today_only", "one_time", "single"}
+_FUTURE_SCOPES = {"future", "all_future", "series", "recurring"}
+
+
+class ScheduleError(ValueError):
+    """A teacher action that cannot be sent; the message is for the teacher."""
+
+
+class ClassReschedule(BaseModel):
+    """One class change; times are local ISO datetimes like 2024-03-15T16:00:00."""
+
+    new_start_local_iso: str
+    new_end_local_iso: str
+    scope: str
+    shift_id: str = ""
+    student_name: str = ""
+    student_id: str = ""
+    apply_from_local_iso: str = ""
+    timezone: str = ""
+    reason: str = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def _null_means_default(cls, data: Any) -> Any:
+        # Strict tool schemas make every defaulted field nullable.
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if value is not None}
+        return data
+
+
+def normalize_scope(scope: str) -> str:
+    normalized = scope.strip().lower()
+    if normalized in _SINGLE_SCOPES:
+        return "single"
+    if normalized in _FUTURE_SCOPES:
+        return "future"
+    raise ScheduleError(
+        "Before I reschedule, tell me if this is for today only or all future classes."
+    )
+
+
+def _parse_local(value: str, label: str, example: str) -> datetime:
+    if _ISO_LOCAL_PATTERN.match(value):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    raise ScheduleError(
+        f"Invalid {label} time format '{value}'. "
+        f"Please provide a full ISO datetime like {example} (include the date)."
+    )
+
+
+def _zone(name: str) -> tzinfo | None:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def resolve_timezone(timezone: str, default: str) -> str:
+    resolved = timezone.strip() or default.strip() or "UTC"
+    if _zone(resolved) is None:
+        raise ScheduleError(
+            f"Unknown timezone '{resolved}'. Please use a region name like America/New_York."
+        )
+    return resolved
+
+
+def build_reschedule_args(change: ClassReschedule, default_timezone: str) -> tuple[str, dict]:
+    """Validate one class change and return its action name and client arguments.
+
+    Raises ScheduleError before anything is sent when the scope, either
+    time or the timezone is invalid, or the class would end before it starts.
+    """
+    scope = normalize_scope(change.scope)
+    start = change.new_start_local_iso.strip()
+    end = change.new_end_local_iso.strip()
+    starts_at = _parse_local(start, "start", "2024-03-15T16:00:00")
+    ends_at = _parse_local(end, "end", "2024-03-15T17:00:00")
+    if ends_at <= starts_at:
+        raise ScheduleError(f"The class would end ({end}) before it starts ({start}).")
+    apply_from = change.apply_from_local_iso.strip()
+    if apply_from:
+        try:
+            datetime.fromisoformat(apply_from)
+        except ValueError:
+            raise ScheduleError(
+                f"Invalid apply-from date '{apply_from}'. Please use a date like 2024-03-15."
+            ) from None
+
+    args: dict[str, object] = {
+        "scope": scope,
+        "confirmed": True,
+        "newStartLocal": start,
+        "newEndLocal": end,
+        "timezone": resolve_timezone(change.timezone, default_timezone),
+    }
+    if change.shift_id.strip():
+        args["shiftId"] = change.shift_id.strip()
+    if change.student_name.strip():
+        args["studentName"] = change.student_name.strip()
+    if change.student_id.strip():
+        args["studentId"] = change.student_id.strip()
+    if apply_from:
+        args["applyFromDate"] = apply_from
+    if change.reason.strip():
+        args["reason"] = change.reason.strip()
+    action = RESCHEDULE_FUTURE_ACTION if scope == "future" else RESCHEDULE_ACTION
+    return action, args
+
+
+def build_batch_args(changes: list[ClassReschedule], default_timezone: str) -> dict:
+    """Validate every change and return the batch action's client arguments.
+
+    The first invalid item fails the whole batch, naming its position, so a
+    teacher never gets half of a confirmed plan applied. Each item carries
+    the single-change action it stands for.
+    """
+    if not changes:
+        raise ScheduleError("Tell me which classes to change.")
+    if len(changes) > TEACHER_MAX_BATCH_CHANGES:
+        raise ScheduleError(
+            f"I can change at most {TEACHER_MAX_BATCH_CHANGES} classes at once."
+        )
+    items: list[dict] = []
+    seen: dict[str, int] = {}
+    for position, change in enumerate(changes, start=1):
+        try:
+            action, args = build_reschedule_args(change, default_timezone)
+        except ScheduleError as exc:
+            raise ScheduleError(f"Change {position}: {exc}") from None
+        shift_id = args.get("shiftId")
+        if shift_id in seen:
+            raise ScheduleError(
+                f"Changes {seen[shift_id]} and {position} both move the same class; "
+                "please merge them."
+            )
+        if shift_id:
+            seen[shift_id] = position
+        args.pop("confirmed")
+        items.append({"action": action, **args})
+    return {"confirmed": True, "changes": items}
+
+
+def split_batch_args(args: dict) -> list[tuple[str, dict]]:
+    """The single-change (action, args) calls a batch stands for, in order."""
+    calls: list[tuple[str, dict]] = []
+    for item in args["changes"]:
+        item_args = {key: value for key, value in item.items() if key != "action"}
+        calls.append((item["action"], {"confirmed": True, **item_args}))
+    return calls
+
+
+def parse_supported_actions(raw: Any) -> frozenset[str]:
+    """Teacher actions the client handles, from a list or comma-separated string."""
+    if isinstance(raw, str):
+        names = raw.split(",")
+    elif isinstance(raw, (list, tuple)):
+        names = [str(name) for name in raw]
+    else:
+        names = []
+    return BASE_TEACHER_ACTIONS | {
+        name.strip().lower() for name in names if name.strip()
+    }
+
+
+def is_unsupported_result(result: dict) -> bool:
+    """Whether the client rejected the action itself, not its arguments."""
+    message = str(result.get("message") or "").strip().lower()
+    return result.get("success") is not True and message.startswith(
+        _UNSUPPORTED_ACTION_PREFIX
+    )
+
+
+def batch_item_results(result: dict, count: int) -> list[tuple[bool, str]]:
+    """Per-change (success, message) pairs from a batch result payload.
+
+    The client answers with results: [{index, success, message}], index
+    0-based in request order. Items it did not report share the overall
+    outcome and message.
+    """
+    overall_ok = result.get("success") is True
+    overall_message = str(result.get("message") or "").strip()
+    outcomes: list[tuple[bool, str]] = [(overall_ok, overall_message)] * count
+    reported = result.get("results")
+    if not isinstance(reported, list):
+        return outcomes
+    for position, item in enumerate(reported):
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index", position)
+        if isinstance(index, int) and 0 <= index < count:
+            outcomes[index] = (
+                item.get("success") is True,
+                str(item.get("message") or "").strip(),
+            )
+    return outcomes
+
+
+class Shift:
+    """One scheduled class from the teacher's shift list, with aware times."""
+
+    __slots__ = ("id", "student_name", "student_id", "start", "end")
+
+    def __init__(
+        self, shift_id: str, student_name: str, student_id: str, start: datetime, end: datetime
+    ) -> None:
+        self.id = shift_id
+        self.student_name = student_name
+        self.student_id = student_id
+        self.start = start
+        self.end = end
+
+    def describe(self, zone: tzinfo | None = None) -> str:
+        start = self.start.astimezone(zone) if zone is not None else self.start
+        end = self.end.astimezone(zone) if zone is not None else self.end
+        who = self.student_name or self.student_id or "class"
+        return (
+            f"{who} on {start:%A %Y-%m-%d} {start:%H:%M}-{end:%H:%M} (shift {self.id})"
+        )
+
+
+def _parse_shift_time(value: Any, zone: tzinfo) -> datetime | None:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=zone)
+
+
+class ShiftSchedule:
+    """Snapshot of the teacher's shifts as the client last reported them.
+
+    Built from a list_shifts result: {"shifts": [{id, studentName,
+    studentId, startLocal, endLocal, timezone}]}, also accepted under
+    "data". Times may instead carry an offset ("start"/"end"). Entries that
+    do not parse are skipped.
+    """
+
+    __slots__ = ("shifts", "_by_id", "fetched_at")
+
+    def __init__(self, shifts: list[Shift]) -> None:
+        self.shifts = tuple(sorted(shifts, key=lambda shift: shift.start))
+        self._by_id = {shift.id: shift for shift in self.shifts}
+        self.fetched_at = time.monotonic()
+
+    @classmethod
+    def from_result(cls, result: dict, default_timezone: str) -> "ShiftSchedule | None":
+        data = result.get("data")
+        container = data if isinstance(data, dict) else result
+        entries = container.get("shifts")
+        if not isinstance(entries, list):
+            return None
+        default_zone = _zone(default_timezone) or _zone("UTC")
+        shifts: list[Shift] = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            shift_id = str(entry.get("id") or entry.get("shiftId") or "").strip()
+            zone = _zone(str(entry.get("timezone") or "")) or default_zone
+            start = _parse_shift_time(entry.get("startLocal") or entry.get("start"), zone)
+            end = _parse_shift_time(entry.get("endLocal") or entry.get("end"), zone)
+            if not shift_id or start is None or end is None or end <= start:
+                continue
+            shifts.append(
+                Shift(
+                    shift_id,
+                    str(entry.get("studentName") or "").strip(),
+                    str(entry.get("studentId") or "").strip(),
+                    start,
+                    end,
+                )
+            )
+        return cls(shifts)
+
+    def get(self, shift_id: str) -> Shift | None:
+        return self._by_id.get(shift_id)
+
+    def current(self, now: datetime) -> list[Shift]:
+        """Shifts a teacher could clock into at `now`."""
+        return [
+            shift for shift in self.shifts if shift.start - CLOCK_IN_EARLY <= now < shift.end
+        ]
+
+    def for_student(self, student_name: str = "", student_id: str = "") -> list[Shift]:
+        name = student_name.strip().casefold()
+        student_id = student_id.strip()
+        if not (name or student_id):
+            return []
+        return [
+            shift
+            for shift in self.shifts
+            if (student_id and shift.student_id == student_id)
+            or (not student_id and name and shift.student_name.casefold() == name)
+        ]
+
+    def on_date(self, day: date, zone: tzinfo) -> list[Shift]:
+        return [shift for shift in self.shifts if shift.start.astimezone(zone).date() == day]
+
+    def upcoming(self, now: datetime, limit: int) -> list[Shift]:
+        return [shift for shift in self.shifts if shift.end > now][:limit]
+
+    def overlapping(self, start: datetime, end: datetime, exclude: set[str]) -> list[Shift]:
+        return [
+            shift
+            for shift in self.shifts
+            if shift.id not in exclude and shift.start < end and start < shift.end
+        ]
+
+
+def _aware(local_iso: str, timezone: str) -> datetime:
+    return datetime.fromisoformat(local_iso).replace(tzinfo=_zone(timezone))
+
+
+def _claim_shift(moved_ids: dict[str, int], shift_id: str, position: int) -> None:
+    other = moved_ids.setdefault(shift_id, position)
+    if other != position:
+        raise ScheduleError(
+            f"Changes {other} and {position} both move the same class; please merge them."
+        )
+
+
+def check_reschedules(
+    schedule: ShiftSchedule | None,
+    items: list[tuple[str, dict]],
+    now: datetime | None = None,
+) -> None:
+    """Check validated (action, args) changes against the clock and the shift list.
+
+    Runs before any round trip. Rejects a new time already in the past, an
+    unknown shift id, and a new slot overlapping another class or another
+    change in the same request. A single-class change without a shiftId gets
+    one only when the student has exactly one class on its applyFromDate,
+    and two changes that end up moving the same class are rejected;
+    otherwise the client picks the class, and none of that student's classes
+    counts as a clash since any may be the one moving. Future-scope changes
+    are checked at their first occurrence. Without a schedule only the clock
+    is checked.
+    """
+    now = now or datetime.now(timezone.utc)
+    moved: list[tuple[int, datetime, datetime]] = []
+    # Shift id -> the change moving it, whether named or filled in.
+    moved_ids: dict[str, int] = {}
+    # Per change, the classes that may be the one it moves; None when unknown.
+    own_ids: dict[int, set[str] | None] = {}
+    for position, (_, args) in enumerate(items, start=1):
+        prefix = f"Change {position}: " if len(items) > 1 else ""
+        start = _aware(str(args["newStartLocal"]), str(args["timezone"]))
+        end = _aware(str(args["newEndLocal"]), str(args["timezone"]))
+        if start <= now:
+            raise ScheduleError(
+                f"{prefix}The new time {args['newStartLocal']} is already in the past "
+                f"in {args['timezone']}."
+            )
+        for other, other_start, other_end in moved:
+            if other_start < end and start < other_end:
+                raise ScheduleError(
+                    f"Changes {other} and {position} would put two classes at the same time."
+                )
+        moved.append((position, start, end))
+        if schedule is None:
+            continue
+
+        shift_id = str(args.get("shiftId") or "")
+        if shift_id and schedule.get(shift_id) is None:
+            raise ScheduleError(
+                f"{prefix}I cannot find class {shift_id} in your schedule. "
+                "Which class should I move?"
+            )
+        if shift_id:
+            _claim_shift(moved_ids, shift_id, position)
+            own_ids[position] = {shift_id}
+            continue
+        candidates = schedule.for_student(
+            str(args.get("studentName") or ""), str(args.get("studentId") or "")
+        )
+        apply_from = str(args.get("applyFromDate") or "")
+        if args["scope"] == "single" and apply_from:
+            # The class's own date; the new date may hold a different class.
+            day = datetime.fromisoformat(apply_from).date()
+            on_day = [
+                shift
+                for shift in candidates
+                if shift.start.astimezone(start.tzinfo).date() == day
+            ]
+            if len(on_day) == 1:
+                _claim_shift(moved_ids, on_day[0].id, position)
+                args["shiftId"] = on_day[0].id
+                own_ids[position] = {on_day[0].id}
+                continue
+        own_ids[position] = {shift.id for shift in candidates} if candidates else None
+
+    if schedule is None:
+        return
+    for position, start, end in moved:
+        own = own_ids[position]
+        if own is None:
+            continue
+        clashes = schedule.overlapping(start, end, moved_ids.keys() | own)
+        if clashes:
+            prefix = f"Change {position}: " if len(items) > 1 else ""
+            raise ScheduleError(
+                f"{prefix}The new time overlaps {clashes[0].describe(start.tzinfo)}."
+            )
+
+
+def resolve_clock_in(
+    schedule: ShiftSchedule | None, shift_id: str, now: datetime | None = None
+) -> str:
+    """The shift to clock into: the given id if the schedule has it, else the current one.
+
+    Returns "" when the schedule cannot tell, leaving the choice to the client.
+    """
+    if schedule is None:
+        return shift_id
+    if shift_id:
+        if schedule.get(shift_id) is None:
+            raise ScheduleError(f"I cannot find shift {shift_id} in your schedule.")
+        return shift_id
+    current = schedule.current(now or datetime.now(timezone.utc))
+    if len(current) > 1:
+        raise ScheduleError(
+            "You have more than one class right now: "
+            + "; ".join(shift.describe() for shift in current)
+            + ". Which one should I clock you into?"
+        )
+    return current[0].id if current else ""
+
+
+def describe_classes(
+    schedule: ShiftSchedule,
+    date_local_iso: str,
+    timezone_name: str,
+    now: datetime | None = None,
+) -> str:
+    """Classes on a local date (YYYY-MM-DD), or the next few when no date is given."""
+    zone = _zone(timezone_name) or timezone.utc
+    day_text = date_local_iso.strip()[:10]
+    if day_text:
+        try:
+            day = date.fromisoformat(day_text)
+        except ValueError:
+            raise ScheduleError(
+                f"Invalid date '{date_local_iso.strip()}'. Please use a date like 2024-03-15."
+            ) from None
+        shifts = schedule.on_date(day, zone)
+        if not shifts:
+            return f"No classes on {day:%A %Y-%m-%d}."
+        heading = f"{len(shifts)} class(es) on {day:%A %Y-%m-%d}"
+    else:
+        shifts = schedule.upcoming(now or datetime.now(timezone.utc), UPCOMING_CLASSES_LIMIT)
+        if not shifts:
+            return "No upcoming classes."
+        heading = f"Next {len(shifts)} class(es)"
+    return f"{heading}: " + "; ".join(shift.describe(zone) for shift in shifts) + "."
+
+
+class TeacherScheduleCache:
+    """The teacher's shift list, fetched once per session and kept until a write.
+
+    `fetch` runs the read-only list_shifts action and returns its result.
+    Callers share one fetch in flight. After any other teacher action the
+    snapshot is dropped and refetched in the background, since the client
+    may have changed the schedule. A failed fetch is retried no sooner than
+    SCHEDULE_RETRY_S later, backing off, so tools fall back to sending
+    changes unchecked instead of waiting; a client that answers the fetch
+    with success=false is not asked again.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[dict]],
+        default_timezone: str,
+    ) -> None:
+        self._fetch = fetch
+        self._default_timezone = default_timezone
+        self._snapshot: ShiftSchedule | None = None
+        self._task: asyncio.Task | None = None
+        self._task_generation = -1
+        self._generation = 0
+        self._retry_at = 0.0
+        self._retry_s = SCHEDULE_RETRY_S
+        self._unsupported = False
+        self.fetches = 0
+        self.hits = 0
+        self.invalidations = 0
+        self.failures = 0
+        self.slow = 0
+
+    @property
+    def snapshot(self) -> ShiftSchedule | None:
+        return self._snapshot
+
+    def prefetch(self) -> asyncio.Task | None:
+        """Start fetching unless a snapshot is held, a fetch runs or it is too soon to retry."""
+        if self._snapshot is not None or self._unsupported:
+            return None
+        if (
+            self._task is not None
+            and not self._task.done()
+            and self._task_generation == self._generation
+        ):
+            return self._task
+        if time.monotonic() < self._retry_at:
+            return None
+        self._task = asyncio.create_task(self._load(self._generation))
+        self._task_generation = self._generation
+        return self._task
+
+    async def get(
+        self, refresh: bool = False, wait_s: float = SCHEDULE_WAIT_S
+    ) -> ShiftSchedule | None:
+        """The current snapshot, fetching it first when none is held.
+
+        Returns None when the schedule is unavailable or not back within
+        `wait_s`; callers then skip the local checks.
+        """
+        if refresh:
+            self.invalidate(refetch=False)
+            self._retry_at = 0.0
+        if self._snapshot is not None:
+            self.hits += 1
+            return self._snapshot
+        task = self.prefetch()
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=wait_s)
+            except asyncio.TimeoutError:
+                self.slow += 1
+        return self._snapshot
+
+    def invalidate(self, refetch: bool = True) -> None:
+        if self._snapshot is not None:
+            self.invalidations += 1
+        self._snapshot = None
+        # A fetch already running may predate the change; its answer is dropped.
+        self._generation += 1
+        if refetch:
+            self.prefetch()
+
+    async def _load(self, generation: int) -> None:
+        self.fetches += 1
+        try:
+            result = await self._fetch()
+        except Exception as exc:
+            self._failed(f"{exc}")
+            return
+        if result.get("success") is not True:
+            self._unsupported = True
+            self._failed(str(result.get("message") or "request failed"))
+            return
+        schedule = ShiftSchedule.from_result(result, self._default_timezone)
+        if schedule is None:
+            self._unsupported = True
+            self._failed("result had no shift list")
+            return
+        self._retry_s = SCHEDULE_RETRY_S
+        if generation == self._generation:
+            self._snapshot = schedule
+            logger.info("Teacher actions: cached %s shift(s)", len(schedule.shifts))
+
+    def _failed(self, reason: str) -> None:
+        self.failures += 1
+        self._retry_at = time.monotonic() + self._retry_s
+        self._retry_s = min(SCHEDULE_RETRY_MAX_S, 2 * self._retry_s)
+        logger.warning("Teacher actions: schedule fetch failed (%s); checks skipped", reason)
+
+    async def aclose(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def format_stats(self) -> str:
+        held = len(self._snapshot.shifts) if self._snapshot is not None else 0
+        return (
+            f"schedule fetches={self.fetches} failures={self.failures} slow={self.slow} "
+            f"hits={self.hits} "
+            f"invalidations={self.invalidations} shifts held={held}"
+        )
@@ -0,0 +1,81 @@
+import asyncio
+import math
+from collections import deque
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyRecorder:
+    """Recent latency samples per key, summarized as count/p50/p95/max."""
+
+    def __init__(self, window: int = 256) -> None:
+        self._window = max(1, int(window))
+        self._samples: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+
+    def observe(self, key: str, elapsed_ms: float) -> None:
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = deque(maxlen=self._window)
+            self._samples[key] = samples
+        samples.append(float(elapsed_ms))
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        summary: dict[str, dict[str, float]] = {}
+        for key, samples in self._samples.items():
+            ordered = sorted(samples)
+            summary[key] = {
+                "count": float(self._counts.get(key, 0)),
+                "p50_ms": _percentile(ordered, 0.50),
+                "p95_ms": _percentile(ordered, 0.95),
+                "max_ms": ordered[-1] if ordered else 0.0,
+            }
+        return summary
+
+    def format(self) -> str:
+        parts = [
+            f"{key}: n={int(stats['count'])} p50={stats['p50_ms']:.1f}ms "
+            f"p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms"
+            for key, stats in sorted(self.snapshot().items())
+        ]
+        return "; ".join(parts) if parts else "no samples"
+
+
+class LoopLagMonitor:
+    """Samples event-loop scheduling lag: how late a periodic wakeup fires.
+
+    Blocking work on the loop (audio I/O, VAD and turn detection share it)
+    shows up directly as lag.
+    """
+
+    def __init__(self, recorder: LatencyRecorder, interval_s: float = 0.05) -> None:
+        self._recorder = recorder
+        self._interval_s = interval_s
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval_s
+            await asyncio.sleep(self._interval_s)
+            self._recorder.observe("loop_lag", max(0.0, loop.time() - expected) * 1000.0)
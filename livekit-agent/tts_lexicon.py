@@ -0,0 +1,245 @@
+import re
+import time
+from dataclasses import dataclass
+
+try:
+    import regex
+except Exception:  # pragma: no cover - optional runtime dependency fallback
+    regex = None
+
+# Upper bound on streamed text held back while waiting for a split term to complete.
+DEFAULT_MAX_HOLDBACK_CHARS = 48
+# Without partial matching, hold back the trailing run of characters that
+# lexicon terms are made of and flush at punctuation.
+_FALLBACK_HOLDBACK_RE = re.compile(r"[\w'’\s-]*\Z")
+
+_SCOPED_FLAG_LETTERS: tuple[tuple[re.RegexFlag, str], ...] = (
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+)
+
+
+def _top_level_alternatives(source: str) -> list[str]:
+    alternatives: list[str] = []
+    depth = 0
+    in_class = False
+    start = 0
+    index = 0
+    while index < len(source):
+        char = source[index]
+        if char == "\\":
+            index += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            alternatives.append(source[start:index])
+            start = index + 1
+        index += 1
+    alternatives.append(source[start:])
+    return alternatives
+
+
+def _leading_chars(pattern: re.Pattern[str]) -> set[str] | None:
+    """First characters any match can start with, or None when not a plain literal."""
+    chars: set[str] = set()
+    for alternative in _top_level_alternatives(pattern.pattern):
+        while alternative.startswith("\\b"):
+            alternative = alternative[2:]
+        if not alternative or not alternative[0].isalnum():
+            return None
+        if alternative[1:2] in {"?", "*", "{"}:
+            return None
+        first = alternative[0]
+        if pattern.flags & re.IGNORECASE:
+            chars.update((first.lower(), first.upper()))
+        else:
+            chars.add(first)
+    return chars
+
+
+def _scoped_pattern(pattern: re.Pattern[str]) -> str:
+    letters = "".join(
+        letter for flag, letter in _SCOPED_FLAG_LETTERS if pattern.flags & flag
+    )
+    if not letters:
+        return f"(?:{pattern.pattern})"
+    return f"(?{letters}:{pattern.pattern})"
+
+
+class PronunciationLexicon:
+    """Applies an ordered list of (pattern, replacement) rules in one regex scan.
+
+    Rules are joined into a single alternation, in priority order, with one
+    named group per rule; the matching group selects the replacement. When
+    every rule starts with a literal character, a lookahead on that character
+    set lets the scanner skip most positions without trying each branch. The
+    rules must not contain capturing groups and replacements are literal text.
+    """
+
+    def __init__(self, rules: list[tuple[re.Pattern[str], str]]) -> None:
+        self._rules = list(rules)
+        self._replacements: dict[str, str] = {}
+        alternatives: list[str] = []
+        leading: set[str] | None = set()
+        for index, (pattern, replacement) in enumerate(self._rules):
+            if pattern.groups:
+                raise ValueError(
+                    f"pronunciation rule {pattern.pattern!r} must not use capturing groups"
+                )
+            group_name = f"r{index}"
+            self._replacements[group_name] = replacement
+            alternatives.append(f"(?P<{group_name}>{_scoped_pattern(pattern)})")
+            rule_leading = _leading_chars(pattern)
+            leading = (
+                leading | rule_leading
+                if leading is not None and rule_leading is not None
+                else None
+            )
+
+        self._combined: re.Pattern[str] | None = None
+        if alternatives:
+            combined = "|".join(alternatives)
+            if leading:
+                guard = "".join(re.escape(char) for char in sorted(leading))
+                combined = f"(?=[{guard}])(?:{combined})"
+            self._combined = re.compile(combined)
+        self._leading = frozenset(leading) if leading else None
+        # Matches when some rule could still complete at, or run past, the end of
+        # the text; used to find the shortest suffix a stream has to hold back.
+        self._tail_matcher = (
+            regex.compile(f"(?:{self._combined.pattern})\\Z")
+            if regex is not None and self._combined is not None
+            else None
+        )
+
+    @property
+    def rules(self) -> list[tuple[re.Pattern[str], str]]:
+        return self._rules
+
+    def _replace(self, match: re.Match[str]) -> str:
+        return self._replacements[match.lastgroup or ""]
+
+    def apply(self, text: str) -> str:
+        if not text or self._combined is None:
+            return text
+        return self._combined.sub(self._replace, text)
+
+    def holdback_start(self, text: str, pos: int = 0) -> int:
+        """Index from which text[pos:] might still change when more text arrives."""
+        if self._combined is None:
+            return len(text)
+        if self._tail_matcher is None:
+            fallback = _FALLBACK_HOLDBACK_RE.search(text, pos)
+            return fallback.start() if fallback is not None else len(text)
+        for index in range(pos, len(text)):
+            if self._leading is not None and text[index] not in self._leading:
+                continue
+            if self._tail_matcher.match(text, pos=index, partial=True) is not None:
+                return index
+        return len(text)
+
+    def streaming_normalizer(
+        self, max_holdback_chars: int = DEFAULT_MAX_HOLDBACK_CHARS
+    ) -> "StreamingPronunciationNormalizer":
+        return StreamingPronunciationNormalizer(self, max_holdback_chars)
+
+    def apply_sequential(self, text: str) -> str:
+        """Reference implementation: one scan per rule."""
+        normalized = text
+        for pattern, replacement in self._rules:
+            normalized = pattern.sub(replacement, normalized)
+        return normalized
+
+
+@dataclass
+class HoldbackStats:
+    chunks: int = 0
+    held_chunks: int = 0
+    max_held_chars: int = 0
+    total_hold_ms: float = 0.0
+    max_hold_ms: float = 0.0
+
+
+class StreamingPronunciationNormalizer:
+    """Rewrites streamed text so terms split across chunks are still replaced.
+
+    Each chunk is flushed immediately except for the shortest suffix that could
+    still become part of a lexicon match, which waits for the next chunk (or
+    flush()). The output is identical to applying the lexicon to the whole text.
+    """
+
+    def __init__(
+        self,
+        lexicon: PronunciationLexicon,
+        max_holdback_chars: int = DEFAULT_MAX_HOLDBACK_CHARS,
+    ) -> None:
+        self._lexicon = lexicon
+        self._max_holdback_chars = max(0, int(max_holdback_chars))
+        self._pending = ""
+        # Last raw character already emitted, kept so word boundaries resolve.
+        self._context = ""
+        self._held_since: float | None = None
+        self.stats = HoldbackStats()
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self.stats.chunks += 1
+        self._pending += chunk
+        text = self._context + self._pending
+        offset = len(self._context)
+        split = max(
+            self._lexicon.holdback_start(text, offset),
+            len(text) - self._max_holdback_chars,
+        )
+        return self._emit(text, offset, split)
+
+    def flush(self) -> str:
+        if not self._pending:
+            return ""
+        text = self._context + self._pending
+        return self._emit(text, len(self._context), len(text))
+
+    def _emit(self, text: str, offset: int, split: int) -> str:
+        combined = self._lexicon._combined
+        parts: list[str] = []
+        last = offset
+        if combined is not None:
+            for match in combined.finditer(text, offset):
+                if match.start() >= split:
+                    break
+                if match.end() > split:
+                    # Never cut through a match; hold it back whole.
+                    split = match.start()
+                    break
+                parts.append(text[last : match.start()])
+                parts.append(self._lexicon._replace(match))
+                last = match.end()
+        parts.append(text[last:split])
+
+        if split > offset:
+            self._context = text[split - 1]
+        self._pending = text[split:]
+        self._record_hold(emitted=split > offset)
+        return "".join(parts)
+
+    def _record_hold(self, *, emitted: bool) -> None:
+        now = time.perf_counter()
+        if emitted and self._held_since is not None:
+            held_ms = (now - self._held_since) * 1000.0
+            self.stats.total_hold_ms += held_ms
+            self.stats.max_hold_ms = max(self.stats.max_hold_ms, held_ms)
+            self._held_since = None
+        if self._pending:
+            self.stats.held_chunks += 1
+            self.stats.max_held_chars = max(self.stats.max_held_chars, len(self._pending))
+            if self._held_since is None:
+                self._held_since = now
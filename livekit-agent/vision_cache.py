@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageChops, ImageFilter
+except Exception:  # pragma: no cover - optional runtime dependency fallback
+    Image = None
+    ImageChops = None
+    ImageFilter = None
+
+DHASH_SIZE = 8
+# dHash alone is too forgiving for whiteboards: a newly written digit can
+# leave it unchanged. It only preselects candidates; the ink masks decide.
+DHASH_MAX_DISTANCE = 10
+THUMBNAIL_SIZE = (256, 192)
+# Pixels this much darker than white count as ink.
+INK_THRESHOLD = 32
+# Rescaling and lossy encoding move ink edges by about a thumbnail pixel, so
+# each mask is compared against the other grown by this (odd) filter size.
+INK_TOLERANCE = 3
+
+
+def dhash(gray, hash_size: int = DHASH_SIZE) -> int:
+    """Difference hash of a grayscale image: one bit per horizontal gradient."""
+    small = gray.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+class BoardFingerprint:
+    """Perceptual fingerprint of a board image, robust to rescaling and lossy encoding."""
+
+    __slots__ = ("dhash", "ink", "grown_ink")
+
+    def __init__(self, hash_value: int, ink) -> None:
+        self.dhash = hash_value
+        self.ink = ink
+        self.grown_ink = ink.filter(ImageFilter.MaxFilter(INK_TOLERANCE))
+
+    @classmethod
+    def from_image(cls, image) -> "BoardFingerprint | None":
+        if Image is None:
+            return None
+        gray = image.convert("L")
+        thumbnail = gray.resize(THUMBNAIL_SIZE, Image.Resampling.BOX)
+        ink = thumbnail.point(lambda value: 255 if value < 255 - INK_THRESHOLD else 0)
+        return cls(dhash(gray), ink)
+
+    def matches(self, other: "BoardFingerprint") -> bool:
+        """True when neither board has ink the other lacks (nothing added or erased)."""
+        if (self.dhash ^ other.dhash).bit_count() > DHASH_MAX_DISTANCE:
+            return False
+        if ImageChops.subtract(other.ink, self.grown_ink).getbbox() is not None:
+            return False
+        return ImageChops.subtract(self.ink, other.grown_ink).getbbox() is None
+
+
+class VisionResultCache:
+    """Recent vision analyses per session, looked up by board fingerprint."""
+
+    def __init__(self, capacity: int = 8, max_age_s: float = 600.0) -> None:
+        self._capacity = max(1, int(capacity))
+        self._max_age_s = max_age_s
+        self._entries: OrderedDict[int, tuple[BoardFingerprint, str, float]] = OrderedDict()
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, fingerprint: BoardFingerprint | None) -> str | None:
+        if fingerprint is None:
+            return None
+        now = time.monotonic()
+        for key, (cached, analysis, stored_at) in reversed(self._entries.items()):
+            if now - stored_at > self._max_age_s:
+                continue
+            if cached.matches(fingerprint):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return analysis
+        self.misses += 1
+        return None
+
+    def store(self, fingerprint: BoardFingerprint | None, analysis: str) -> None:
+        if fingerprint is None or not analysis:
+            return
+        self._entries[self._next_key] = (fingerprint, analysis, time.monotonic())
+        self._next_key += 1
+        while len(self._entries) > self._capacity:
+            self._entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
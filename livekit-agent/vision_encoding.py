@@ -0,0 +1,184 @@
+import base64
+import dataclasses
+import io
+
+try:
+    from PIL import Image, features
+except Exception:  # pragma: no cover - optional runtime dependency fallback
+    Image = None
+    features = None
+
+from vision_cache import BoardFingerprint
+
+DEFAULT_VISION_MAX_EDGE = 1024
+DEFAULT_VISION_MAX_BYTES = 300_000
+# Rendered boards (flat ink plus anti-aliased text) stay well under this many
+# distinct colors; photos and blurred device captures do not.
+LINE_ART_MAX_COLORS = 1024
+# Line art goes out as a palette PNG: near-lossless for a few ink colors,
+# several times smaller than RGB PNG and cheaper to encode than WebP.
+LINE_ART_PALETTE_SIZES = (64, 16)
+# The last is the floor: lower qualities smear handwriting and small text.
+LOSSY_QUALITIES = (85, 70, 55)
+# Stop downscaling below this edge; handwriting is unreadable past it.
+MIN_VISION_EDGE = 768
+DOWNSCALE_STEP = 0.75
+# Encodes per image at most; this runs on every vision turn.
+MAX_VISION_ENCODES = 8
+# After a downscale, a setting is only retried when its previous size scaled
+# by the pixel area lands within this factor of the budget.
+DOWNSCALE_RETRY_SLACK = 1.25
+# An encode this many times over budget skips to the floor setting: the
+# intermediate palette and quality steps do not shrink it enough to fit.
+FLOOR_JUMP_RATIO = 2.0
+
+
+@dataclasses.dataclass(frozen=True)
+class VisionImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    # Of the source image, for recognising an unchanged board.
+    fingerprint: BoardFingerprint | None = None
+
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def _webp_available() -> bool:
+    try:
+        return features is not None and bool(features.check("webp"))
+    except Exception:
+        return False
+
+
+def _flatten(image):
+    """RGB on a white background; lossy formats and palettes need no alpha."""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _downscale(image, max_edge: int):
+    width, height = image.size
+    longest = max(width, height)
+    if longest <= max_edge:
+        return image
+    scale = max_edge / float(longest)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def _encode(image, fmt: str, setting: int) -> VisionImage:
+    out = io.BytesIO()
+    if fmt == "PNG":
+        image = image.quantize(
+            colors=setting,
+            method=Image.Quantize.FASTOCTREE,
+            dither=Image.Dither.NONE,
+        )
+        image.save(out, format="PNG")
+        mime_type = "image/png"
+    elif fmt == "WEBP":
+        image.save(out, format="WEBP", quality=setting, method=2)
+        mime_type = "image/webp"
+    else:
+        image.save(out, format="JPEG", quality=setting, optimize=True)
+        mime_type = "image/jpeg"
+    return VisionImage(out.getvalue(), mime_type, image.size[0], image.size[1])
+
+
+def encode_for_vision(
+    image,
+    *,
+    max_edge: int = DEFAULT_VISION_MAX_EDGE,
+    max_bytes: int = DEFAULT_VISION_MAX_BYTES,
+) -> VisionImage:
+    """Encode a board image for a vision model within an edge and byte budget.
+
+    Line art goes out as a palette PNG; anything else (photos, blurred
+    captures) as WebP, or JPEG where WebP is unavailable. Over budget, the
+    palette and then lossy quality shrink first, then the image is downscaled,
+    never below MIN_VISION_EDGE or the lowest of LOSSY_QUALITIES. After a
+    downscale only settings whose last size, scaled by area, could fit are
+    tried again; an encode far over budget jumps to the floor setting, and at
+    most MAX_VISION_ENCODES encodes run. If the budget still cannot be met,
+    the smallest frame within those floors is returned.
+    """
+    image = _flatten(image)
+    fingerprint = BoardFingerprint.from_image(image)
+    image = _downscale(image, max_edge)
+    lossy_format = "WEBP" if _webp_available() else "JPEG"
+    attempts = [(lossy_format, quality) for quality in LOSSY_QUALITIES]
+    if image.getcolors(maxcolors=LINE_ART_MAX_COLORS) is not None:
+        attempts = [("PNG", colors) for colors in LINE_ART_PALETTE_SIZES] + attempts
+    smallest: VisionImage | None = None
+    sizes: dict[tuple[str, int], int] = {}
+    encodes = 0
+    area_ratio = 1.0
+    while True:
+        to_floor = False
+        for attempt in attempts:
+            previous = sizes.get(attempt)
+            # The floor setting always gets a try at each scale.
+            if attempt != attempts[-1] and (
+                to_floor
+                or (
+                    previous is not None
+                    and previous * area_ratio > max_bytes * DOWNSCALE_RETRY_SLACK
+                )
+            ):
+                continue
+            if encodes >= MAX_VISION_ENCODES:
+                return dataclasses.replace(smallest, fingerprint=fingerprint)
+            encoded = _encode(image, *attempt)
+            encodes += 1
+            sizes[attempt] = len(encoded.data)
+            if smallest is None or len(encoded.data) < len(smallest.data):
+                smallest = encoded
+            if len(encoded.data) <= max_bytes:
+                return dataclasses.replace(encoded, fingerprint=fingerprint)
+            to_floor = len(encoded.data) > max_bytes * FLOOR_JUMP_RATIO
+        if max(image.size) <= MIN_VISION_EDGE:
+            return dataclasses.replace(smallest, fingerprint=fingerprint)
+        before = image.size[0] * image.size[1]
+        image = _downscale(
+            image, max(MIN_VISION_EDGE, int(max(image.size) * DOWNSCALE_STEP))
+        )
+        area_ratio = image.size[0] * image.size[1] / float(before)
+
+
+def prepare_client_image(
+    raw: bytes,
+    mime_type: str,
+    *,
+    max_edge: int = DEFAULT_VISION_MAX_EDGE,
+    max_bytes: int = DEFAULT_VISION_MAX_BYTES,
+) -> VisionImage | None:
+    """Re-encode a client-supplied image only when it breaks the budget.
+
+    Returns None when Pillow is unavailable; raises ValueError when the bytes
+    do not decode as an image.
+    """
+    if Image is None:
+        return None
+    try:
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"undecodable image: {e}") from e
+    if len(raw) <= max_bytes and max(image.size) <= max_edge:
+        return VisionImage(
+            raw,
+            mime_type,
+            image.size[0],
+            image.size[1],
+            BoardFingerprint.from_image(_flatten(image)),
+        )
+    return encode_for_vision(image, max_edge=max_edge, max_bytes=max_bytes)
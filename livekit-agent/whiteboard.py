@@ -0,0 +1,1375 @@
+import itertools
+import math
+import re
+import time
+from array import array
+from dataclasses import dataclass
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - optional runtime dependency fallback
+    np = None
+
+WHITEBOARD_PROJECT_VERSION = 2
+WHITEBOARD_MSG_TYPE_PROJECT_DELTA = "project_delta"
+# Capability a client advertises (in project payload "capabilities") when it
+# can apply project_delta messages.
+WHITEBOARD_DELTA_CAPABILITY = "project_delta"
+# Every Nth outbound change is sent as a full project so a peer that missed or
+# mis-applied a delta converges again.
+WHITEBOARD_DELTA_SNAPSHOT_INTERVAL = 20
+
+DEFAULT_STROKE_COLOR = 0xFF000000
+DEFAULT_STROKE_WIDTH = 3.0
+DEFAULT_TEXT_COLOR = 0xFF111827
+DEFAULT_FONT_SIZE = 28.0
+
+# Ids for wire items that arrive without one, so every item stays addressable.
+_unnamed_item_ids = itertools.count(1)
+
+
+def _wire_id(raw: dict) -> str:
+    item_id = raw.get("id")
+    if item_id is None or item_id == "":
+        return f"unnamed_{next(_unnamed_item_ids)}"
+    return str(item_id)
+
+
+# Agent item ids are "<prefix>_<ms>_<n>": the counter keeps two items made in
+# the same millisecond apart and orders them by creation, and the millisecond
+# part never runs backwards. Clients use the same "<ms>_<n>" tail.
+_new_item_ids = itertools.count(1)
+_last_new_item_ms = 0
+
+
+def new_item_id(prefix: str) -> str:
+    """A collision-free id for an agent-created item, increasing per process."""
+    global _last_new_item_ms
+    _last_new_item_ms = max(_last_new_item_ms, time.time_ns() // 1_000_000)
+    return f"{prefix}_{_last_new_item_ms}_{next(_new_item_ids)}"
+
+
+def _wire_int(value: object, default: int) -> int:
+    try:
+        return int(value)  # type: ignore[arg-type]
+    except Exception:
+        return default
+
+
+def _wire_float(value: object, default: float) -> float:
+    if isinstance(value, bool):
+        return default
+    try:
+        return float(value)  # type: ignore[arg-type]
+    except Exception:
+        return default
+
+
+# Stored points are float32, so wire output is rounded back to a short,
+# stable representation instead of echoing float32 noise (0.10000000149...).
+WIRE_POINT_DECIMALS = 5
+
+
+class StrokePoints:
+    """Packed float32 (x, y) pairs for one stroke.
+
+    Backed by an (n, 2) NumPy array when NumPy is available and by an
+    interleaved array("f") otherwise; either way a point costs 8 bytes instead
+    of a tuple of two Python floats. Immutable, so bounds and ink length are
+    computed once on first use.
+    """
+
+    __slots__ = ("_data", "_bounds", "_ink_length")
+
+    def __init__(self, data: object) -> None:
+        self._data = data
+        self._bounds: tuple[float, float, float, float] | None = None
+        self._ink_length: float | None = None
+
+    @classmethod
+    def _from_flat(cls, flat: list[float]) -> "StrokePoints":
+        if np is not None:
+            packed = np.array(flat, dtype=np.float32).reshape(-1, 2)
+            packed.flags.writeable = False
+            return cls(packed)
+        return cls(array("f", flat))
+
+    @classmethod
+    def from_pairs(cls, pairs: object) -> "StrokePoints":
+        return cls._from_flat([float(value) for pair in pairs for value in pair])  # type: ignore[attr-defined]
+
+    @classmethod
+    def from_wire(cls, raw_points: object) -> "StrokePoints":
+        """Pack wire points ([{"x": .., "y": ..}]), skipping malformed entries."""
+        flat: list[float] = []
+        if isinstance(raw_points, list):
+            append = flat.append
+            for point in raw_points:
+                if not isinstance(point, dict):
+                    continue
+                x = point.get("x")
+                y = point.get("y")
+                if (
+                    isinstance(x, (int, float))
+                    and isinstance(y, (int, float))
+                    and not isinstance(x, bool)
+                    and not isinstance(y, bool)
+                ):
+                    append(x)
+                    append(y)
+        return cls._from_flat(flat)
+
+    def __len__(self) -> int:
+        if np is not None and isinstance(self._data, np.ndarray):
+            return int(self._data.shape[0])
+        return len(self._data) // 2  # type: ignore[arg-type]
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def nbytes(self) -> int:
+        if np is not None and isinstance(self._data, np.ndarray):
+            return int(self._data.nbytes)
+        return len(self._data) * self._data.itemsize  # type: ignore[union-attr,arg-type]
+
+    def to_pairs(self) -> list[tuple[float, float]]:
+        if np is not None and isinstance(self._data, np.ndarray):
+            return [(x, y) for x, y in self._data.tolist()]
+        flat = self._data
+        return [(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]  # type: ignore[index,arg-type]
+
+    def __iter__(self):
+        return iter(self.to_pairs())
+
+    def to_wire(self) -> list[dict[str, float]]:
+        if np is not None and isinstance(self._data, np.ndarray):
+            rounded = np.round(self._data.astype(np.float64), WIRE_POINT_DECIMALS).tolist()
+            return [{"x": x, "y": y} for x, y in rounded]
+        return [
+            {"x": round(x, WIRE_POINT_DECIMALS), "y": round(y, WIRE_POINT_DECIMALS)}
+            for x, y in self.to_pairs()
+        ]
+
+    def bounds(self) -> tuple[float, float, float, float] | None:
+        """(min_x, min_y, max_x, max_y), or None for a stroke without points."""
+        if self._bounds is None and len(self):
+            if np is not None and isinstance(self._data, np.ndarray):
+                xs = self._data[:, 0]
+                ys = self._data[:, 1]
+                self._bounds = (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max()))
+            else:
+                xs = self._data[0::2]  # type: ignore[index]
+                ys = self._data[1::2]  # type: ignore[index]
+                self._bounds = (min(xs), min(ys), max(xs), max(ys))
+        return self._bounds
+
+    def ink_length(self) -> float:
+        """Total polyline length in the stroke's own coordinate space."""
+        if self._ink_length is None:
+            if len(self) < 2:
+                self._ink_length = 0.0
+            elif np is not None and isinstance(self._data, np.ndarray):
+                steps = np.diff(self._data.astype(np.float64), axis=0)
+                self._ink_length = float(np.hypot(steps[:, 0], steps[:, 1]).sum())
+            else:
+                pairs = self.to_pairs()
+                self._ink_length = sum(
+                    math.hypot(x1 - x0, y1 - y0)
+                    for (x0, y0), (x1, y1) in zip(pairs, pairs[1:])
+                )
+        return self._ink_length
+
+    def simplified(self, tolerance: float) -> "StrokePoints":
+        """Drop consecutive duplicates, then Ramer-Douglas-Peucker within `tolerance`.
+
+        Every dropped point lies within `tolerance` of the kept polyline.
+        Returns self when nothing can be dropped.
+        """
+        return simplify_stroke_points([self], tolerance)[0]
+
+
+def _rdp_keep_numpy(points: "np.ndarray", keep: "np.ndarray", tolerance: float) -> None:
+    """Ramer-Douglas-Peucker over (n, 2) float64 points, updating `keep` in place.
+
+    Points already in `keep` are anchors; each run between two anchors is
+    simplified on its own, so many strokes go through in one call when every
+    stroke's first and last point are anchors. All runs advance one
+    recursion level per pass, and a pass only revisits runs that were split
+    by the previous one.
+    """
+    tolerance_sq = tolerance * tolerance
+    # Gathers from contiguous 1-D columns are about twice as fast as row gathers.
+    xs = np.ascontiguousarray(points[:, 0])
+    ys = np.ascontiguousarray(points[:, 1])
+    candidates = np.flatnonzero(~keep)
+    while candidates.shape[0]:
+        kept = np.flatnonzero(keep)
+        segment = np.searchsorted(kept, candidates) - 1
+        starts = kept[segment]
+        ends = kept[segment + 1]
+        origin_x = xs[starts]
+        origin_y = ys[starts]
+        dx = xs[ends] - origin_x
+        dy = ys[ends] - origin_y
+        px = xs[candidates] - origin_x
+        py = ys[candidates] - origin_y
+        # Distance to the segment, not the infinite line, so a stroke that
+        # doubles back keeps its turning point.
+        lengths_sq = dx * dx + dy * dy
+        along = (px * dx + py * dy) / np.where(lengths_sq > 0.0, lengths_sq, 1.0)
+        np.clip(along, 0.0, 1.0, out=along)
+        px -= along * dx
+        py -= along * dy
+        distances_sq = px * px + py * py
+        # Candidates are in order, so every run is a contiguous slice.
+        run_starts = np.flatnonzero(np.diff(segment, prepend=-1))
+        run_max = np.maximum.reduceat(distances_sq, run_starts)
+        split_runs = run_max > tolerance_sq
+        if not split_runs.any():
+            return
+        run_of = np.repeat(
+            np.arange(run_starts.shape[0]),
+            np.diff(run_starts, append=candidates.shape[0]),
+        )
+        # Split each run still out of tolerance at its farthest point.
+        farthest = np.flatnonzero((distances_sq == run_max[run_of]) & split_runs[run_of])
+        first = np.diff(run_of[farthest], prepend=-1) != 0
+        split = farthest[first]
+        keep[candidates[split]] = True
+        remaining = split_runs[run_of]
+        remaining[split] = False
+        candidates = candidates[remaining]
+
+
+def _rdp_keep_pairs(pairs: list[tuple[float, float]], tolerance: float) -> list[int]:
+    """Indices of the points RDP keeps, in order; pure-Python counterpart."""
+    keep = {0, len(pairs) - 1}
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(pairs) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        ox, oy = pairs[start]
+        dx = pairs[end][0] - ox
+        dy = pairs[end][1] - oy
+        length_sq = dx * dx + dy * dy
+        farthest = -1
+        farthest_sq = tolerance_sq
+        for index in range(start + 1, end):
+            px = pairs[index][0] - ox
+            py = pairs[index][1] - oy
+            if length_sq > 0.0:
+                along = min(1.0, max(0.0, (px * dx + py * dy) / length_sq))
+                px -= along * dx
+                py -= along * dy
+            distance_sq = px * px + py * py
+            if distance_sq > farthest_sq:
+                farthest = index
+                farthest_sq = distance_sq
+        if farthest >= 0:
+            keep.add(farthest)
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+    return sorted(keep)
+
+
+def simplify_stroke_points(strokes: list[StrokePoints], tolerance: float) -> list[StrokePoints]:
+    """StrokePoints.simplified() for many strokes, in one vectorized pass with NumPy."""
+    if np is None or not all(isinstance(points._data, np.ndarray) for points in strokes):
+        return [_simplified_pairs(points, tolerance) for points in strokes]
+    lengths = np.array([len(points) for points in strokes], dtype=np.int64)
+    if not lengths.sum():
+        return list(strokes)
+    board = np.concatenate([points._data for points in strokes]).astype(np.float64)
+    ends = np.cumsum(lengths)
+    starts = (ends - lengths)[lengths > 0]
+    ends = ends[lengths > 0] - 1
+
+    keep = np.ones(board.shape[0], dtype=bool)
+    keep[1:] = np.any(board[1:] != board[:-1], axis=1)
+    keep[starts] = True
+    if tolerance > 0.0:
+        unique = np.flatnonzero(keep)
+        anchors = np.zeros(unique.shape[0], dtype=bool)
+        anchors[np.searchsorted(unique, starts)] = True
+        # A stroke's last unique point: the start of its final run of repeats.
+        anchors[np.searchsorted(unique, ends, side="right") - 1] = True
+        _rdp_keep_numpy(board[unique], anchors, tolerance)
+        keep[:] = False
+        keep[unique[anchors]] = True
+
+    simplified = []
+    offset = 0
+    for points, length in zip(strokes, lengths.tolist()):
+        mask = keep[offset : offset + length]
+        offset += length
+        if mask.all():
+            simplified.append(points)
+            continue
+        packed = points._data[mask]
+        packed.flags.writeable = False
+        simplified.append(StrokePoints(packed))
+    return simplified
+
+
+def _simplified_pairs(points: StrokePoints, tolerance: float) -> StrokePoints:
+    if len(points) < 2:
+        return points
+    pairs = points.to_pairs()
+    unique = [pairs[0]]
+    for pair in pairs[1:]:
+        if pair != unique[-1]:
+            unique.append(pair)
+    if tolerance > 0.0 and len(unique) > 2:
+        unique = [unique[index] for index in _rdp_keep_pairs(unique, tolerance)]
+    if len(unique) == len(pairs):
+        return points
+    if np is not None and isinstance(points._data, np.ndarray):
+        return StrokePoints.from_pairs(unique)
+    return StrokePoints(array("f", [value for pair in unique for value in pair]))
+
+
+# Default RDP tolerance in normalized board units: about one pixel on the
+# 1024x768 raster the agent renders.
+DEFAULT_INK_TOLERANCE = 0.001
+# Simplified strokes remembered per session so re-sent snapshots skip them.
+INK_CACHE_SIZE = 4096
+# Approximate bytes per cache entry besides its points: key tuple and dict slot.
+INK_CACHE_ENTRY_BYTES = 250
+
+
+class InkSimplifier:
+    """Simplifies inbound student strokes as they are parsed; one per session.
+
+    Consecutive duplicate points are dropped from every stroke, and
+    normalized strokes (the only ones with a known scale) are reduced with
+    Ramer-Douglas-Peucker at `tolerance`. New strokes in one packet are
+    simplified together in a single vectorized pass. The simplified points
+    are what rendering, stats and summaries walk; each stroke keeps its
+    exact points for the wire, since agent snapshots hand the board back to
+    the client. Snapshots re-send the whole board, so results are remembered
+    per stroke id and reused, without parsing the points again, while the
+    wire stroke keeps its point count and endpoints.
+    """
+
+    def __init__(
+        self,
+        tolerance: float = DEFAULT_INK_TOLERANCE,
+        cache_size: int = INK_CACHE_SIZE,
+    ) -> None:
+        self.tolerance = max(0.0, float(tolerance))
+        self._cache_size = max(0, int(cache_size))
+        # Stroke id -> (cache key, simplified points, exact points or None).
+        self._cache: dict[str, tuple[tuple, StrokePoints, StrokePoints | None]] = {}
+        self.strokes = 0
+        self.points_in = 0
+        self.points_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cache_hits = 0
+
+    @staticmethod
+    def _cache_key(raw: dict, normalized: bool) -> tuple:
+        """Cheap identity for a wire stroke's points; () when it cannot be cached."""
+        item_id = raw.get("id")
+        raw_points = raw.get("points")
+        if item_id is None or item_id == "" or not isinstance(raw_points, list) or not raw_points:
+            return ()
+        first = raw_points[0]
+        last = raw_points[-1]
+        if not isinstance(first, dict) or not isinstance(last, dict):
+            return ()
+        return (
+            str(item_id),
+            len(raw_points),
+            normalized,
+            first.get("x"),
+            first.get("y"),
+            last.get("x"),
+            last.get("y"),
+        )
+
+    def strokes_from_wire(self, raw_strokes: list) -> list["StrokeItem"]:
+        items: list[StrokeItem | None] = []
+        # (slot in items, raw stroke, cache key, parsed points), per tolerance.
+        pending: dict[bool, list[tuple[int, dict, tuple, StrokePoints]]] = {True: [], False: []}
+        for raw in raw_strokes:
+            if not isinstance(raw, dict):
+                continue
+            normalized = raw.get("normalized") is True
+            key = self._cache_key(raw, normalized)
+            cached = self._cache.get(key[0]) if key else None
+            if cached is not None and cached[0] == key:
+                self.cache_hits += 1
+                items.append(StrokeItem.from_wire(raw, cached[1], cached[2]))
+                continue
+            pending[normalized].append(
+                (len(items), raw, key, StrokePoints.from_wire(raw.get("points")))
+            )
+            items.append(None)
+
+        for normalized, entries in pending.items():
+            if not entries:
+                continue
+            simplified = simplify_stroke_points(
+                [points for _, _, _, points in entries],
+                self.tolerance if normalized else 0.0,
+            )
+            for (slot, raw, key, raw_points), points in zip(entries, simplified):
+                exact = None if points is raw_points else raw_points
+                self.strokes += 1
+                self.points_in += len(raw_points)
+                self.points_out += len(points)
+                self.bytes_in += raw_points.nbytes
+                self.bytes_out += points.nbytes
+                if key and self._cache_size:
+                    if len(self._cache) >= self._cache_size and key[0] not in self._cache:
+                        # Oldest first: strokes finished long ago are least likely re-sent.
+                        del self._cache[next(iter(self._cache))]
+                    self._cache[key[0]] = (key, points, exact)
+                items[slot] = StrokeItem.from_wire(raw, points, exact)
+        return items  # type: ignore[return-value]
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated bytes held by the cache itself.
+
+        Cached points are shared with strokes on the board and counted there;
+        those of erased strokes stay uncounted until `retain` drops them.
+        """
+        return INK_CACHE_ENTRY_BYTES * len(self._cache)
+
+    def retain(self, board_ids: set[str] | dict[str, None]) -> int:
+        """Forget strokes that are no longer on the board; returns bytes released."""
+        # Snapshot, then swap: a decode on a worker thread may be inserting.
+        entries = list(self._cache.items())
+        kept = {item_id: entry for item_id, entry in entries if item_id in board_ids}
+        self._cache = kept
+        return sum(
+            INK_CACHE_ENTRY_BYTES + points.nbytes + (exact.nbytes if exact is not None else 0)
+            for item_id, (_, points, exact) in entries
+            if item_id not in kept
+        )
+
+    def update_points(self, stroke_id: str, points: StrokePoints) -> None:
+        """Remember recompacted points, so re-sent snapshots keep the smaller stroke."""
+        cached = self._cache.get(stroke_id)
+        if cached is not None and points is not cached[1]:
+            key, old_points, exact = cached
+            self._cache[stroke_id] = (key, points, old_points if exact is None else exact)
+
+    def format_stats(self) -> str:
+        if not self.points_in:
+            return "no strokes"
+        return (
+            f"strokes={self.strokes} points {self.points_in} -> {self.points_out} "
+            f"({100.0 * (1 - self.points_out / self.points_in):.0f}% fewer), "
+            f"rendered bytes {self.bytes_in} -> {self.bytes_out} (exact points kept for the wire), "
+            f"re-sent strokes reused={self.cache_hits}"
+        )
+
+
+@dataclass(frozen=True)
+class PointStats:
+    point_count: int = 0
+    # (min_x, min_y, max_x, max_y) over every point, None without points.
+    bounds: tuple[float, float, float, float] | None = None
+    # Polyline length summed over normalized strokes only.
+    normalized_ink_length: float = 0.0
+
+
+def stroke_point_stats(strokes: "tuple[StrokeItem, ...] | list[StrokeItem]") -> PointStats:
+    """Point count, bounds and normalized ink length for a set of strokes.
+
+    With NumPy the whole board is reduced in one pass over the concatenated
+    buffers (segments that cross stroke boundaries are masked out) instead of
+    a handful of small array calls per stroke.
+    """
+    filled = [stroke for stroke in strokes if len(stroke.points)]
+    if not filled:
+        return PointStats()
+    if np is None:
+        point_count = 0
+        ink_length = 0.0
+        bounds_list = []
+        for stroke in filled:
+            point_count += len(stroke.points)
+            bounds_list.append(stroke.points.bounds())
+            if stroke.normalized:
+                ink_length += stroke.points.ink_length()
+        return PointStats(
+            point_count,
+            (
+                min(b[0] for b in bounds_list),
+                min(b[1] for b in bounds_list),
+                max(b[2] for b in bounds_list),
+                max(b[3] for b in bounds_list),
+            ),
+            ink_length,
+        )
+
+    arrays = [stroke.points._data for stroke in filled]
+    board = np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+    # Per-column reductions; min(axis=0) on an (n, 2) array is much slower.
+    xs = board[:, 0]
+    ys = board[:, 1]
+    lengths = np.fromiter((a.shape[0] for a in arrays), dtype=np.int64, count=len(arrays))
+    # One weight per segment: 1 inside a normalized stroke, 0 for pixel-space
+    # strokes and for the segment joining one stroke's end to the next start.
+    weights = np.repeat(
+        np.fromiter((stroke.normalized for stroke in filled), dtype=np.float64, count=len(filled)),
+        lengths,
+    )[1:]
+    weights[np.cumsum(lengths)[:-1] - 1] = 0.0
+    steps = np.diff(board.astype(np.float64), axis=0)
+    ink_length = float((np.hypot(steps[:, 0], steps[:, 1]) * weights).sum())
+    return PointStats(
+        int(board.shape[0]),
+        (float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max())),
+        ink_length,
+    )
+
+
+# Approximate CPython footprints, measured with tracemalloc, for the memory
+# gauge: item objects without their points, and one cached wire point dict.
+STROKE_ITEM_BYTES = 400
+POINT_BYTES = 8
+TEXT_ITEM_BYTES = 160
+WIRE_ITEM_BYTES = 300
+WIRE_POINT_BYTES = 240
+
+
+class StrokeItem:
+    """One whiteboard stroke. Treated as immutable once created.
+
+    `points` is what rendering, stats and summaries read; it may be a
+    simplified copy. `wire_points` then holds the points exactly as the
+    client sent them, which is what goes back out, so the student never
+    sees their own ink change shape.
+    """
+
+    __slots__ = ("id", "points", "wire_points", "color", "stroke_width", "normalized", "_wire")
+
+    def __init__(
+        self,
+        item_id: str,
+        points: StrokePoints,
+        *,
+        color: int = DEFAULT_STROKE_COLOR,
+        stroke_width: float = DEFAULT_STROKE_WIDTH,
+        normalized: bool = False,
+        wire_points: StrokePoints | None = None,
+    ) -> None:
+        self.id = item_id
+        self.points = points
+        # None when `points` are the exact points.
+        self.wire_points = wire_points if wire_points is not points else None
+        self.color = color
+        self.stroke_width = stroke_width
+        self.normalized = normalized
+        self._wire: dict | None = None
+
+    @classmethod
+    def from_wire(
+        cls,
+        raw: object,
+        points: StrokePoints | None = None,
+        wire_points: StrokePoints | None = None,
+    ) -> "StrokeItem | None":
+        """Parse a wire stroke; `points`, when given, replaces parsing raw["points"].
+
+        Pass `wire_points` with the parsed exact points when `points` is a
+        simplified copy of them.
+        """
+        if not isinstance(raw, dict):
+            return None
+        return cls(
+            _wire_id(raw),
+            StrokePoints.from_wire(raw.get("points")) if points is None else points,
+            color=_wire_int(raw.get("color", DEFAULT_STROKE_COLOR), DEFAULT_STROKE_COLOR),
+            stroke_width=_wire_float(raw.get("strokeWidth"), DEFAULT_STROKE_WIDTH),
+            normalized=raw.get("normalized") is True,
+            wire_points=wire_points,
+        )
+
+    @property
+    def exact_points(self) -> StrokePoints:
+        """The points as received, for the wire."""
+        return self.points if self.wire_points is None else self.wire_points
+
+    @property
+    def wire_nbytes(self) -> int:
+        """Estimated size of the wire dict, whether or not it is cached."""
+        return WIRE_ITEM_BYTES + WIRE_POINT_BYTES * len(self.exact_points)
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated bytes held, including the exact points and the cached wire dict."""
+        size = STROKE_ITEM_BYTES + self.points.nbytes
+        if self.wire_points is not None:
+            size += self.wire_points.nbytes
+        if self._wire is not None:
+            size += self.wire_nbytes
+        return size
+
+    def release_wire(self) -> int:
+        """Drop the cached wire dict (rebuilt on demand); returns bytes released."""
+        if self._wire is None:
+            return 0
+        self._wire = None
+        return self.wire_nbytes
+
+    def to_wire(self, cache: bool = True) -> dict:
+        """Wire dict for this stroke; built once and kept unless `cache` is False."""
+        if self._wire is not None:
+            return self._wire
+        wire = {
+            "id": self.id,
+            "points": self.exact_points.to_wire(),
+            "color": self.color,
+            "strokeWidth": self.stroke_width,
+            "normalized": self.normalized,
+        }
+        if cache:
+            self._wire = wire
+        return wire
+
+
+class TextItem:
+    """One whiteboard text label. Treated as immutable once created."""
+
+    __slots__ = ("id", "text", "x", "y", "color", "font_size", "normalized", "_wire")
+
+    def __init__(
+        self,
+        item_id: str,
+        text: str,
+        x: float,
+        y: float,
+        *,
+        color: int = DEFAULT_TEXT_COLOR,
+        font_size: float = DEFAULT_FONT_SIZE,
+        normalized: bool = True,
+    ) -> None:
+        self.id = item_id
+        self.text = text
+        self.x = x
+        self.y = y
+        self.color = color
+        self.font_size = font_size
+        self.normalized = normalized
+        self._wire: dict | None = None
+
+    @classmethod
+    def from_wire(cls, raw: object) -> "TextItem | None":
+        if not isinstance(raw, dict):
+            return None
+        text = raw.get("text")
+        return cls(
+            _wire_id(raw),
+            text if isinstance(text, str) else "",
+            _wire_float(raw.get("x"), 0.0),
+            _wire_float(raw.get("y"), 0.0),
+            color=_wire_int(raw.get("color", DEFAULT_TEXT_COLOR), DEFAULT_TEXT_COLOR),
+            font_size=_wire_float(raw.get("fontSize"), DEFAULT_FONT_SIZE),
+            normalized=raw.get("normalized") is not False,
+        )
+
+    @property
+    def wire_nbytes(self) -> int:
+        return WIRE_ITEM_BYTES + len(self.text)
+
+    @property
+    def nbytes(self) -> int:
+        size = TEXT_ITEM_BYTES + len(self.text)
+        if self._wire is not None:
+            size += self.wire_nbytes
+        return size
+
+    def release_wire(self) -> int:
+        if self._wire is None:
+            return 0
+        self._wire = None
+        return self.wire_nbytes
+
+    def to_wire(self, cache: bool = True) -> dict:
+        if self._wire is not None:
+            return self._wire
+        wire = {
+            "id": self.id,
+            "text": self.text,
+            "x": self.x,
+            "y": self.y,
+            "color": self.color,
+            "fontSize": self.font_size,
+            "normalized": self.normalized,
+        }
+        if cache:
+            self._wire = wire
+        return wire
+
+
+def strokes_from_wire(
+    raw_strokes: object, simplifier: InkSimplifier | None = None
+) -> list[StrokeItem]:
+    """Parse wire strokes, skipping malformed ones; simplified when given a simplifier."""
+    if not isinstance(raw_strokes, list):
+        return []
+    if simplifier is not None:
+        return simplifier.strokes_from_wire(raw_strokes)
+    return [item for raw in raw_strokes if (item := StrokeItem.from_wire(raw)) is not None]
+
+
+def _merge_items(items: tuple, added: list, removed: set[str]) -> tuple[tuple, list, list]:
+    """Return (merged items, items actually inserted, items dropped)."""
+    if not removed and not added:
+        return items, [], []
+    replaced = {item.id: item for item in added}
+    merged: list = []
+    inserted: list = []
+    dropped: list = []
+    for item in items:
+        if item.id in removed:
+            dropped.append(item)
+            continue
+        replacement = replaced.pop(item.id, None)
+        # Re-sent ids replace the existing item in place.
+        if replacement is None:
+            merged.append(item)
+        else:
+            dropped.append(item)
+            inserted.append(replacement)
+            merged.append(replacement)
+    appended = [
+        pending for item in added if (pending := replaced.pop(item.id, None)) is not None
+    ]
+    merged.extend(appended)
+    inserted.extend(appended)
+    return tuple(merged), inserted, dropped
+
+
+_UNSET = object()
+SAMPLE_COLOR_COUNT = 4
+
+
+def _items_nbytes(items: "tuple | list") -> int:
+    return sum(item.nbytes for item in items)
+
+
+def _wire_point_total(strokes: "tuple | list") -> int:
+    return sum(len(stroke.exact_points) for stroke in strokes)
+
+
+class WhiteboardStats:
+    """Summary statistics for one document.
+
+    Derived from the previous document's stats in O(delta) when a change is
+    applied. Bounds are only recomputed (lazily) after an erasure that touched
+    the bounding box, and the sample text only when its item was removed.
+    The byte estimate is carried the same way, so the memory gauge never
+    walks the whole board.
+    """
+
+    __slots__ = (
+        "_strokes",
+        "_texts",
+        "_point_count",
+        "_ink_length",
+        "_bounds",
+        "_sample_text",
+        "_nbytes",
+        "_wire_point_count",
+    )
+
+    def __init__(
+        self,
+        strokes: tuple,
+        texts: tuple,
+        point_count: int,
+        ink_length: float,
+        bounds: object,
+        sample_text: object = _UNSET,
+        nbytes: int = 0,
+        wire_point_count: int | None = None,
+    ) -> None:
+        self._strokes = strokes
+        self._texts = texts
+        self._point_count = point_count
+        self._ink_length = ink_length
+        self._nbytes = nbytes
+        # Points on the wire; more than point_count when strokes were simplified.
+        self._wire_point_count = point_count if wire_point_count is None else wire_point_count
+        # _UNSET means stale; None means no points.
+        self._bounds = bounds
+        self._sample_text = sample_text
+
+    @classmethod
+    def compute(cls, strokes: tuple, texts: tuple) -> "WhiteboardStats":
+        point_stats = stroke_point_stats(strokes)
+        return cls(
+            strokes,
+            texts,
+            point_stats.point_count,
+            point_stats.normalized_ink_length,
+            point_stats.bounds,
+            nbytes=STROKE_ITEM_BYTES * len(strokes)
+            + POINT_BYTES * point_stats.point_count
+            + sum(
+                stroke.wire_points.nbytes for stroke in strokes if stroke.wire_points is not None
+            )
+            + sum(stroke.wire_nbytes for stroke in strokes if stroke._wire is not None)
+            + _items_nbytes(texts),
+            wire_point_count=_wire_point_total(strokes),
+        )
+
+    def derive(
+        self,
+        strokes: tuple,
+        texts: tuple,
+        *,
+        cleared: bool,
+        added_strokes: list,
+        dropped_strokes: list,
+        added_texts: list,
+        dropped_texts: list,
+    ) -> "WhiteboardStats":
+        if cleared:
+            previous = WhiteboardStats((), (), 0, 0.0, None, None)
+        else:
+            previous = self
+
+        added = stroke_point_stats(added_strokes)
+        dropped = stroke_point_stats(dropped_strokes)
+        point_count = previous._point_count + added.point_count - dropped.point_count
+        ink_length = max(
+            0.0,
+            previous._ink_length + added.normalized_ink_length - dropped.normalized_ink_length,
+        )
+
+        bounds = previous._bounds
+        if bounds is not _UNSET and dropped.bounds is not None:
+            # Erasing strictly inside the box cannot shrink it.
+            if bounds is None or not (
+                dropped.bounds[0] > bounds[0]
+                and dropped.bounds[1] > bounds[1]
+                and dropped.bounds[2] < bounds[2]
+                and dropped.bounds[3] < bounds[3]
+            ):
+                bounds = _UNSET
+        if bounds is not _UNSET and added.bounds is not None:
+            bounds = (
+                added.bounds
+                if bounds is None
+                else (
+                    min(bounds[0], added.bounds[0]),
+                    min(bounds[1], added.bounds[1]),
+                    max(bounds[2], added.bounds[2]),
+                    max(bounds[3], added.bounds[3]),
+                )
+            )
+
+        sample_text = previous._sample_text
+        if sample_text is None and added_texts:
+            # Text was added to a board that had no readable text.
+            sample_text = _UNSET
+        elif sample_text is not _UNSET and dropped_texts:
+            # Removing the sample, or replacing an earlier item in place, can
+            # change which text comes first.
+            replaced_ids = {item.id for item in added_texts}
+            if any(item is sample_text or item.id in replaced_ids for item in dropped_texts):
+                sample_text = _UNSET
+        nbytes = max(
+            0,
+            previous._nbytes
+            + _items_nbytes(added_strokes)
+            + _items_nbytes(added_texts)
+            - _items_nbytes(dropped_strokes)
+            - _items_nbytes(dropped_texts),
+        )
+        wire_point_count = max(
+            0,
+            previous._wire_point_count
+            + _wire_point_total(added_strokes)
+            - _wire_point_total(dropped_strokes),
+        )
+        return WhiteboardStats(
+            strokes, texts, point_count, ink_length, bounds, sample_text, nbytes, wire_point_count
+        )
+
+    @property
+    def stroke_count(self) -> int:
+        return len(self._strokes)
+
+    @property
+    def text_count(self) -> int:
+        return len(self._texts)
+
+    @property
+    def point_count(self) -> int:
+        return self._point_count
+
+    @property
+    def wire_point_count(self) -> int:
+        return self._wire_point_count
+
+    @property
+    def normalized_ink_length(self) -> float:
+        return self._ink_length
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def add_nbytes(self, size: int) -> None:
+        """Account for wire dicts built or released after the stats were derived."""
+        self._nbytes = max(0, self._nbytes + size)
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float] | None:
+        if self._bounds is _UNSET:
+            point_stats = stroke_point_stats(self._strokes)
+            self._bounds = point_stats.bounds
+            # Resync the running sums while the full pass is paid for anyway.
+            self._point_count = point_stats.point_count
+            self._ink_length = point_stats.normalized_ink_length
+        return self._bounds  # type: ignore[return-value]
+
+    @property
+    def sample_colors(self) -> list[str]:
+        return [str(stroke.color) for stroke in self._strokes[:SAMPLE_COLOR_COUNT]]
+
+    @property
+    def sample_text(self) -> str:
+        if self._sample_text is _UNSET:
+            self._sample_text = next(
+                (item for item in self._texts if item.text.strip()),
+                None,
+            )
+        if self._sample_text is None:
+            return ""
+        return self._sample_text.text.strip()[:80]  # type: ignore[union-attr]
+
+
+class WhiteboardDocument:
+    """Immutable whiteboard snapshot.
+
+    Changes return a new document that shares every untouched item (and the
+    untouched item tuple) with the previous one, so readers such as tools,
+    summaries and rendering never need a defensive copy. Wire dicts are only
+    built by to_wire() at the network edge.
+    """
+
+    __slots__ = ("strokes", "texts", "capabilities", "_stats")
+
+    def __init__(
+        self,
+        strokes: tuple[StrokeItem, ...] = (),
+        texts: tuple[TextItem, ...] = (),
+        capabilities: tuple[str, ...] = (),
+    ) -> None:
+        self.strokes = strokes
+        self.texts = texts
+        self.capabilities = capabilities
+        self._stats: WhiteboardStats | None = None
+
+    @classmethod
+    def from_wire(cls, project: dict) -> "WhiteboardDocument":
+        return cls.from_wire_items(
+            project.get("strokes"),
+            project.get("texts"),
+            project.get("capabilities"),
+        )
+
+    @classmethod
+    def from_wire_items(
+        cls,
+        raw_strokes: object,
+        raw_texts: object,
+        raw_capabilities: object = None,
+        simplifier: InkSimplifier | None = None,
+    ) -> "WhiteboardDocument":
+        strokes = tuple(strokes_from_wire(raw_strokes, simplifier))
+        texts = tuple(
+            item
+            for raw in (raw_texts if isinstance(raw_texts, list) else [])
+            if (item := TextItem.from_wire(raw)) is not None
+        )
+        capabilities = (
+            tuple(str(value) for value in raw_capabilities)
+            if isinstance(raw_capabilities, list)
+            else ()
+        )
+        return cls(strokes, texts, capabilities)
+
+    def to_wire(self, seq: int | None = None, *, cache: bool = True) -> dict:
+        """Project payload; `cache=False` builds wire dicts without keeping them.
+
+        Cached wire dicts make the next snapshot cheap but cost several times
+        the packed points, so a memory budget can turn caching off.
+        """
+        if cache and self._stats is not None:
+            # Items cache their wire dicts; keep the byte estimate in step.
+            self._stats.add_nbytes(
+                sum(stroke.wire_nbytes for stroke in self.strokes if stroke._wire is None)
+                + sum(text_item.wire_nbytes for text_item in self.texts if text_item._wire is None)
+            )
+        project: dict[str, object] = {
+            "strokes": [stroke.to_wire(cache) for stroke in self.strokes],
+            "texts": [text_item.to_wire(cache) for text_item in self.texts],
+            "version": WHITEBOARD_PROJECT_VERSION,
+        }
+        if seq is not None:
+            project["seq"] = int(seq)
+        return project
+
+    def is_empty(self) -> bool:
+        return not self.strokes and not self.texts
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated bytes held by the items (shared with older documents)."""
+        return self.stats.nbytes
+
+    @property
+    def wire_nbytes(self) -> int:
+        """Estimated bytes of every item's wire dict, cached or not; O(1)."""
+        stats = self.stats
+        return (
+            WIRE_ITEM_BYTES * (stats.stroke_count + stats.text_count)
+            + WIRE_POINT_BYTES * stats.wire_point_count
+        )
+
+    def release_wire_caches(self) -> int:
+        """Drop every item's cached wire dict; returns bytes released."""
+        released = sum(stroke.release_wire() for stroke in self.strokes) + sum(
+            text_item.release_wire() for text_item in self.texts
+        )
+        self.stats.add_nbytes(-released)
+        return released
+
+    def with_points(
+        self, swaps: dict[str, tuple[StrokePoints, StrokePoints]]
+    ) -> "WhiteboardDocument":
+        """Same board with some strokes' points swapped, e.g. for coarser copies.
+
+        `swaps` maps a stroke id to (old points, new points); a stroke is only
+        swapped while it still holds the old points. Only the rendered points
+        change: each stroke keeps its exact wire points. Stats are derived in
+        O(swapped).
+        """
+        strokes = list(self.strokes)
+        dropped: list[StrokeItem] = []
+        added: list[StrokeItem] = []
+        for slot, stroke in enumerate(self.strokes):
+            swap = swaps.get(stroke.id)
+            if swap is None or stroke.points is not swap[0] or swap[1] is swap[0]:
+                continue
+            replacement = StrokeItem(
+                stroke.id,
+                swap[1],
+                color=stroke.color,
+                stroke_width=stroke.stroke_width,
+                normalized=stroke.normalized,
+                wire_points=stroke.exact_points,
+            )
+            strokes[slot] = replacement
+            dropped.append(stroke)
+            added.append(replacement)
+        if not added:
+            return self
+        document = WhiteboardDocument(tuple(strokes), self.texts, self.capabilities)
+        document._stats = self.stats.derive(
+            document.strokes,
+            self.texts,
+            cleared=False,
+            added_strokes=added,
+            dropped_strokes=dropped,
+            added_texts=[],
+            dropped_texts=[],
+        )
+        return document
+
+    def supports_delta(self) -> bool:
+        return WHITEBOARD_DELTA_CAPABILITY in self.capabilities
+
+    def apply(self, change: dict) -> "WhiteboardDocument":
+        """Return a new document with a change applied.
+
+        Applying the same change twice is harmless: removals of unknown ids
+        are ignored and re-added ids replace the existing item.
+        """
+        cleared = bool(change.get("clear"))
+        removed = set(change.get("remove") or ())
+        strokes, added_strokes, dropped_strokes = _merge_items(
+            () if cleared else self.strokes,
+            list(change.get("add_strokes") or ()),
+            removed,
+        )
+        texts, added_texts, dropped_texts = _merge_items(
+            () if cleared else self.texts,
+            list(change.get("add_texts") or ()),
+            removed,
+        )
+        document = WhiteboardDocument(strokes, texts, self.capabilities)
+        document._stats = self.stats.derive(
+            strokes,
+            texts,
+            cleared=cleared,
+            added_strokes=added_strokes,
+            dropped_strokes=dropped_strokes,
+            added_texts=added_texts,
+            dropped_texts=dropped_texts,
+        )
+        return document
+
+    @property
+    def stats(self) -> WhiteboardStats:
+        """Summary statistics; computed once per chain, then carried forward by apply()."""
+        if self._stats is None:
+            self._stats = WhiteboardStats.compute(self.strokes, self.texts)
+        return self._stats
+
+
+EMPTY_DOCUMENT = WhiteboardDocument()
+
+
+def wire_board_fingerprint(
+    stroke_count: object,
+    text_count: object,
+    content_hash: object,
+) -> tuple[int, int, str] | None:
+    """Client-reported (stroke count, text count, content hash), or None if incomplete.
+
+    The hash is opaque: clients keep it rolling as items are added and
+    removed, and the agent only ever compares it for equality.
+    """
+    if (
+        isinstance(stroke_count, bool)
+        or isinstance(text_count, bool)
+        or not isinstance(stroke_count, int)
+        or not isinstance(text_count, int)
+        or not isinstance(content_hash, (str, int))
+        or isinstance(content_hash, bool)
+        or content_hash == ""
+    ):
+        return None
+    return stroke_count, text_count, str(content_hash)
+
+
+def classify_board_change(before: int, added: int, removed: int) -> str:
+    """Label a change by item counts: started, cleared, added, erased or updated."""
+    after = before + added - removed
+    if after and not before:
+        return "started"
+    if before and not after:
+        return "cleared"
+    if after > before:
+        return "added"
+    if after < before:
+        return "erased"
+    return "updated"
+
+
+STROKE_KIND = "stroke"
+TEXT_KIND = "text"
+
+
+def _id_recency_key(item_id: str, position: int) -> tuple[int, int]:
+    """Sort key for ids shaped "[prefix_]<ms>_<n>" (agent and client ids alike).
+
+    Other ids fall back to their list position, which sorts them as oldest.
+    """
+    parts = item_id.rsplit("_", 2)
+    if len(parts) >= 2 and parts[-2].isdigit() and parts[-1].isdigit():
+        return int(parts[-2]), int(parts[-1])
+    return position, 0
+
+
+class WhiteboardIdIndex:
+    """Ids on the current board, in document and recency order.
+
+    Kept in step with every document change: changes update it from the ids
+    they name, in O(change). Snapshots are diffed against it with C-level set
+    operations, or skipped entirely when the client's fingerprint matches the
+    one recorded for the current board.
+
+    `stroke_ids` and `text_ids` are insertion-ordered like the document's
+    lists; the recency order interleaves both kinds so "erase the last N
+    items" walks N entries from the end.
+    """
+
+    __slots__ = ("stroke_ids", "text_ids", "_recent", "fingerprint", "unchanged")
+
+    def __init__(self) -> None:
+        self.stroke_ids: dict[str, None] = {}
+        self.text_ids: dict[str, None] = {}
+        self._recent: dict[tuple[str, str], None] = {}
+        # Client fingerprint of the current board; None once it is unknown
+        # (agent edits, or a client that does not send one).
+        self.fingerprint: tuple[int, int, str] | None = None
+        self.unchanged = 0
+
+    def __len__(self) -> int:
+        return len(self.stroke_ids) + len(self.text_ids)
+
+    def is_unchanged(self, fingerprint: tuple[int, int, str] | None) -> bool:
+        if fingerprint is None or fingerprint != self.fingerprint:
+            return False
+        self.unchanged += 1
+        return True
+
+    def recent(self, count: int, kind: str | None = None) -> list[tuple[str, str]]:
+        """Up to `count` (kind, id) pairs, newest first; `kind` limits to one kind."""
+        if kind == STROKE_KIND:
+            keys = ((STROKE_KIND, item_id) for item_id in reversed(self.stroke_ids))
+        elif kind == TEXT_KIND:
+            keys = ((TEXT_KIND, item_id) for item_id in reversed(self.text_ids))
+        else:
+            keys = reversed(self._recent)
+        return list(itertools.islice(keys, max(0, count)))
+
+    def apply_change(self, change: dict) -> tuple[int, int]:
+        """Record a change as WhiteboardDocument.apply() sees it; returns (added, removed)."""
+        removed = 0
+        if change.get("clear"):
+            removed = len(self)
+            self.stroke_ids.clear()
+            self.text_ids.clear()
+            self._recent.clear()
+        for item_id in change.get("remove") or ():
+            for kind, ids in ((STROKE_KIND, self.stroke_ids), (TEXT_KIND, self.text_ids)):
+                if item_id in ids:
+                    del ids[item_id]
+                    del self._recent[kind, item_id]
+                    removed += 1
+        added = 0
+        for kind, items, ids in (
+            (STROKE_KIND, change.get("add_strokes") or (), self.stroke_ids),
+            (TEXT_KIND, change.get("add_texts") or (), self.text_ids),
+        ):
+            for item in items:
+                # Re-sent ids keep their place, as in the document.
+                if item.id not in ids:
+                    ids[item.id] = None
+                    self._recent[kind, item.id] = None
+                    added += 1
+        self.fingerprint = change.get("fingerprint")
+        return added, removed
+
+    def replace(
+        self,
+        document: WhiteboardDocument,
+        fingerprint: tuple[int, int, str] | None = None,
+    ) -> tuple[int, int]:
+        """Re-index from a full snapshot; returns (added, removed).
+
+        Items already on the board keep their recency. New ones go on top,
+        ordered by the time in their id when the snapshot adds both strokes
+        and texts.
+        """
+        stroke_ids = dict.fromkeys(stroke.id for stroke in document.strokes)
+        text_ids = dict.fromkeys(text_item.id for text_item in document.texts)
+        new_keys: list[tuple[str, str, int]] = []
+        removed = 0
+        for kind, ids, previous_ids, items in (
+            (STROKE_KIND, stroke_ids, self.stroke_ids, document.strokes),
+            (TEXT_KIND, text_ids, self.text_ids, document.texts),
+        ):
+            for item_id in previous_ids.keys() - ids.keys():
+                del self._recent[kind, item_id]
+                removed += 1
+            new_ids = ids.keys() - previous_ids.keys()
+            found: list[tuple[str, str, int]] = []
+            # New items are usually the last ones drawn: scan from the end.
+            position = len(items)
+            for item in reversed(items):
+                if not new_ids:
+                    break
+                position -= 1
+                if item.id in new_ids:
+                    new_ids.discard(item.id)
+                    found.append((kind, item.id, position))
+            new_keys.extend(reversed(found))
+        if new_keys and new_keys[0][0] != new_keys[-1][0]:
+            new_keys.sort(key=lambda key: _id_recency_key(key[1], key[2]))
+        for kind, item_id, _ in new_keys:
+            self._recent[kind, item_id] = None
+        self.stroke_ids = stroke_ids
+        self.text_ids = text_ids
+        self.fingerprint = fingerprint
+        return len(new_keys), removed
+
+
+def build_delta(
+    seq: int,
+    *,
+    add_strokes: list[StrokeItem] | None = None,
+    add_texts: list[TextItem] | None = None,
+    remove_ids: list[str] | None = None,
+    clear: bool = False,
+) -> dict:
+    payload: dict[str, object] = {
+        "seq": int(seq),
+        "version": WHITEBOARD_PROJECT_VERSION,
+    }
+    if clear:
+        payload["clear"] = True
+    if remove_ids:
+        payload["remove"] = [str(item_id) for item_id in remove_ids]
+    add: dict[str, list[dict]] = {}
+    if add_strokes:
+        add["strokes"] = [stroke.to_wire() for stroke in add_strokes]
+    if add_texts:
+        add["texts"] = [text_item.to_wire() for text_item in add_texts]
+    if add:
+        payload["add"] = add
+    return payload
+
+
+# Clients and this agent write "type" first. A packet starting like this is a
+# full project snapshot; anything else is treated as order-dependent.
+_SNAPSHOT_PACKET_PREFIX = re.compile(rb'\s*\{\s*"type"\s*:\s*"project"\s*[,}]')
+
+
+def is_snapshot_packet(data: bytes) -> bool:
+    """True for a raw project snapshot packet, checked without decoding it."""
+    return _SNAPSHOT_PACKET_PREFIX.match(data) is not None
+
+
+def parse_delta(payload: object, simplifier: InkSimplifier | None = None) -> dict | None:
+    """Validate a project_delta payload; returns a change with typed items or None."""
+    if not isinstance(payload, dict):
+        return None
+
+    seq = payload.get("seq")
+    if isinstance(seq, bool) or not isinstance(seq, int):
+        return None
+
+    add = payload.get("add") or {}
+    if not isinstance(add, dict):
+        return None
+    add_strokes = add.get("strokes") or []
+    add_texts = add.get("texts") or []
+    if not isinstance(add_strokes, list) or not isinstance(add_texts, list):
+        return None
+
+    remove = payload.get("remove") or []
+    if not isinstance(remove, list):
+        return None
+
+    return {
+        "seq": seq,
+        "fingerprint": wire_board_fingerprint(
+            payload.get("strokeCount"),
+            payload.get("textCount"),
+            payload.get("contentHash"),
+        ),
+        "clear": payload.get("clear") is True,
+        "remove": [str(item_id) for item_id in remove if item_id is not None],
+        "add_strokes": strokes_from_wire(add_strokes, simplifier),
+        "add_texts": [
+            item for raw in add_texts if (item := TextItem.from_wire(raw)) is not None
+        ],
+    }
@@ -0,0 +1,78 @@
+from typing import AsyncIterable
+
+# Binary whiteboard captures: a LiveKit byte stream on this topic carries the
+# raw image bytes; the stream header carries mime type, total size and
+# attributes (timestamp, source, stroke_count). JSON captures on
+# WHITEBOARD_IMAGE_TOPIC remain supported for older clients.
+WHITEBOARD_IMAGE_STREAM_TOPIC = "whiteboard_image_bytes"
+DEFAULT_MAX_IMAGE_BYTES = 8 * 1024 * 1024
+
+_WEBP_RIFF = b"RIFF"
+_WEBP_TAG = b"WEBP"
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+# Enough leading bytes to recognise every signature above.
+SNIFF_BYTES = 12
+
+
+class ImageTransferError(Exception):
+    pass
+
+
+def sniff_image_mime(head: bytes) -> str | None:
+    for signature, mime_type in _SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == _WEBP_RIFF and head[8:12] == _WEBP_TAG:
+        return "image/webp"
+    return None
+
+
+async def read_image_stream(
+    chunks: AsyncIterable[bytes],
+    *,
+    declared_size: int | None,
+    max_bytes: int = DEFAULT_MAX_IMAGE_BYTES,
+) -> tuple[bytearray, str]:
+    """Collect an image byte stream, validating it as chunks arrive.
+
+    Rejects before reading when the declared size is over the limit, after
+    the first bytes when they are not a known image signature, and as soon
+    as the running total passes the limit. Bytes land in one preallocated
+    buffer when the size is declared, so nothing is copied or decoded twice.
+    Returns the buffer and the sniffed mime type.
+    """
+    if declared_size is not None and declared_size > max_bytes:
+        raise ImageTransferError(f"declared size {declared_size} exceeds {max_bytes} bytes")
+
+    buffer = bytearray(declared_size or 0)
+    view = memoryview(buffer) if declared_size else None
+    received = 0
+    mime_type: str | None = None
+    async for chunk in chunks:
+        end = received + len(chunk)
+        if end > max_bytes or (declared_size and end > declared_size):
+            raise ImageTransferError(f"stream exceeds {declared_size or max_bytes} bytes")
+        if view is not None:
+            view[received:end] = chunk
+        else:
+            buffer += chunk
+        received = end
+        if mime_type is None and received >= SNIFF_BYTES:
+            mime_type = sniff_image_mime(bytes(buffer[:SNIFF_BYTES]))
+            if mime_type is None:
+                raise ImageTransferError("stream is not a PNG, JPEG, WebP or GIF image")
+
+    if declared_size and received != declared_size:
+        raise ImageTransferError(f"stream ended at {received} of {declared_size} bytes")
+    if mime_type is None:
+        mime_type = sniff_image_mime(bytes(buffer[:received]))
+        if mime_type is None:
+            raise ImageTransferError("stream is not a PNG, JPEG, WebP or GIF image")
+    if view is not None:
+        view.release()
+    return buffer, mime_type
@@ -0,0 +1,266 @@
+import functools
+import logging
+import math
+from typing import Callable
+
+from whiteboard import (
+    DEFAULT_INK_TOLERANCE,
+    InkSimplifier,
+    StrokeItem,
+    StrokePoints,
+    WhiteboardDocument,
+    WhiteboardIdIndex,
+    simplify_stroke_points,
+)
+
+logger = logging.getLogger("agent-Alluwal")
+
+DEFAULT_MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+# Compaction aims this far under the budget, so the next few packets do not
+# trigger it again.
+COMPACT_TARGET_FRACTION = 0.75
+# The newest strokes stay exact; the student is most likely still on them.
+COMPACT_KEEP_RECENT_FRACTION = 0.25
+# Coarsest re-simplification, in normalized board units: about 4 px on the
+# 1024x768 render the vision model sees. Only the rendered copy is coarsened;
+# strokes keep their exact points for the wire.
+MAX_COMPACT_TOLERANCE = 0.004
+# When compaction at MAX_COMPACT_TOLERANCE still leaves the board over budget,
+# the oldest strokes are dropped until it is this far under.
+EVICT_TARGET_FRACTION = 0.9
+
+
+def _format_mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f}MB"
+
+
+def _recompact_points(
+    strokes: list[StrokeItem], tolerance: float
+) -> dict[str, tuple[StrokePoints, StrokePoints]]:
+    simplified = simplify_stroke_points([stroke.points for stroke in strokes], tolerance)
+    return {
+        stroke.id: (stroke.points, points) for stroke, points in zip(strokes, simplified)
+    }
+
+
+class WhiteboardMemoryBudget:
+    """Per-session ceiling on whiteboard memory, with a gauge of bytes held.
+
+    The gauge covers the board document (items, packed points and cached wire
+    dicts), the ink simplifier's cache and the raster cache's layers, all
+    kept as running estimates. Snapshots only keep their wire dicts when
+    `allows_wire_cache` says they fit under the target. After each board
+    change `enforce` reads the gauge, and over budget compacts in order of
+    cost to fidelity until it is under the target:
+
+    1. drop cached wire dicts, rebuilt when the next snapshot is sent;
+    2. forget simplified strokes that have left the board;
+    3. re-simplify the rendered copy of older normalized strokes, doubling
+       the tolerance per pass up to MAX_COMPACT_TOLERANCE. Exact points are
+       kept for the wire, so only strokes that already hold a simplified
+       copy are candidates; re-simplifying any other would add a copy
+       instead of shrinking one. This is a CPU-bound pass, so
+       `enforce` only flags it as `recompaction_due`; the caller runs
+       `recompaction_job()` off the event loop and hands the result to
+       `apply_recompacted`.
+
+    4. once the rendered copies are at MAX_COMPACT_TOLERANCE and the board
+       is still over budget, drop the oldest strokes until it is under
+       EVICT_TARGET_FRACTION of the budget. Agent snapshots replace the
+       client's board, so evicted strokes also leave the student's board
+       with the next snapshot the agent publishes.
+
+    Texts and the raster layers are never evicted; when they alone exceed
+    the budget no ink is dropped and the overrun is logged instead.
+    """
+
+    def __init__(
+        self,
+        limit_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+        *,
+        simplifier: InkSimplifier | None = None,
+        raster_cache=None,
+    ) -> None:
+        # 0 disables compaction; the gauge is still kept.
+        self.limit_bytes = max(0, int(limit_bytes))
+        self._simplifier = simplifier
+        self._raster_cache = raster_cache
+        base = simplifier.tolerance if simplifier is not None else DEFAULT_INK_TOLERANCE
+        # Re-simplifying at the tolerance strokes were parsed with drops nothing.
+        self.tolerance = min(MAX_COMPACT_TOLERANCE, max(2 * base, DEFAULT_INK_TOLERANCE))
+        # Stroke ids already re-simplified at the current tolerance.
+        self._compacted: set[str] = set()
+        self.recompaction_due = False
+        self.held_bytes = 0
+        self.peak_bytes = 0
+        self.compactions = 0
+        self.released_bytes = 0
+        self.recompacted_strokes = 0
+        self.evicted_strokes = 0
+        self._overrun_logged = False
+
+    @property
+    def _target(self) -> float:
+        return self.limit_bytes * COMPACT_TARGET_FRACTION
+
+    def measure(self, document: WhiteboardDocument) -> int:
+        """Update the gauge from running estimates; O(1) once the board has stats."""
+        held = document.nbytes
+        if self._simplifier is not None:
+            held += self._simplifier.nbytes
+        if self._raster_cache is not None:
+            held += self._raster_cache.nbytes
+        self.held_bytes = held
+        self.peak_bytes = max(self.peak_bytes, held)
+        return held
+
+    def allows_wire_cache(self, document: WhiteboardDocument) -> bool:
+        """Whether a snapshot of `document` may keep its wire dicts under the target."""
+        if not self.limit_bytes:
+            return True
+        return self.measure(document) + document.wire_nbytes <= self._target
+
+    def enforce(
+        self,
+        document: WhiteboardDocument,
+        index: WhiteboardIdIndex,
+    ) -> WhiteboardDocument:
+        """Measure the board and run the cheap compaction stages when over budget.
+
+        `index` tracks the ids on `document` and is updated when strokes are
+        evicted. Returns the board to keep.
+        """
+        held = self.measure(document)
+        if not self.limit_bytes or self.recompaction_due or held <= self.limit_bytes:
+            return document
+
+        self.compactions += 1
+        released = document.release_wire_caches()
+        if self._simplifier is not None:
+            released += self._simplifier.retain(index.stroke_ids)
+        self._compacted.intersection_update(index.stroke_ids)
+        self.released_bytes += released
+        held = self.measure(document)
+        if held <= self._target:
+            return document
+        if self._has_recompaction_candidates(document):
+            self.recompaction_due = True
+        elif self.tolerance < MAX_COMPACT_TOLERANCE:
+            self._raise_tolerance()
+        elif held > self.limit_bytes:
+            document = self._evict_oldest(document, index)
+        return document
+
+    def _raise_tolerance(self) -> None:
+        self.tolerance = min(MAX_COMPACT_TOLERANCE, 2 * self.tolerance)
+        self._compacted.clear()
+        self.recompaction_due = True
+
+    def _older_strokes(self, document: WhiteboardDocument) -> tuple[StrokeItem, ...]:
+        strokes = document.strokes
+        return strokes[: len(strokes) - math.ceil(len(strokes) * COMPACT_KEEP_RECENT_FRACTION)]
+
+    def _is_candidate(self, stroke: StrokeItem) -> bool:
+        return (
+            stroke.normalized
+            and stroke.wire_points is not None
+            and len(stroke.points) > 2
+            and stroke.id not in self._compacted
+        )
+
+    def _has_recompaction_candidates(self, document: WhiteboardDocument) -> bool:
+        return any(self._is_candidate(stroke) for stroke in self._older_strokes(document))
+
+    def _evict_oldest(
+        self, document: WhiteboardDocument, index: WhiteboardIdIndex
+    ) -> WhiteboardDocument:
+        """Drop the oldest strokes until the board is under the eviction target."""
+        excess = self.held_bytes - self.limit_bytes * EVICT_TARGET_FRACTION
+        ink_bytes = sum(stroke.nbytes for stroke in document.strokes)
+        if self._simplifier is not None:
+            ink_bytes += self._simplifier.nbytes
+        if excess > ink_bytes:
+            if not self._overrun_logged:
+                logger.warning(
+                    "Whiteboard: texts and raster layers alone hold %s, over the %s "
+                    "budget; ink is kept",
+                    _format_mb(self.held_bytes - ink_bytes),
+                    _format_mb(self.limit_bytes),
+                )
+                self._overrun_logged = True
+            return document
+
+        evicted: list[str] = []
+        for stroke in document.strokes:
+            if excess <= 0:
+                break
+            evicted.append(stroke.id)
+            excess -= stroke.nbytes
+        change = {"remove": evicted}
+        document = document.apply(change)
+        index.apply_change(change)
+        if self._simplifier is not None:
+            self._simplifier.retain(index.stroke_ids)
+        self._compacted.difference_update(evicted)
+        if not self.evicted_strokes:
+            logger.warning(
+                "Whiteboard: ink still over the %s budget at the coarsest compaction; "
+                "dropping the oldest strokes",
+                _format_mb(self.limit_bytes),
+            )
+        self.evicted_strokes += len(evicted)
+        self.measure(document)
+        return document
+
+    def recompaction_job(self, document: WhiteboardDocument) -> Callable[[], dict]:
+        """Stage 3 for a worker thread; pass its result to apply_recompacted().
+
+        The newest strokes stay as parsed, as do ones already re-simplified
+        at the current tolerance and ones without a simplified copy.
+        """
+        candidates = [
+            stroke for stroke in self._older_strokes(document) if self._is_candidate(stroke)
+        ]
+        return functools.partial(_recompact_points, candidates, self.tolerance)
+
+    def apply_recompacted(
+        self,
+        document: WhiteboardDocument,
+        swaps: dict[str, tuple[StrokePoints, StrokePoints]],
+        index: WhiteboardIdIndex,
+    ) -> WhiteboardDocument:
+        """Swap re-simplified points into the current board.
+
+        Strokes changed since the job started are left alone. While the
+        board is still over target the tolerance is raised and another pass
+        is flagged, up to MAX_COMPACT_TOLERANCE; past that, the oldest
+        strokes are evicted when the board is still over budget.
+        """
+        before = self.measure(document)
+        document = document.with_points(swaps)
+        self._compacted.update(swaps)
+        for stroke_id, (old_points, points) in swaps.items():
+            if points is not old_points:
+                self.recompacted_strokes += 1
+                if self._simplifier is not None:
+                    self._simplifier.update_points(stroke_id, points)
+        held = self.measure(document)
+        self.released_bytes += max(0, before - held)
+
+        self.recompaction_due = False
+        if held > self._target:
+            if self.tolerance < MAX_COMPACT_TOLERANCE:
+                self._raise_tolerance()
+            elif held > self.limit_bytes:
+                document = self._evict_oldest(document, index)
+        return document
+
+    def format_stats(self) -> str:
+        budget = _format_mb(self.limit_bytes) if self.limit_bytes else "off"
+        return (
+            f"held={_format_mb(self.held_bytes)} peak={_format_mb(self.peak_bytes)} "
+            f"budget={budget} compactions={self.compactions} "
+            f"released={_format_mb(self.released_bytes)} "
+            f"recompacted strokes={self.recompacted_strokes} "
+            f"tolerance={self.tolerance:g} evicted strokes={self.evicted_strokes}"
+        )
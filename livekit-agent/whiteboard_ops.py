@@ -0,0 +1,80 @@
+from typing import Annotated, Any, Literal, Union
+
+from pydantic import BaseModel, Field, model_validator
+
+# One tool call applies at most this many operations.
+WHITEBOARD_MAX_OPS = 50
+
+DEFAULT_OP_STROKE_COLOR = 0xFF0E72ED
+DEFAULT_OP_STROKE_WIDTH = 4.0
+DEFAULT_OP_TEXT_COLOR = 0xFF111827
+
+
+class _WhiteboardOp(BaseModel):
+    @model_validator(mode="before")
+    @classmethod
+    def _null_means_default(cls, data: Any) -> Any:
+        # Strict tool schemas make every defaulted field nullable.
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if value is not None}
+        return data
+
+
+class LineOp(_WhiteboardOp):
+    """Straight line between two points; coordinates are normalized 0..1."""
+
+    op: Literal["line"]
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    color_argb: int = DEFAULT_OP_STROKE_COLOR
+    stroke_width: float = DEFAULT_OP_STROKE_WIDTH
+
+
+class RectangleOp(_WhiteboardOp):
+    """Axis-aligned rectangle between two corners; coordinates are normalized 0..1."""
+
+    op: Literal["rectangle"]
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    color_argb: int = DEFAULT_OP_STROKE_COLOR
+    stroke_width: float = DEFAULT_OP_STROKE_WIDTH
+
+
+class TextOp(_WhiteboardOp):
+    """Text label at a normalized position."""
+
+    op: Literal["text"]
+    text: str
+    x: float
+    y: float
+    color_argb: int = DEFAULT_OP_TEXT_COLOR
+    font_size: float = 34.0
+
+
+class EquationOp(_WhiteboardOp):
+    """Math equation at a normalized position; x^2 for powers, a_1 for subscripts."""
+
+    op: Literal["equation"]
+    equation: str
+    x: float
+    y: float
+    color_argb: int = DEFAULT_OP_TEXT_COLOR
+    font_size: float = 38.0
+
+
+class EraseOp(_WhiteboardOp):
+    """Erase the most recent items, including ones added earlier in the same batch."""
+
+    op: Literal["erase"]
+    count: int = 1
+    target: Literal["any", "strokes", "texts"] = "any"
+
+
+WhiteboardOp = Annotated[
+    Union[LineOp, RectangleOp, TextOp, EquationOp, EraseOp],
+    Field(discriminator="op"),
+]
@@ -0,0 +1,214 @@
+import functools
+import io
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except Exception:  # pragma: no cover - optional runtime dependency fallback
+    Image = None
+    ImageDraw = None
+    ImageFont = None
+
+from whiteboard import StrokeItem, TextItem, WhiteboardDocument
+
+RENDER_WIDTH = 1024
+RENDER_HEIGHT = 768
+FONT_FILE = "DejaVuSans.ttf"
+# Text sizes are clamped to 12..72, so this holds every size a board can use.
+FONT_CACHE_SIZE = 64
+
+
+def pillow_available() -> bool:
+    return Image is not None and ImageDraw is not None
+
+
+def argb_to_rgba(argb: int) -> tuple[int, int, int, int]:
+    a = (argb >> 24) & 0xFF
+    r = (argb >> 16) & 0xFF
+    g = (argb >> 8) & 0xFF
+    b = argb & 0xFF
+    return (r, g, b, a)
+
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(size: int):
+    """Process-wide font cache; parsing the TrueType file costs milliseconds."""
+    if ImageFont is None:
+        return None
+    try:
+        return ImageFont.truetype(FONT_FILE, size=size)
+    except Exception:
+        try:
+            return ImageFont.load_default()
+        except Exception:
+            return None
+
+
+def _same_stroke(old: StrokeItem, new: StrokeItem) -> bool:
+    # Snapshots re-parse every item, so identity alone would force a full
+    # redraw on each inbound project; compare the fields that affect pixels.
+    return (
+        old is new
+        or (
+            old.id == new.id
+            and len(old.points) == len(new.points)
+            and old.color == new.color
+            and old.stroke_width == new.stroke_width
+            and old.normalized == new.normalized
+        )
+    )
+
+
+def _same_text(old: TextItem, new: TextItem) -> bool:
+    return (
+        old is new
+        or (
+            old.id == new.id
+            and old.text == new.text
+            and old.x == new.x
+            and old.y == new.y
+            and old.color == new.color
+            and old.font_size == new.font_size
+            and old.normalized == new.normalized
+        )
+    )
+
+
+def _drawn_prefix(drawn: tuple, items: tuple, same) -> int | None:
+    """Count of drawn items if they are still a prefix of items, else None."""
+    if len(drawn) > len(items):
+        return None
+    for old, new in zip(drawn, items):
+        if not same(old, new):
+            return None
+    return len(drawn)
+
+
+class WhiteboardRasterCache:
+    """Per-session board raster that only draws items added since the last render.
+
+    Strokes accumulate on a cached layer. Texts are drawn above them on a
+    cached composite (a copy of the stroke layer), which only needs
+    rebuilding when strokes change underneath it. Erasures, clears and
+    in-place edits break the drawn prefix and trigger a full redraw.
+    """
+
+    def __init__(self, width: int = RENDER_WIDTH, height: int = RENDER_HEIGHT) -> None:
+        self.width = width
+        self.height = height
+        self._strokes: tuple = ()
+        self._texts: tuple = ()
+        self._stroke_layer = None
+        self._composite = None
+        self.full_redraws = 0
+        self.incremental_renders = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the cached RGBA layers."""
+        layers = sum(layer is not None for layer in (self._stroke_layer, self._composite))
+        return layers * self.width * self.height * 4
+
+    def reset(self) -> None:
+        self._strokes = ()
+        self._texts = ()
+        self._stroke_layer = None
+        self._composite = None
+
+    def _draw_stroke(self, draw, stroke: StrokeItem) -> None:
+        if not stroke.points:
+            return
+
+        try:
+            stroke_width = max(1, int(stroke.stroke_width))
+        except Exception:
+            stroke_width = 3
+        color_rgba = argb_to_rgba(stroke.color)
+
+        scale_x = self.width if stroke.normalized else 1.0
+        scale_y = self.height if stroke.normalized else 1.0
+        canvas_points = [(x * scale_x, y * scale_y) for x, y in stroke.points.to_pairs()]
+
+        if len(canvas_points) == 1:
+            x, y = canvas_points[0]
+            r = max(1.0, stroke_width / 2.0)
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=color_rgba)
+        else:
+            draw.line(canvas_points, fill=color_rgba, width=stroke_width, joint="curve")
+
+    def _draw_text(self, draw, text_item: TextItem) -> None:
+        text_value = text_item.text
+        if not text_value.strip():
+            return
+
+        px = text_item.x * self.width if text_item.normalized else text_item.x
+        py = text_item.y * self.height if text_item.normalized else text_item.y
+
+        try:
+            font_size = int(max(12.0, min(72.0, text_item.font_size)))
+        except Exception:
+            font_size = 30
+        draw.text(
+            (px, py),
+            text_value,
+            fill=argb_to_rgba(text_item.color),
+            font=load_font(font_size),
+        )
+
+    def render(self, document: WhiteboardDocument):
+        """Return the board as an RGB image, or None when Pillow is unavailable."""
+        if not pillow_available():
+            return None
+
+        full_redraw = False
+        start = None
+        if self._stroke_layer is not None:
+            start = _drawn_prefix(self._strokes, document.strokes, _same_stroke)
+        if start is None:
+            self._stroke_layer = Image.new(
+                "RGBA", (self.width, self.height), (255, 255, 255, 255)
+            )
+            start = 0
+            full_redraw = True
+        strokes_changed = full_redraw or start < len(document.strokes)
+        if start < len(document.strokes):
+            draw = ImageDraw.Draw(self._stroke_layer, "RGBA")
+            for stroke in document.strokes[start:]:
+                self._draw_stroke(draw, stroke)
+        self._strokes = document.strokes
+
+        if not document.texts:
+            self._composite = None
+        else:
+            start = None
+            if self._composite is not None and not strokes_changed:
+                start = _drawn_prefix(self._texts, document.texts, _same_text)
+                if start is None:
+                    full_redraw = True
+            if start is None:
+                self._composite = self._stroke_layer.copy()
+                start = 0
+            if start < len(document.texts):
+                draw = ImageDraw.Draw(self._composite, "RGBA")
+                for text_item in document.texts[start:]:
+                    self._draw_text(draw, text_item)
+        self._texts = document.texts
+
+        if full_redraw:
+            self.full_redraws += 1
+        else:
+            self.incremental_renders += 1
+
+        layer = self._composite if self._composite is not None else self._stroke_layer
+        return layer.convert("RGB")
+
+    def render_png(self, document: WhiteboardDocument) -> bytes | None:
+        image = self.render(document)
+        if image is None:
+            return None
+        return encode_png(image)
+
+
+def encode_png(image) -> bytes:
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()